@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+async_logging.py
+
+Logging for the edge and fog loops, which used to print() every report.
+
+- setup_logging() sends the "vanet" loggers through a bounded queue to a
+  background QueueListener thread, so a slow terminal or pipe never blocks
+  the loop. When the queue is full, records are dropped and counted
+  (reported when logging stops) instead of waiting for the writer.
+- Records are formatted on the listener thread, not by the caller. Callers
+  must not mutate objects passed as log arguments afterwards (the loops pass
+  a fresh report dict every step).
+- Per-report lines are logged at DEBUG, so the default INFO level only shows
+  startup, errors and end-of-run summaries. ReportSampler thins report lines
+  further: every Nth step per pole, and/or whenever a pole's state changes.
+- --log-json writes one JSON object per line. A report passed with
+  extra={"report": report} becomes a field of its line instead of text.
+
+add_logging_args() adds the --log-* flags shared by edge_template.py and
+fog.py; setup_from_args() applies them and returns the ReportSampler.
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+ROOT_LOGGER = "vanet"
+
+# Listener state of this process (restarted in forked children)
+_handler = None
+_listener = None
+_queue_handler = None
+_max_queue = 10000
+
+
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BlockingStopListener(QueueListener):
+    def enqueue_sentinel(self):
+        # The queue may be full at shutdown; wait for room instead of failing
+        self.queue.put(self._sentinel)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {"time": round(record.created, 6), "level": record.levelname, "logger": record.name}
+        report = getattr(record, "report", None)
+        if report is not None:
+            # The text form of a report line is just the report again
+            entry["report"] = report
+        else:
+            entry["msg"] = record.getMessage()
+        return json.dumps(entry)
+
+
+class ReportSampler:
+    """Which reports get a DEBUG line: every `every` steps per key, and/or on change."""
+
+    def __init__(self, every=1, on_change=False):
+        self.every = every
+        self.on_change = on_change
+        self.last_state = {}   # key -> state of the last report seen
+
+    def should_log(self, key, step, state):
+        periodic = self.every > 0 and step % self.every == 0
+        if not self.on_change:
+            return periodic
+        changed = self.last_state.get(key) != state
+        self.last_state[key] = state
+        return periodic or changed
+
+
+def _start_listener():
+    global _listener, _queue_handler
+    log_queue = queue.Queue(_max_queue)
+    _queue_handler = DroppingQueueHandler(log_queue)
+    root = logging.getLogger(ROOT_LOGGER)
+    root.handlers = [_queue_handler]
+    _listener = BlockingStopListener(log_queue, _handler)
+    _listener.start()
+
+
+def setup_logging(level="INFO", json_lines=False, stream=None, max_queue=10000):
+    """Route the "vanet" loggers through a background writer thread."""
+    global _handler, _max_queue
+    stop_logging()
+    _max_queue = max_queue
+    _handler = logging.StreamHandler(stream or sys.stdout)
+    _handler.setFormatter(JsonFormatter() if json_lines else logging.Formatter("%(message)s"))
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level)
+    root.propagate = False
+    _start_listener()
+
+
+def _restart_after_fork():
+    # The listener thread does not survive fork(); give children (e.g.
+    # process decrypt workers) their own. They must call stop_logging()
+    # before exiting, as multiprocessing children skip atexit handlers.
+    if _listener is not None:
+        _start_listener()
+
+
+def stop_logging():
+    """
+    Write out everything queued so far and stop the writer thread.
+    Returns how many records were dropped because the queue was full.
+    """
+    global _listener
+    if _listener is None:
+        return 0
+    _listener.stop()
+    _listener = None
+    if _queue_handler.dropped:
+        _handler.stream.write(f"[log] dropped {_queue_handler.dropped} log records (queue full)\n")
+        _handler.flush()
+    return _queue_handler.dropped
+
+
+atexit.register(stop_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def add_logging_args(parser):
+    parser.add_argument("--log-level", choices=LEVELS, default="INFO",
+                        help="DEBUG also logs every sent/received report")
+    parser.add_argument("--log-every", type=int, default=None,
+                        help="At DEBUG, log a pole's report every N steps (0 = only on change; "
+                             "default 1, or 0 with --log-on-change)")
+    parser.add_argument("--log-on-change", action="store_true",
+                        help="At DEBUG, log a pole's report whenever its counts or phase changed")
+    parser.add_argument("--log-json", action="store_true", help="Write log lines as JSON objects")
+
+
+def setup_from_args(args):
+    setup_logging(args.log_level, json_lines=args.log_json)
+    every = args.log_every if args.log_every is not None else (0 if args.log_on_change else 1)
+    return ReportSampler(every, args.log_on_change)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+bench_codec.py
+
+Microbenchmark for the report plaintext formats in report_codec.py.
+For JSON and binary v1 it reports:
+- encode+encrypt ns/message (what run_edge pays per step)
+- decrypt+decode ns/message (what fog.decrypt_message pays per datagram)
+- datagram size in bytes
+
+Run from the repository root:
+    python -m benchmarks.bench_codec [--messages 50000]
+"""
+
+import time
+import argparse
+
+from fog import encrypt_plaintext, decrypt_message
+from report_codec import FORMATS, encode_report, decode_report
+
+
+def make_reports(n):
+    return [{
+        "pole_id": f"pole{i % 64}",
+        "timestep": i,
+        "north_count": i % 7,
+        "south_count": i % 5,
+        "east_count": i % 11,
+        "west_count": i % 3,
+        "current_phase": 0 if i % 40 < 20 else 2
+    } for i in range(n)]
+
+
+def bench_format(fmt, reports):
+    start = time.perf_counter_ns()
+    datagrams = [encrypt_plaintext(encode_report(report, fmt), report["pole_id"]) for report in reports]
+    encode_ns = (time.perf_counter_ns() - start) / len(reports)
+
+    start = time.perf_counter_ns()
+    decoded = [decrypt_message(data) for data in datagrams]
+    decode_ns = (time.perf_counter_ns() - start) / len(reports)
+
+    if decoded != reports:
+        raise AssertionError(f"{fmt}: decoded reports differ from the originals")
+    return encode_ns, decode_ns, len(datagrams[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50000)
+    args = parser.parse_args()
+
+    reports = make_reports(args.messages)
+    # Warm up caches (pole index lookups, AES module import paths)
+    for fmt in FORMATS:
+        decode_report(encode_report(reports[0], fmt))
+
+    print(f"{'format':<8} {'encode+encrypt':>16} {'decrypt+decode':>16} {'datagram':>10}")
+    for fmt in FORMATS:
+        encode_ns, decode_ns, size = bench_format(fmt, reports)
+        print(f"{fmt:<8} {encode_ns:>13.0f} ns {decode_ns:>13.0f} ns {size:>8} B")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+bench_controller.py
+
+Checks controller.PhaseController against edge_template.control_traffic_light
+and times both for K intersections.
+
+Parity: --intersections random intersections are driven for --steps steps
+with counts drawn around the red threshold (so red, long-red and fallback
+branches all occur, including ties). Each intersection runs the reference
+function with its own red-duration dict, and every returned phase must match
+the vectorized controller's. TLS commands of the reference are captured
+instead of sent (there is no SUMO connection).
+
+Timing: one decision step for K = 1, 10, 100, 1000, 10000 intersections,
+vectorized vs calling the reference once per intersection.
+
+Run from the repository root (edge_template needs SUMO_HOME set):
+    python -m benchmarks.bench_controller [--steps 2000] [--intersections 200]
+"""
+
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from controller import APPROACHES, PhaseController
+
+# edge_template parses its own command line at import time
+_argv, sys.argv = sys.argv, [sys.argv[0], "--pole-id", "pole1", "--headless"]
+import edge_template
+sys.argv = _argv
+
+# The reference calls setPhase when the phase changes; there is no connection here
+edge_template.traci.trafficlight.setPhase = lambda tls_id, phase: None
+
+
+def random_counts(rng, steps, intersections):
+    """Counts mostly in 3..8, with runs of heavy traffic and some empty steps."""
+    counts = rng.integers(3, 9, size=(steps, intersections, len(APPROACHES)))
+    heavy = rng.random((steps // 20 + 1, intersections, len(APPROACHES))) < 0.3
+    counts += np.repeat(heavy, 20, axis=0)[:steps] * 4
+    counts[rng.random((steps, intersections)) < 0.05] = 0
+    return counts
+
+
+def reference_step(counts, phases, durations):
+    """control_traffic_light for every intersection, one call each."""
+    next_phases = []
+    for k, (north, south, east, west) in enumerate(counts.tolist()):
+        edge_template.approach_red_durations = durations[k]
+        next_phases.append(edge_template.control_traffic_light(north, south, east, west, phases[k]))
+    return next_phases
+
+
+def check_parity(steps, intersections, seed=0):
+    rng = np.random.default_rng(seed)
+    counts = random_counts(rng, steps, intersections)
+    durations = [dict.fromkeys(APPROACHES, 0) for _ in range(intersections)]
+    controller = PhaseController(intersections)
+    reference_phases = rng.choice([0, 2], size=intersections).tolist()
+    phases = np.array(reference_phases)
+    changes = 0
+    for step in range(steps):
+        reference_phases = reference_step(counts[step], reference_phases, durations)
+        next_phases = controller.next_phases(counts[step], phases)
+        if next_phases.tolist() != reference_phases:
+            k = int(np.flatnonzero(next_phases != np.array(reference_phases))[0])
+            raise AssertionError(f"step {step}, intersection {k}: counts {counts[step, k].tolist()}, "
+                                 f"expected phase {reference_phases[k]}, got {next_phases[k]}")
+        changes += int((next_phases != phases).sum())
+        phases = next_phases
+    print(f"[controller] parity OK: {steps} steps x {intersections} intersections, {changes} phase changes")
+
+
+def time_step(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=2000, help="Steps of the parity check")
+    parser.add_argument("--intersections", type=int, default=200, help="Intersections in the parity check")
+    args = parser.parse_args()
+
+    check_parity(args.steps, args.intersections)
+
+    rng = np.random.default_rng(1)
+    print(f"{'K':>6} {'vectorized':>14} {'per-intersection':>18} {'speedup':>9}")
+    for k in (1, 10, 100, 1000, 10000):
+        counts = random_counts(rng, 1, k)[0]
+        phases = np.zeros(k, dtype=np.int64)
+        controller = PhaseController(k)
+        durations = [dict.fromkeys(APPROACHES, 0) for _ in range(k)]
+        repeat = max(3, 20000 // k)
+        vectorized = time_step(lambda: controller.next_phases(counts, phases), repeat)
+        reference = time_step(lambda: reference_step(counts, phases.tolist(), durations), max(3, repeat // 10))
+        print(f"{k:>6} {vectorized * 1e6:>11.1f} us {reference * 1e6:>15.1f} us {reference / vectorized:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
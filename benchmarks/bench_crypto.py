@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+bench_crypto.py
+
+Messages/sec of report sealing and opening, old vs report_crypto.py:
+- legacy: a fresh AES.new(KEY, AES.MODE_GCM) with a random 16-byte nonce
+  per message, one key shared by every pole (the code before report_crypto)
+- report_crypto with each available backend (cryptography's AESGCM with its
+  key schedule built once per session; pycryptodome AES.new per message),
+  sealing one message per call and a whole list with seal_many()
+
+Messages are binary reports from --poles poles. Opening goes through one
+ReportOpener, so it includes the per-pole key lookup and the replay window
+(the first datagram of each pole also pays its HKDF key derivation).
+report_crypto.check_replay_rejection() runs for every backend first.
+
+Run from the repository root:
+    python -m benchmarks.bench_crypto [--messages 50000] [--poles 64]
+"""
+
+import time
+import argparse
+
+from Crypto.Cipher import AES
+
+from report_codec import FORMAT_BINARY, encode_report
+from report_crypto import AESGCM, ReportOpener, ReportSealer, check_replay_rejection
+
+LEGACY_KEY = b'0123456789abcdef'
+
+
+def legacy_seal(plaintext):
+    cipher = AES.new(LEGACY_KEY, AES.MODE_GCM)
+    ciphertext, tag = cipher.encrypt_and_digest(plaintext)
+    return cipher.nonce + tag + ciphertext
+
+
+def legacy_open(data):
+    cipher = AES.new(LEGACY_KEY, AES.MODE_GCM, nonce=data[:16])
+    return cipher.decrypt_and_verify(data[32:], data[16:32])
+
+
+def make_plaintexts(n, poles):
+    """[(pole_id, plaintext)] round-robin over the poles."""
+    return [(f"pole{i % poles}", encode_report({
+        "pole_id": f"pole{i % poles}",
+        "timestep": i // poles + 1,
+        "north_count": i % 7,
+        "south_count": i % 5,
+        "east_count": i % 11,
+        "west_count": i % 3,
+        "current_phase": 0 if i % 40 < 20 else 2
+    }, FORMAT_BINARY)) for i in range(n)]
+
+
+def rate(n, start):
+    return n / (time.perf_counter() - start)
+
+
+def bench_legacy(messages):
+    start = time.perf_counter()
+    datagrams = [legacy_seal(plaintext) for _, plaintext in messages]
+    seal_rate = rate(len(messages), start)
+
+    start = time.perf_counter()
+    opened = [legacy_open(data) for data in datagrams]
+    open_rate = rate(len(messages), start)
+    assert opened == [plaintext for _, plaintext in messages]
+    return seal_rate, None, open_rate, len(datagrams[0])
+
+
+def bench_backend(messages, backend):
+    pole_ids = sorted({pole_id for pole_id, _ in messages})
+    sealers = {pole_id: ReportSealer(pole_id, backend=backend) for pole_id in pole_ids}
+
+    start = time.perf_counter()
+    datagrams = [sealers[pole_id].seal(plaintext) for pole_id, plaintext in messages]
+    seal_rate = rate(len(messages), start)
+
+    by_pole = {pole_id: [] for pole_id in pole_ids}
+    for pole_id, plaintext in messages:
+        by_pole[pole_id].append(plaintext)
+    bulk_sealers = {pole_id: ReportSealer(pole_id, backend=backend) for pole_id in pole_ids}
+    start = time.perf_counter()
+    for pole_id, plaintexts in by_pole.items():
+        bulk_sealers[pole_id].seal_many(plaintexts)
+    bulk_rate = rate(len(messages), start)
+
+    opener = ReportOpener(backend=backend)
+    start = time.perf_counter()
+    opened = [opener.open(data) for data in datagrams]
+    open_rate = rate(len(messages), start)
+    assert opened == [plaintext for _, plaintext in messages]
+    return seal_rate, bulk_rate, open_rate, len(datagrams[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--poles", type=int, default=64)
+    args = parser.parse_args()
+
+    backends = ["cryptography", "pycryptodome"] if AESGCM is not None else ["pycryptodome"]
+    for backend in backends:
+        check_replay_rejection(backend)
+        print(f"[bench] {backend}: replay rejection checks passed")
+    if AESGCM is None:
+        print("[bench] cryptography is not installed; only the pycryptodome backend is timed")
+
+    messages = make_plaintexts(args.messages, args.poles)
+    rows = [("legacy", bench_legacy(messages))]
+    rows += [(backend, bench_backend(messages, backend)) for backend in backends]
+
+    legacy_seal_rate = rows[0][1][0]
+    print(f"[bench] {args.messages} binary reports from {args.poles} poles, messages/s")
+    print(f"{'path':<14} {'seal':>10} {'seal_many':>10} {'open':>10} {'datagram':>9} {'seal vs legacy':>15}")
+    for name, (seal_rate, bulk_rate, open_rate, size) in rows:
+        bulk = f"{bulk_rate:>10.0f}" if bulk_rate else f"{'-':>10}"
+        print(f"{name:<14} {seal_rate:>10.0f} {bulk} {open_rate:>10.0f} {size:>7} B "
+              f"{seal_rate / legacy_seal_rate:>14.1f}x")
+
+
+if __name__ == "__main__":
+    main()
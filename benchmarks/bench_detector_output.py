@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+bench_detector_output.py
+
+Cost of analysing a long run's lane-area detector output, DOM vs
+sumo_output.py. A synthetic detector_output.xml is written with --detectors
+detectors reporting every --period s for --hours simulated hours (the
+attributes SUMO 1.2x writes), then each stage runs in its own child process
+so its peak RSS (ru_maxrss) is its own:
+- dom: ET.parse() of the whole file and the per-detector report computed
+  from the tree, as a script would without sumo_output.py
+- convert: sumo_output.convert() streaming the file into a .vdet
+- report: sumo_output.e2_stats() over the memory-mapped .vdet
+- report again (cached): load() + e2_stats() on the XML path, which finds the
+  .vdet already converted
+
+Peak RSS of convert does not grow with --hours; dom does.
+
+Run from the repository root:
+    python -m benchmarks.bench_detector_output [--detectors 400] [--hours 24] [--period 60]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+
+ATTRIBUTES = ('begin="{begin:.2f}" end="{end:.2f}" id="{id}" sampledSeconds="{sampled:.2f}" '
+              'nVehEntered="{entered}" nVehLeft="{left}" nVehSeen="{entered}" meanSpeed="{speed:.2f}" '
+              'meanTimeLoss="8.57" meanOccupancy="{occupancy:.2f}" maxOccupancy="{max_occupancy:.2f}" '
+              'meanMaxJamLengthInVehicles="{jam:.2f}" meanMaxJamLengthInMeters="{jam_m:.2f}" '
+              'maxJamLengthInVehicles="{max_jam}" maxJamLengthInMeters="{max_jam_m:.2f}" '
+              'jamLengthInVehiclesSum="3434" jamLengthInMetersSum="19486.11" '
+              'meanHaltingDuration="{halt:.2f}" maxHaltingDuration="45.30" haltingDurationSum="356.40" '
+              'meanIntervalHaltingDuration="{halt:.2f}" maxIntervalHaltingDuration="45.30" '
+              'intervalHaltingDurationSum="356.40" startedHalts="{halts}" '
+              'meanVehicleNumber="{vehicles:.2f}" maxVehicleNumber="{max_vehicles}"')
+
+
+def write_output(path, detectors, hours, period, seed=42):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n\n<detector>\n')
+        begin = 0.0
+        while begin < hours * 3600:
+            lines = []
+            for d in range(detectors):
+                entered = rng.randint(0, 12)
+                max_jam = rng.randint(0, 6)
+                lines.append("    <interval " + ATTRIBUTES.format(
+                    begin=begin, end=begin + period, id=f"area_{d}", sampled=entered * 30.0,
+                    entered=entered, left=max(0, entered - rng.randint(0, 2)),
+                    speed=rng.uniform(2, 13.9) if entered else -1.0, occupancy=rng.uniform(0, 20),
+                    max_occupancy=rng.uniform(20, 40), jam=max_jam / 2, jam_m=max_jam * 3.5,
+                    max_jam=max_jam, max_jam_m=max_jam * 7.0, halt=rng.uniform(0, 40),
+                    halts=rng.randint(0, 5), vehicles=rng.uniform(0, 5), max_vehicles=rng.randint(0, 8)) + "/>\n")
+            f.write("".join(lines))
+            begin += period
+        f.write("</detector>\n")
+
+
+def stage_dom(xml_path):
+    import numpy as np
+    import xml.etree.ElementTree as ET
+
+    sums = {}
+    for interval in ET.parse(xml_path).getroot().iter("interval"):
+        get = interval.get
+        row = sums.setdefault(get("id"), np.zeros(4))
+        seconds = float(get("end")) - float(get("begin"))
+        row += (seconds, float(get("meanOccupancy")) * seconds, int(get("nVehLeft")),
+                float(get("meanMaxJamLengthInVehicles")) * seconds)
+    return {detector_id: (row[1] / row[0], row[2] / row[0] * 3600, row[3] / row[0])
+            for detector_id, row in sums.items()}
+
+
+def stage_convert(xml_path):
+    import sumo_output
+    return sumo_output.convert(xml_path)[2]
+
+
+def stage_report(xml_path):
+    import sumo_output
+    _, records, ids = sumo_output.open_records(f"{xml_path}.vdet")
+    stats = sumo_output.e2_stats(records, len(ids))
+    return len(stats["flow_veh_h"])
+
+
+def stage_cached(xml_path):
+    import sumo_output
+    _, records, ids = sumo_output.load(xml_path)
+    return len(sumo_output.e2_stats(records, len(ids))["flow_veh_h"])
+
+
+STAGES = {"dom": stage_dom, "convert": stage_convert, "report": stage_report, "cached": stage_cached}
+
+
+def child(stage, xml_path):
+    start = time.perf_counter()
+    result = STAGES[stage](xml_path)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                      "result": len(result) if isinstance(result, dict) else result}))
+
+
+def run_stage(stage, xml_path):
+    output = subprocess.run([sys.executable, "-m", "benchmarks.bench_detector_output", "--child", stage, xml_path],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--detectors", type=int, default=400)
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--period", type=float, default=60, help="Detector freq (s)")
+    parser.add_argument("--child", nargs=2, metavar=("STAGE", "XML"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="bench_detector_output.")
+    try:
+        xml_path = os.path.join(workdir, "detector_output.xml")
+        write_output(xml_path, args.detectors, args.hours, args.period)
+        rows = {stage: run_stage(stage, xml_path) for stage in ("dom", "convert", "report", "cached")}
+        xml_mb = os.path.getsize(xml_path) / 2**20
+        vdet_mb = os.path.getsize(f"{xml_path}.vdet") / 2**20
+    finally:
+        shutil.rmtree(workdir)
+
+    print(f"[bench] {rows['convert']['result']} intervals ({args.detectors} detectors, {args.hours:g} h every "
+          f"{args.period:g} s): {xml_mb:.1f} MB XML -> {vdet_mb:.1f} MB .vdet")
+    print(f"{'stage':<22} {'seconds':>9} {'peak RSS MB':>12}")
+    for stage, label in (("dom", "dom (ET.parse)"), ("convert", "convert (iterparse)"),
+                         ("report", "report (memmap)"), ("cached", "report from XML, cached")):
+        print(f"{label:<22} {rows[stage]['seconds']:>9.3f} {rows[stage]['peak_rss_mb']:>12.1f}")
+    assert rows["dom"]["result"] == rows["report"]["result"] == args.detectors
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+bench_grid.py
+
+Steps/sec of the edge runtime as the network grows: for every --grids size
+(ROWSxCOLS), scenario.py builds a grid with one TLS and four approach
+detectors per intersection, and multi_edge.py --headless --discover drives
+every pole of it for --steps steps, finding the TLS and detectors with TraCI
+(nothing in the runtime knows the grid's ids). Runs start from the state
+--warm-start simulated seconds in, so every grid is already filled with
+traffic; the states are saved before the timed runs.
+
+Per grid it prints SUMO startup and discovery time and, from multi_edge.py's
+own summary, steps/s, pole-steps/s and the ms per step spent in
+simulationStep() and reading the detectors (the rest of a step is control,
+encoding, sealing and sending reports). No fog needs to run; reports go to
+the usual UDP port either way.
+
+Run from the repository root (SUMO_HOME must be set):
+    python -m benchmarks.bench_grid [--grids 1x1,2x2,4x4,7x7,10x10] [--steps 1000]
+"""
+
+import re
+import sys
+import argparse
+import subprocess
+
+from scenario import build_scenario, warm_state
+
+PATTERNS = {
+    "startup_s": r"SUMO started in ([\d.]+) s",
+    "discovery_s": r"Discovered (?:\d+) poles in ([\d.]+) s",
+    "steps_per_s": r"steps in [\d.]+ s = (\d+) steps/s",
+    "pole_steps_per_s": r"(\d+) pole-steps/s",
+    "sim_ms": r"step\+sensor read ([\d.]+) ms/step",
+    "poles": r"Discovered (\d+) poles",
+}
+
+
+def parse_grid(text):
+    rows, cols = text.lower().split("x")
+    return int(rows), int(cols)
+
+
+def run_grid(config, steps, warm_start):
+    cmd = [sys.executable, "multi_edge.py", "--headless", "--discover", "--config", config,
+           "--max-steps", str(steps), "--report-format", "binary"]
+    if warm_start:
+        cmd += ["--warm-start", str(warm_start)]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    output = result.stdout + result.stderr
+    row = {}
+    for name, pattern in PATTERNS.items():
+        match = re.search(pattern, output)
+        if match is None:
+            raise RuntimeError(f"no {name} in multi_edge.py output:\n{output[-2000:]}")
+        row[name] = float(match.group(1))
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grids", default="1x1,2x2,4x4,7x7,10x10", help="Comma-separated ROWSxCOLS sizes")
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--warm-start", type=float, default=300,
+                        help="Simulated seconds of traffic each run starts with (0 = empty network)")
+    args = parser.parse_args()
+
+    print(f"[bench] {args.steps} steps per grid, warm start at {args.warm_start:g} s")
+    print(f"{'grid':>7} {'poles':>6} {'startup s':>10} {'discover s':>11} {'steps/s':>9} "
+          f"{'pole-steps/s':>13} {'sim ms/step':>12}")
+    for grid in args.grids.split(","):
+        rows, cols = parse_grid(grid)
+        config = build_scenario({"rows": rows, "intersections": cols})["config"]
+        if args.warm_start:
+            warm_state(config, args.warm_start)
+        row = run_grid(config, args.steps, args.warm_start)
+        print(f"{grid:>7} {row['poles']:>6.0f} {row['startup_s']:>10.2f} {row['discovery_s']:>11.3f} "
+              f"{row['steps_per_s']:>9.0f} {row['pole_steps_per_s']:>13.0f} {row['sim_ms']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
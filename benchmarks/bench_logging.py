@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+bench_logging.py
+
+Steps/sec of a step loop that logs its report, for each logging mode:
+- print: the old per-step print() straight to the output
+- debug-all: async_logging at DEBUG, every report
+- debug-every-10: async_logging at DEBUG, every 10th step (--log-every 10)
+- debug-on-change: async_logging at DEBUG, reports whose state changed
+- quiet: async_logging at the default INFO level (reports not logged)
+
+The output is a stand-in for a terminal: every write() blocks for at least
+--write-us microseconds (sleep granularity makes it somewhat longer). Each
+step first spends --work-us microseconds of CPU on simulated work (the real
+loop's simulationStep, control, encryption). Lines the logging queue could
+not take are dropped and counted rather than slowing the loop down.
+
+With --edge-steps N, edge1.py is also run headless for N steps with
+--log-level DEBUG and with the default level, writing into a pipe, and the
+steps/s it reports are compared (needs SUMO_HOME).
+
+Run from the repository root:
+    python -m benchmarks.bench_logging [--steps 20000] [--write-us 30] [--edge-steps 5000]
+"""
+
+import io
+import re
+import sys
+import time
+import logging
+import argparse
+import subprocess
+
+from async_logging import ReportSampler, setup_logging, stop_logging
+
+
+class SlowStream(io.TextIOBase):
+    """Discards text; each write() blocks for write_us like a busy terminal (GIL released)."""
+
+    def __init__(self, write_us):
+        self.write_s = write_us / 1e6
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        time.sleep(self.write_s)
+        return len(text)
+
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def make_report(step):
+    return {
+        "pole_id": "pole1",
+        "timestep": step,
+        "north_count": step // 40 % 7,
+        "south_count": step // 55 % 5,
+        "east_count": step // 30 % 9,
+        "west_count": step // 70 % 4,
+        "current_phase": 0 if step // 400 % 2 else 2
+    }
+
+
+def run_loop(mode, steps, work_s, stream):
+    log = logging.getLogger("vanet.bench")
+    if mode != "print":
+        setup_logging("INFO" if mode == "quiet" else "DEBUG", stream=stream)
+    sampler = {"debug-every-10": ReportSampler(10), "debug-on-change": ReportSampler(0, on_change=True)}.get(
+        mode, ReportSampler(1))
+    log_reports = log.isEnabledFor(logging.DEBUG)
+
+    start = time.perf_counter()
+    for step in range(1, steps + 1):
+        spin(work_s)
+        report = make_report(step)
+        if mode == "print":
+            print(f"pole1 [step {step}]: sent encrypted report → {report}", file=stream)
+        elif log_reports and sampler.should_log("pole1", step, tuple(report.values())[2:]):
+            log.debug("%s [step %d]: sent encrypted report → %s", "pole1", step, report)
+    loop_s = time.perf_counter() - start
+    dropped = stop_logging()
+    drain_s = time.perf_counter() - start - loop_s
+    return steps / loop_s, dropped, drain_s
+
+
+def edge_steps_per_s(steps, extra):
+    out = subprocess.run([sys.executable, "edge1.py", "--headless", "--max-steps", str(steps)] + extra,
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True).stdout
+    match = re.search(r"= (\d+) steps/s", out)
+    return int(match.group(1)) if match else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--work-us", type=float, default=100, help="Simulated work per step")
+    parser.add_argument("--write-us", type=float, default=30, help="Cost of one write() to the output")
+    parser.add_argument("--edge-steps", type=int, default=0, help="Also time edge1.py for this many steps")
+    args = parser.parse_args()
+
+    print(f"[bench] {args.steps} steps, {args.work_us:g} us work/step, {args.write_us:g} us/write")
+    print(f"{'mode':<16} {'steps/s':>9} {'lines':>7} {'dropped':>8} {'drain at exit':>14}")
+    for mode in ("print", "debug-all", "debug-every-10", "debug-on-change", "quiet"):
+        stream = SlowStream(args.write_us)
+        steps_per_s, dropped, drain_s = run_loop(mode, args.steps, args.work_us / 1e6, stream)
+        # print() writes the text and the newline separately; StreamHandler writes once per record
+        lines = stream.writes // 2 if mode == "print" else stream.writes - (1 if dropped else 0)
+        print(f"{mode:<16} {steps_per_s:>9.0f} {lines:>7} {dropped:>8} {drain_s * 1e3:>11.0f} ms")
+
+    if args.edge_steps:
+        debug = edge_steps_per_s(args.edge_steps, ["--log-level", "DEBUG"])
+        quiet = edge_steps_per_s(args.edge_steps, [])
+        print(f"[bench] edge1.py, {args.edge_steps} steps: {debug} steps/s logging every report, "
+              f"{quiet} steps/s at the default level")
+
+
+if __name__ == "__main__":
+    main()
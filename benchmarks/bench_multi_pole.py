@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+bench_multi_pole.py
+
+Total CPU time and memory of driving the corridor's poles
+- per-pole: one multi_edge.py process (and so one SUMO) per pole, the way
+  edge1.py/edge2.py/edge3.py run today, versus
+- shared: one multi_edge.py process driving every pole from one SUMO.
+
+CPU is user+sys of the whole process tree (runners and their SUMO children),
+from getrusage(RUSAGE_CHILDREN). RSS is the peak of the summed VmRSS of the
+tree, sampled from /proc (Linux only).
+
+Run from the repository root (SUMO_HOME must be set):
+    python -m benchmarks.bench_multi_pole [--max-steps 5000]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+
+def descendants(root_pids):
+    """All live pids descending from root_pids (inclusive), from /proc."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; ppid follows its closing paren
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    found, stack = [], list(root_pids)
+    while stack:
+        pid = stack.pop()
+        found.append(pid)
+        stack.extend(children.get(pid, []))
+    return found
+
+
+def rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def run_mode(commands, interval=0.05):
+    """Run commands concurrently; return (wall s, cpu s, peak summed RSS bytes)."""
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    procs = [subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for cmd in commands]
+    peak_rss = 0
+    while any(proc.poll() is None for proc in procs):
+        peak_rss = max(peak_rss, sum(rss_bytes(pid) for pid in descendants([proc.pid for proc in procs])))
+        time.sleep(interval)
+    wall = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    failed = [cmd for cmd, proc in zip(commands, procs) if proc.returncode]
+    if failed:
+        raise RuntimeError(f"runner failed: {' '.join(failed[0])}")
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return wall, cpu, peak_rss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="configs/corridor.sumocfg")
+    parser.add_argument("--layout", default="configs/corridor.poles.json")
+    parser.add_argument("--max-steps", type=int, default=5000)
+    parser.add_argument("--report-format", choices=["json", "binary"], default="binary")
+    args = parser.parse_args()
+
+    if "SUMO_HOME" not in os.environ:
+        sys.exit("Error: please set SUMO_HOME to your SUMO installation directory.")
+    with open(args.layout) as f:
+        pole_ids = list(json.load(f))
+
+    base = [sys.executable, "multi_edge.py", "--headless", "--config", args.config, "--layout", args.layout,
+            "--max-steps", str(args.max_steps), "--report-format", args.report_format]
+    modes = {
+        "per-pole": [base + ["--poles", pole_id] for pole_id in pole_ids],
+        "shared": [base],
+    }
+
+    print(f"[bench] {len(pole_ids)} poles, {args.max_steps} steps each")
+    print(f"{'mode':<10} {'SUMOs':>6} {'wall':>8} {'cpu':>8} {'peak RSS':>10}")
+    results = {}
+    for name, commands in modes.items():
+        wall, cpu, rss = run_mode(commands)
+        results[name] = (cpu, rss)
+        print(f"{name:<10} {len(commands):>6} {wall:>6.2f} s {cpu:>6.2f} s {rss / 2**20:>6.0f} MiB")
+    (cpu_per, rss_per), (cpu_shared, rss_shared) = results["per-pole"], results["shared"]
+    print(f"[bench] shared SUMO uses {cpu_shared / cpu_per:.0%} of the CPU time "
+          f"and {rss_shared / rss_per:.0%} of the memory of one SUMO per pole")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+bench_recv.py
+
+Fog receive path, before and after preallocated buffers:
+- recvfrom: sock.recvfrom(BUFFER_SIZE) + fog.decrypt_reports(data), the
+  loop run_fog used before (a new bytes object per datagram, plus the
+  decrypted plaintext)
+- recvfrom_into: sock.recvfrom_into() into one reused bytearray and
+  fog.decrypt_reports_into() from a memoryview of it into a reused
+  plaintext buffer, as run_fog does now
+
+For each report format it prints datagrams/sec through receive, decrypt and
+decode, and the heap a single datagram needs on top of what is already
+allocated: tracemalloc's peak while one datagram is handled, averaged over
+--sample datagrams. The report dicts themselves are part of both.
+
+Datagrams are sealed up front and sent over loopback UDP in bursts that fit
+the socket buffer; only the receiving loop is timed. The two paths take
+turns for --repeat passes and the best pass of each is shown.
+
+Run from the repository root:
+    python -m benchmarks.bench_recv [--messages 50000] [--burst 2000] [--poles 64]
+"""
+
+import time
+import socket
+import argparse
+import tracemalloc
+
+import fog
+from fog import BUFFER_SIZE, decrypt_reports, decrypt_reports_into
+from report_codec import FORMATS, encode_report
+from report_crypto import ReportOpener, ReportSealer
+
+
+def build_datagrams(messages, poles, fmt):
+    sealers = [ReportSealer(f"pole{pole}") for pole in range(poles)]
+    return [sealers[i % poles].seal(encode_report({
+        "pole_id": f"pole{i % poles}",
+        "timestep": i // poles + 1,
+        "north_count": i % 7,
+        "south_count": i % 5,
+        "east_count": i % 11,
+        "west_count": i % 3,
+        "current_phase": 0 if i % 40 < 20 else 2
+    }, fmt)) for i in range(messages)]
+
+
+class CopyingReceiver:
+    name = "recvfrom"
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def receive(self):
+        data, addr = self.sock.recvfrom(BUFFER_SIZE)
+        return decrypt_reports(data)
+
+
+class ZeroCopyReceiver:
+    name = "recvfrom_into"
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = bytearray(BUFFER_SIZE)
+        self.view = memoryview(self.buffer)
+        self.plaintext_buffer = memoryview(bytearray(BUFFER_SIZE))
+
+    def receive(self):
+        nbytes, addr = self.sock.recvfrom_into(self.buffer)
+        return decrypt_reports_into(self.view[:nbytes], self.plaintext_buffer)
+
+
+def run_pass(receiver, sender, address, datagrams, burst, traced):
+    """Returns (seconds spent receiving, reports, mean peak bytes per datagram or None)."""
+    # Fresh replay windows, so every pass can reuse the same datagrams
+    fog.opener = ReportOpener()
+    elapsed = 0.0
+    reports = 0
+    peak_total = 0
+    for offset in range(0, len(datagrams), burst):
+        chunk = datagrams[offset:offset + burst]
+        for datagram in chunk:
+            sender.sendto(datagram, address)
+        if traced:
+            for _ in chunk:
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                reports += len(receiver.receive())
+                peak_total += tracemalloc.get_traced_memory()[1] - before
+            continue
+        receive = receiver.receive
+        start = time.perf_counter()
+        for _ in chunk:
+            reports += len(receive())
+        elapsed += time.perf_counter() - start
+    return elapsed, reports, (peak_total / len(datagrams) if traced else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--burst", type=int, default=2000, help="Datagrams sent before each timed drain")
+    parser.add_argument("--poles", type=int, default=64)
+    parser.add_argument("--sample", type=int, default=5000, help="Datagrams traced for the heap measurement")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes per receive path")
+    parser.add_argument("--port", type=int, default=5107)
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+    sock.bind(("127.0.0.1", args.port))
+    # A lost datagram would block the drain forever; fail instead
+    sock.settimeout(2.0)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    address = ("127.0.0.1", args.port)
+
+    print(f"[bench] {args.messages} datagrams from {args.poles} poles, bursts of {args.burst}")
+    print(f"{'format':<8} {'receive path':<14} {'datagrams/s':>12} {'heap/datagram':>14}")
+    for fmt in FORMATS:
+        datagrams = build_datagrams(args.messages, args.poles, fmt)
+        receivers = (CopyingReceiver(sock), ZeroCopyReceiver(sock))
+        best = {}
+        for _ in range(args.repeat):
+            for receiver in receivers:
+                elapsed, reports, _ = run_pass(receiver, sender, address, datagrams, args.burst, False)
+                if reports != len(datagrams):
+                    raise AssertionError(f"{receiver.name}: decoded {reports} of {len(datagrams)} reports")
+                best[receiver.name] = min(elapsed, best.get(receiver.name, elapsed))
+        for receiver in receivers:
+            elapsed = best[receiver.name]
+            tracemalloc.start()
+            _, _, peak = run_pass(receiver, sender, address, datagrams[:args.sample], args.burst, True)
+            tracemalloc.stop()
+            print(f"{fmt:<8} {receiver.name:<14} {len(datagrams) / elapsed:>12.0f} {peak:>12.0f} B")
+
+
+if __name__ == "__main__":
+    main()
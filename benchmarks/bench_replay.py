@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+bench_replay.py
+
+End-to-end benchmark of the edge-to-fog pipeline without SUMO: detector
+counts recorded from a real run (multi_edge.py / edge_template.py
+--record-trace, see replay_trace.py) are replayed through edge_template.py's
+own code, with replay_trace.ReplayTraCI standing in for TraCI:
+    simulationStep -> get_sensor_counts (subscriptions) ->
+    control_traffic_light -> encrypt_report -> send_datagram
+for --poles poles (the trace's poles in turn, see replay_trace.py), and
+received by a fog loop in a child process that runs fog.py's receive path
+(recvfrom_into + decrypt_reports_into).
+
+--rate paces the steps (steps/s of every pole together, 0 = as fast as
+possible), so latency can be measured below saturation. Inputs are fixed, so
+every run sends the same reports: the digest of the phases the fog decoded
+must match the edge's (and, with --expect-digest, a known value), so a change
+to the controller or codec that alters behaviour is caught along with one
+that slows it down.
+
+Prints end-to-end throughput (reports decoded by the fog per second), the
+latency from the start of a step to the fog having decoded a pole's report
+(p50/p95/p99/max; both sides read CLOCK_MONOTONIC), CPU time of the edge and
+fog processes per report, and per-stage timings of both loops (stage_timer.py).
+None of the edge stages block, so their time is CPU time; the fog's recv
+includes waiting for datagrams.
+
+Run from the repository root (SUMO is not needed):
+    python -m benchmarks.bench_replay [--trace benchmarks/traces/corridor.vtrc] [--poles 64] [--rate 0]
+"""
+
+import os
+import sys
+import time
+import socket
+import hashlib
+import argparse
+import multiprocessing
+from array import array
+
+import numpy as np
+
+import fog
+from report_codec import FORMATS, FORMAT_BINARY, pole_index_from_id
+from report_crypto import ReportSealer
+from replay_trace import APPROACHES, ReplayTraCI, install, open_trace
+from stage_timer import StageTimer
+
+DEFAULT_TRACE = "benchmarks/traces/corridor.vtrc"
+FOG_IDLE_TIMEOUT_S = 2.0
+FOG_RCVBUF = 8 * 1024 * 1024
+
+
+def load_edge(report_format, replay):
+    """Import edge_template against the stand-in TraCI."""
+    install(replay)
+    # edge_template checks SUMO_HOME before `import traci`, which now finds the stand-in
+    os.environ.setdefault("SUMO_HOME", "")
+    # edge_template parses its own command line at import time
+    _argv, sys.argv = sys.argv, [sys.argv[0], "--pole-id", "pole1", "--headless",
+                                 "--report-format", report_format]
+    try:
+        import edge_template
+    finally:
+        sys.argv = _argv
+    return edge_template
+
+
+def phase_digest(phases):
+    return hashlib.sha256(np.ascontiguousarray(phases, dtype=np.int8).tobytes()).hexdigest()[:16]
+
+
+# ————————————————
+# Fog (child process)
+# ————————————————
+def run_fog_child(conn, expected, steps, n_poles):
+    """fog.run_fog's receive loop on an ephemeral port, recording when each report was decoded."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, FOG_RCVBUF)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(FOG_IDLE_TIMEOUT_S)
+    conn.send(sock.getsockname()[1])
+
+    buffer = bytearray(fog.BUFFER_SIZE)
+    view = memoryview(buffer)
+    plaintext_buffer = memoryview(bytearray(fog.BUFFER_SIZE))
+    timer = StageTimer()
+    pole_index = {}
+    decoded_ns = array("q")
+    timesteps = array("q")
+    phases = np.full((steps, n_poles), -1, dtype=np.int8)
+    errors = 0
+
+    cpu_start = time.process_time()
+    while len(decoded_ns) < expected:
+        timer.start()
+        try:
+            nbytes, addr = sock.recvfrom_into(buffer)
+        except socket.timeout:
+            break
+        timer.lap("recv")
+        try:
+            reports = fog.decrypt_reports_into(view[:nbytes], plaintext_buffer)
+        except Exception:
+            errors += 1
+            continue
+        timer.lap("decrypt+decode")
+        now = time.perf_counter_ns()
+        for report in reports:
+            pole_id = report["pole_id"]
+            k = pole_index.get(pole_id)
+            if k is None:
+                k = pole_index[pole_id] = pole_index_from_id(pole_id) - 1
+            decoded_ns.append(now)
+            timesteps.append(report["timestep"])
+            phases[report["timestep"] - 1, k] = report["current_phase"]
+        timer.lap("record")
+    conn.send({"cpu_s": time.process_time() - cpu_start, "decoded_ns": decoded_ns, "timesteps": timesteps,
+               "phases": phases, "errors": errors, "timer": timer})
+    sock.close()
+
+
+# ————————————————
+# Edge (this process)
+# ————————————————
+def run_edge(edge, replay, pole_ids, steps, rate, timer):
+    """
+    Drive every pole through edge_template's step functions for steps steps.
+    Returns (step start ns per step, phases (steps, poles), cpu s, late steps).
+    """
+    n_poles = len(pole_ids)
+    sealers = [ReportSealer(pole_id) for pole_id in pole_ids]
+    durations = [dict.fromkeys(APPROACHES, 0) for _ in pole_ids]
+    current = [0] * n_poles
+    step_start_ns = np.zeros(steps, dtype=np.int64)
+    phases = np.zeros((steps, n_poles), dtype=np.int8)
+
+    def select(k):
+        # edge_template keeps one pole's state in module globals
+        edge.approach_red_durations = durations[k]
+        edge.TLS_ID = replay.tls_ids[k]
+        edge.DETECTOR_IDS = replay.detector_ids[k]
+        edge.SEALER = sealers[k]
+
+    for k in range(n_poles):
+        select(k)
+        edge.setup_sensor_subscriptions()
+
+    late = 0
+    cpu_start = time.process_time()
+    run_start = time.perf_counter()
+    for step in range(1, steps + 1):
+        if rate:
+            delay = run_start + (step - 1) / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                late += 1
+        step_start_ns[step - 1] = time.perf_counter_ns()
+        timer.start()
+        replay.simulationStep()
+        timer.lap("simulationStep")
+        for k in range(n_poles):
+            select(k)
+            timer.start()
+            north_count, south_count, east_count, west_count = edge.get_sensor_counts()
+            timer.lap("sensors")
+            current[k] = edge.control_traffic_light(north_count, south_count, east_count, west_count, current[k])
+            timer.lap("control")
+            datagram = edge.encrypt_report({
+                "pole_id": pole_ids[k],
+                "timestep": step,
+                "north_count": north_count,
+                "south_count": south_count,
+                "east_count": east_count,
+                "west_count": west_count,
+                "current_phase": current[k]
+            })
+            timer.lap("encode+encrypt")
+            edge.send_datagram(datagram)
+            timer.lap("sendto")
+        phases[step - 1] = current
+    return step_start_ns, phases, time.process_time() - cpu_start, late
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trace", default=DEFAULT_TRACE, help="Trace written with --record-trace")
+    parser.add_argument("--poles", type=int, default=0, help="Poles to simulate (0 = the trace's)")
+    parser.add_argument("--steps", type=int, default=0, help="Steps to replay (0 = the trace's length)")
+    parser.add_argument("--rate", type=float, default=0, help="Steps per second (0 = as fast as possible)")
+    parser.add_argument("--report-format", choices=FORMATS, default=FORMAT_BINARY)
+    parser.add_argument("--expect-digest", default=None,
+                        help="Exit with an error unless the fog's phase digest equals this value")
+    args = parser.parse_args()
+
+    counts, meta = open_trace(args.trace)
+    replay = ReplayTraCI(counts, args.poles or None, args.steps or None)
+    steps, n_poles = replay.steps, replay.n_poles
+    pole_ids = [f"pole{k}" for k in range(1, n_poles + 1)]
+    edge = load_edge(args.report_format, replay)
+
+    conn, child_conn = multiprocessing.Pipe()
+    fog_process = multiprocessing.Process(target=run_fog_child, args=(child_conn, steps * n_poles, steps, n_poles))
+    fog_process.start()
+    edge.UDP_PORT = conn.recv()
+    edge.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, FOG_RCVBUF)
+
+    timer = StageTimer()
+    step_start_ns, edge_phases, edge_cpu, late = run_edge(edge, replay, pole_ids, steps, args.rate, timer)
+    result = conn.recv()
+    fog_process.join()
+
+    sent = steps * n_poles
+    decoded_ns = np.frombuffer(result["decoded_ns"], dtype=np.int64)
+    timesteps = np.frombuffer(result["timesteps"], dtype=np.int64)
+    decoded = len(decoded_ns)
+    pace = f"{args.rate:g} steps/s" if args.rate else "as fast as possible"
+    print(f"[bench] replay of {args.trace} ({counts.shape[1]} poles, {counts.shape[0]} steps): "
+          f"{n_poles} poles x {steps} steps, {pace}, {args.report_format} reports")
+    if not decoded:
+        sys.exit(f"[bench] the fog decoded none of {sent} reports ({result['errors']} errors)")
+    elapsed = (decoded_ns.max() - step_start_ns[0]) / 1e9
+    print(f"[bench] end-to-end: {decoded} of {sent} reports decoded ({sent - decoded} lost, "
+          f"{result['errors']} errors) in {elapsed:.2f} s = {decoded / elapsed:.0f} reports/s "
+          f"({timesteps.max() / elapsed:.0f} steps/s)" + (f", {late} steps started late" if args.rate else ""))
+    latency_us = (decoded_ns - step_start_ns[timesteps - 1]) / 1e3
+    p50, p95, p99 = np.percentile(latency_us, [50, 95, 99])
+    print(f"[bench] latency step start -> fog decoded: p50 {p50:.0f} us, p95 {p95:.0f} us, "
+          f"p99 {p99:.0f} us, max {latency_us.max():.0f} us")
+    print(f"[bench] cpu: edge {edge_cpu:.2f} s ({edge_cpu / sent * 1e6:.1f} us/report), "
+          f"fog {result['cpu_s']:.2f} s ({result['cpu_s'] / decoded * 1e6:.1f} us/report)")
+    print("[bench] edge stages:")
+    timer.report("  ")
+    print("[bench] fog stages:")
+    result["timer"].report("  ")
+
+    edge_digest, fog_digest = phase_digest(edge_phases), phase_digest(result["phases"])
+    phase_changes = int((np.diff(edge_phases, axis=0, prepend=0) != 0).sum())
+    if fog_digest != edge_digest:
+        sys.exit(f"[bench] phase digest: edge {edge_digest}, fog {fog_digest} (reports lost or corrupted)")
+    print(f"[bench] phase digest {fog_digest} (edge and fog agree, {phase_changes} phase changes, "
+          f"{replay.phase_calls} setPhase calls)")
+    if args.expect_digest and fog_digest != args.expect_digest:
+        sys.exit(f"[bench] phase digest {fog_digest} != expected {args.expect_digest}: behaviour changed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+bench_scenario.py
+
+Startup cost of a pole's simulation, old vs scenario.py:
+- build: scenario.build_scenario() generating the files (netconvert
+  included) into an empty cache, against finding them in the cache
+- start: traci.start() against scenario.start_sumo() for the same config,
+  from launching SUMO to a connected TraCI client
+- ramp-up: reaching --warm-start simulated seconds by starting empty and
+  simulating them, against starting from the saved state
+  (scenario.warm_state(), built once beforehand, then --load-state), both
+  launched with start_sumo(); the vehicle count after the first step shows
+  both start from a filled network
+
+Each start is timed --repeat times; the median is shown.
+
+Run from the repository root (SUMO_HOME must be set):
+    python -m benchmarks.bench_scenario [--intersections 3] [--warm-start 300] [--repeat 5]
+"""
+
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+from scenario import build_scenario, import_traci, start_sumo, sumo_command, warm_state
+
+SUMO_FLAGS = ["--no-step-log", "--no-warnings"]
+
+
+def median_time(fn, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--intersections", type=int, default=3)
+    parser.add_argument("--warm-start", type=float, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    traci = import_traci()
+
+    cache_dir = tempfile.mkdtemp(prefix="bench_scenario.")
+    try:
+        params = {"intersections": args.intersections}
+        build_cold = time.perf_counter()
+        scenario = build_scenario(params, cache_dir)
+        build_cold = time.perf_counter() - build_cold
+        build_cached, cached = median_time(lambda: build_scenario(params, cache_dir), args.repeat)
+        assert cached["cached"] and cached["config"] == scenario["config"]
+        config = scenario["config"]
+
+        def start_close(start, cmd):
+            start(cmd)
+            traci.close()
+
+        cmd = sumo_command("sumo", config) + SUMO_FLAGS
+        traci_start, _ = median_time(lambda: start_close(traci.start, cmd), args.repeat)
+        fast_start, _ = median_time(lambda: start_close(start_sumo, cmd), args.repeat)
+
+        def ramp_up(state):
+            start_sumo(sumo_command("sumo", config, state) + SUMO_FLAGS)
+            if state is None:
+                traci.simulationStep(args.warm_start)
+            traci.simulationStep()
+            vehicles = traci.vehicle.getIDCount()
+            traci.close()
+            return vehicles
+
+        state_build = time.perf_counter()
+        state = warm_state(config, args.warm_start, cache_dir)
+        state_build = time.perf_counter() - state_build
+        cold_ramp, cold_vehicles = median_time(lambda: ramp_up(None), args.repeat)
+        warm_ramp, warm_vehicles = median_time(lambda: ramp_up(state), args.repeat)
+    finally:
+        shutil.rmtree(cache_dir)
+
+    print(f"[bench] corridor of {args.intersections} intersections, median of {args.repeat}")
+    print(f"{'stage':<34} {'before':>10} {'after':>10}")
+    print(f"{'build (generate vs cache hit)':<34} {build_cold * 1e3:>8.1f}ms {build_cached * 1e3:>8.1f}ms")
+    print(f"{'start (traci.start vs start_sumo)':<34} {traci_start * 1e3:>8.1f}ms {fast_start * 1e3:>8.1f}ms")
+    print(f"{f'start + {args.warm_start:g} s ramp-up vs state':<34} {cold_ramp * 1e3:>8.1f}ms {warm_ramp * 1e3:>8.1f}ms")
+    print(f"[bench] vehicles after the first step: {cold_vehicles} simulated, {warm_vehicles} from the state "
+          f"(saving it took {state_build:.2f} s once)")
+
+
+if __name__ == "__main__":
+    main()
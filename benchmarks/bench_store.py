@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+bench_store.py
+
+Append and query latency of fog_store.PoleStore at fleet scale.
+
+Fills the store for --poles poles round-robin (one report per pole per step,
+like a fog receiving every pole at 10 Hz), then times:
+- append: one report into its pole's ring buffer
+- window_stats: aggregates of one pole over the last --window steps
+- window_stats_all: aggregates of every pole over the last --window steps
+
+The vectorized all-poles query is checked against the per-pole one first.
+
+Run from the repository root:
+    python -m benchmarks.bench_store [--poles 1000] [--steps 3000] [--window 600]
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from fog_store import APPROACHES, PoleStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--poles", type=int, default=1000)
+    parser.add_argument("--steps", type=int, default=3000, help="Steps appended per pole")
+    parser.add_argument("--capacity", type=int, default=3000, help="Ring buffer length per pole")
+    parser.add_argument("--window", type=int, default=600, help="Query window in steps")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    store = PoleStore(capacity=args.capacity)
+    pole_ids = [f"pole{i}" for i in range(args.poles)]
+    rng = np.random.default_rng(0)
+    counts = rng.integers(0, 12, size=(args.steps, 4)).tolist()
+
+    start = time.perf_counter_ns()
+    for step in range(args.steps):
+        n, s, e, w = counts[step]
+        phase = 0 if step % 400 < 200 else 2
+        for pole_id in pole_ids:
+            store.append_values(pole_id, step, n, s, e, w, phase)
+    appends = args.steps * args.poles
+    append_ns = (time.perf_counter_ns() - start) / appends
+
+    # Vectorized aggregates must agree with the per-pole path
+    all_stats = store.window_stats_all(args.window)
+    for row in (0, args.poles // 2, args.poles - 1):
+        single = store.window_stats(pole_ids[row], args.window)
+        expected = [single["mean_queue"][a] for a in APPROACHES]
+        assert np.allclose(all_stats["mean_queue"][row], expected, atol=1e-3)
+        assert all_stats["max_queue"][row].tolist() == [single["max_queue"][a] for a in APPROACHES]
+        assert abs(all_stats["phase_change_rate"][row] - single["phase_change_rate"]) < 1e-9
+
+    start = time.perf_counter_ns()
+    for i in range(args.queries):
+        store.window_stats(pole_ids[i % args.poles], args.window)
+    single_us = (time.perf_counter_ns() - start) / args.queries / 1e3
+
+    start = time.perf_counter_ns()
+    for _ in range(max(1, args.queries // 20)):
+        store.window_stats_all(args.window)
+    all_ms = (time.perf_counter_ns() - start) / max(1, args.queries // 20) / 1e6
+
+    print(f"[store] {args.poles} poles x {args.capacity} steps capacity: {store.nbytes() / 2**20:.1f} MiB")
+    print(f"[store] append: {append_ns:.0f} ns/report ({appends} reports)")
+    print(f"[store] window_stats (1 pole, {args.window} steps): {single_us:.1f} us")
+    print(f"[store] window_stats_all ({args.poles} poles, {args.window} steps): {all_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
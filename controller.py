@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+controller.py
+
+Vectorized version of edge_template.control_traffic_light for K
+intersections at once.
+
+Per-intersection state (how many consecutive steps each approach has been
+'red') lives in one (K, 4) NumPy array instead of a global dict, and
+next_phases() decides every intersection with a handful of array operations
+instead of building and sorting candidate lists per intersection.
+
+Decision rule, identical to control_traffic_light:
+- An approach is 'red' when its detector count is above RED_THRESHOLD (or
+  the red_threshold given to PhaseController); its red duration then grows
+  by one, otherwise it resets to 0.
+- Among red approaches, the one with the longest red duration wins, ties
+  broken N > E > S > W. control_traffic_light first looks at approaches red
+  for more than 5 steps and only then at all red ones, but the long-red
+  approaches are always the longest-red ones, so a single argmax over the
+  red approaches picks the same winner. For the same reason the long-red
+  limit never changes a decision, so it is not a parameter here.
+- North/south winners give phase 0 (N-S green), east/west winners phase 2.
+- With no red approach: the axis with the larger max count gets green; on a
+  tie the phase is kept, except with no traffic at all, which gives phase 0.
+
+Columns are ordered like edge_template.DETECTOR_IDS: north, south, east, west.
+
+Parity with control_traffic_light and throughput for K=1..10000 are checked
+by benchmarks/bench_controller.py.
+"""
+
+import numpy as np
+
+APPROACHES = ("north", "south", "east", "west")
+RED_THRESHOLD = 5  # an approach is 'red' above this many vehicles
+
+PHASE_NS_GREEN = 0
+PHASE_EW_GREEN = 2
+
+# N > E > S > W, as a tie-break bonus per column (higher wins)
+_PRIORITY_BONUS = np.array([3, 1, 2, 0], dtype=np.int64)
+
+
+class PhaseController:
+    def __init__(self, intersections, red_threshold=RED_THRESHOLD):
+        self.intersections = intersections
+        self.red_threshold = red_threshold
+        self.red_durations = np.zeros((intersections, len(APPROACHES)), dtype=np.int64)
+
+    def reset(self):
+        self.red_durations[:] = 0
+
+    def next_phases(self, counts, current_phases):
+        """
+        counts: (K, 4) vehicle counts (N, S, E, W); current_phases: (K,) phase indices.
+        Updates the red durations and returns the (K,) phases to set.
+        """
+        counts = np.asarray(counts)
+        current_phases = np.asarray(current_phases)
+        red = counts > self.red_threshold
+        durations = self.red_durations
+        durations += 1
+        durations *= red
+
+        # Longest red duration first, then approach priority; -1 marks "not red"
+        score = np.where(red, durations * 4 + _PRIORITY_BONUS, -1)
+        winner = score.argmax(axis=1)
+        red_phase = np.where(winner < 2, PHASE_NS_GREEN, PHASE_EW_GREEN)
+
+        max_ns = np.maximum(counts[:, 0], counts[:, 1])
+        max_ew = np.maximum(counts[:, 2], counts[:, 3])
+        fallback = np.where(max_ns > max_ew, PHASE_NS_GREEN,
+                            np.where(max_ew > max_ns, PHASE_EW_GREEN,
+                                     np.where((counts == 0).all(axis=1), PHASE_NS_GREEN, current_phases)))
+
+        return np.where(red.any(axis=1), red_phase, fallback)
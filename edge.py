@@ -4,17 +4,27 @@ edge.py:
   - Launches SUMO via TraCI 
   - Each simulation step, reads induction loop counts (per sensor) 
   - Controls traffic light based on sensor counts
-  - Encrypts the JSON report with AES-GCM 
+  - Encrypts the JSON report with AES-GCM (report_crypto.py)
   - Sends the ciphertext over UDP to the fog at localhost:5005
+  - Logs through a background writer thread (async_logging.py); sent reports
+    are only logged with --log-level DEBUG, sampled by --log-every/--log-on-change
 """
 
 import os
 import sys
 import json
 import socket
+import logging
+import argparse
 import traci
-from Crypto.Cipher import AES
-from Crypto.Random import get_random_bytes
+import traci.constants as tc
+from report_crypto import ReportSealer
+from report_delta import report_state
+from async_logging import ReportSampler, add_logging_args, setup_from_args
+
+log = logging.getLogger("vanet.edge")
+# Replaced from the --log-* flags when run as a script
+report_sampler = ReportSampler()
 
 # Global state for tracking how long each approach detector has been 'red'
 approach_red_durations = {
@@ -44,20 +54,22 @@ SUMO_BINARY = "sumo-gui"   # Changed to sumo-gui to see the simulation
 # Path to the configuration file
 SUMO_CONFIG = "configs/intersection.sumocfg"
 
+# Read detectors through TraCI subscriptions (one round trip per step);
+# set to False to poll each detector individually
+USE_SUBSCRIPTIONS = True
+
 # ————————————————
-# 2) Encryption setup (AES-GCM with a 16-byte key)
+# 2) Encryption setup (AES-GCM, key derived for this edge from the master secret)
 # ————————————————
-KEY = b'0123456789abcdef'   # 16-byte (128-bit) symmetric key; keep this secret!
+SEALER = ReportSealer("edge")
 
 def encrypt_report(report_dict):
     """
     Encrypt a JSON-serializable dictionary with AES-GCM.
-    Returns: nonce || tag || ciphertext bytes
+    Returns the datagram (see report_crypto.py for the layout)
     """
     plaintext = json.dumps(report_dict).encode('utf-8')
-    cipher = AES.new(KEY, AES.MODE_GCM)
-    ciphertext, tag = cipher.encrypt_and_digest(plaintext)
-    return cipher.nonce + tag + ciphertext
+    return SEALER.seal(plaintext)
 
 # ————————————————
 # 3) UDP socket (to send to fog)
@@ -70,8 +82,25 @@ sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 # ————————————————
 # 4) Traffic Light Control
 # ————————————————
+# Area detectors that cover entire approaches, in (north, south, east, west) order
+DETECTOR_IDS = [
+    "area_north_approach_0_350",
+    "area_south_approach_0_350",
+    "area_east_approach_0_350",
+    "area_west_approach_0_350",
+]
+
+def setup_sensor_subscriptions():
+    # SUMO pushes subscribed values back with every simulationStep() reply
+    for detector_id in DETECTOR_IDS:
+        traci.lanearea.subscribe(detector_id, [tc.LAST_STEP_VEHICLE_NUMBER])
+
 def get_sensor_counts():
     # Get counts from area detectors that cover entire approaches
+    if USE_SUBSCRIPTIONS:
+        results = traci.lanearea.getAllSubscriptionResults()
+        return tuple(results[detector_id][tc.LAST_STEP_VEHICLE_NUMBER] for detector_id in DETECTOR_IDS)
+
     # Updated to use traci.areal and new detector IDs
     north_count = traci.lanearea.getLastStepVehicleNumber("area_north_approach_0_350")
     south_count = traci.lanearea.getLastStepVehicleNumber("area_south_approach_0_350")
@@ -91,7 +120,7 @@ def set_polygon_color_based_on_count(polygon_id, count):
     try:
         traci.polygon.setColor(polygon_id, color)
     except traci.TraCIException as e:
-        print(f"Edge: Error setting color for {polygon_id}: {e}")
+        log.error(f"Edge: Error setting color for {polygon_id}: {e}")
 
 def control_traffic_light(north_count, south_count, east_count, west_count, current_phase_index):
     global approach_red_durations
@@ -157,7 +186,7 @@ def control_traffic_light(north_count, south_count, east_count, west_count, curr
         try:
             traci.trafficlight.setPhase("center", next_phase_to_set)
         except traci.TraCIException as e:
-            print(f"Edge: Error setting TLS phase for center: {e}")
+            log.error(f"Edge: Error setting TLS phase for center: {e}")
         return next_phase_to_set
     
     return current_phase_index
@@ -169,26 +198,32 @@ def run_edge():
     # 1) Start SUMO via TraCI
     sumo_cmd = [SUMO_BINARY, "-c", SUMO_CONFIG]
     traci.start(sumo_cmd, label="edge_sim")
-    print("Edge: SUMO started, stepping through simulation...")
+    log.info("Edge: SUMO started, stepping through simulation...")
 
     # Initialize traffic light state
     current_phase_value = 0  # Start with N-S green (Phase 0)
     try:
         traci.trafficlight.setPhase("center", current_phase_value)
-        print(f"Edge: Initial TLS phase set to {current_phase_value} for center")
+        log.info(f"Edge: Initial TLS phase set to {current_phase_value} for center")
     except traci.TraCIException as e:
-        print(f"Edge: Error setting initial TLS phase for center: {e}")
+        log.error(f"Edge: Error setting initial TLS phase for center: {e}")
 
     # Diagnostic: Check loaded polygon IDs
     try:
         all_polygon_ids = traci.polygon.getIDList()
-        print(f"Edge: Loaded polygon IDs: {all_polygon_ids}")
+        log.info(f"Edge: Loaded polygon IDs: {all_polygon_ids}")
         expected_polygons = ["poly_north_approach_strip", "poly_south_approach_strip", "poly_east_approach_strip", "poly_west_approach_strip"]
         for p_id in expected_polygons:
             if p_id not in all_polygon_ids:
-                print(f"Edge: WARNING - Expected polygon '{p_id}' not found in loaded IDs!")
+                log.warning(f"Edge: Expected polygon '{p_id}' not found in loaded IDs!")
     except traci.TraCIException as e:
-        print(f"Edge: Error getting polygon ID list: {e}")
+        log.error(f"Edge: Error getting polygon ID list: {e}")
+
+    if USE_SUBSCRIPTIONS:
+        setup_sensor_subscriptions()
+
+    # Checked once; at the default INFO level report lines cost nothing per step
+    log_reports = log.isEnabledFor(logging.DEBUG)
 
     step = 0
     while traci.simulation.getMinExpectedNumber() > 0:
@@ -214,7 +249,8 @@ def run_edge():
         # Encrypt and send
         encrypted_msg = encrypt_report(report)
         sock.sendto(encrypted_msg, (UDP_IP, UDP_PORT))
-        print(f"Edge [step {step}]: sent encrypted report → {report}")
+        if log_reports and report_sampler.should_log("edge", step, report_state(report)):
+            log.debug("Edge [step %d]: sent encrypted report → %s", step, report, extra={"report": report})
 
         # Update detector colors
         set_polygon_color_based_on_count("poly_north_approach_strip", north_count)
@@ -223,7 +259,10 @@ def run_edge():
         set_polygon_color_based_on_count("poly_west_approach_strip", west_count)
 
     traci.close()
-    print("Edge: Simulation ended.")
+    log.info("Edge: Simulation ended.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_logging_args(parser)
+    report_sampler = setup_from_args(parser.parse_args())
     run_edge()
\ No newline at end of file
@@ -1,6 +1,6 @@
 import sys
-sys.argv = [sys.argv[0], "--pole-id", "pole3"]
-from edge_template import run_edge
+sys.argv = [sys.argv[0], "--pole-id", "pole3"] + sys.argv[1:]
+from edge_template import main
 
 if __name__ == "__main__":
-    run_edge()
\ No newline at end of file
+    main()
\ No newline at end of file
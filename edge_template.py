@@ -2,28 +2,113 @@
 """
 edge_template.py
 
-- Launches a SUMO instance (via TraCI).
-- Each simulation step, reads 4 induction-loop counts.
+- Launches a SUMO instance (via TraCI); --headless runs plain 'sumo' without
+  polygon coloring so long scenarios replay at full CPU speed.
+- Finds its TLS and the lane-area detector (and GUI polygon) of each
+  approach with TraCI at startup (tls_discovery.py), so any --config runs
+  without hard-wired ids: --tls picks the TLS, else the only TLS, else the one
+  discovery numbers as --pole-id (pole3 = third TLS in natural id order).
+- Each simulation step, reads 4 induction-loop counts (via TraCI subscriptions,
+  or by polling each detector with --poll-sensors).
 - Controls the traffic light (TLS) based on local counts (adaptive logic).
-- Assembles a JSON including 'pole_id'.
-- Encrypts JSON report with AES-GCM.
-- Sends ciphertext via UDP to fog (localhost:5005).
+- Assembles a report including 'pole_id', encoded as JSON or, with
+  --report-format binary, as a compact fixed-layout struct (report_codec.py).
+- Encrypts the report with AES-GCM under this pole's own key, derived from
+  the master secret (report_crypto.py).
+- Sends ciphertext via UDP to fog (localhost:5005); --batch-steps/--batch-ms
+  coalesce several steps into one datagram (report_batcher.py), and --delta
+  only sends reports whose counts or phase changed (report_delta.py).
+- --stage-timing records latency percentiles of every stage of the step loop
+  (stage_timer.py), printed at exit and on SIGUSR1; --profile-out FILE runs
+  the whole edge under cProfile.
+- With --fog-control, applies phase commands a fog running --coordinate
+  sends back, falling back to the local logic when none arrived within
+  --command-timeout-ms; command latency is reported at exit (fog_control.py).
+- --warm-start S starts SUMO from a cached state S simulated seconds in
+  instead of an empty network (scenario.py).
+- --record-trace FILE saves every step's detector counts for
+  benchmarks/bench_replay.py, which replays them without SUMO (replay_trace.py).
+- Logs through a background writer thread (async_logging.py); sent reports
+  are only logged with --log-level DEBUG, sampled by --log-every/--log-on-change.
 """
 
 import os
 import sys
-import json
+import time
+import signal
+import logging
 import socket
 import argparse
-from Crypto.Cipher import AES
-from Crypto.Random import get_random_bytes
+from report_codec import FORMATS, FORMAT_JSON, FORMAT_BINARY, encode_report, pole_index_from_id
+from report_batcher import MAX_MTU, ReportBatcher
+from report_crypto import ReportSealer
+from report_delta import DeltaFilter, report_state
+from fog_control import COMMAND_TIMEOUT_MS, CommandReceiver
+from stage_timer import NULL_TIMER, StageTimer
+from async_logging import add_logging_args, setup_from_args
+from scenario import start_sumo, sumo_command, warm_state
+from tls_discovery import discover_layout
+from replay_trace import TraceWriter
 
 # Parse command-line arguments: pole_id (string)
 parser = argparse.ArgumentParser()
 parser.add_argument("--pole-id", required=True,
                     help="Unique identifier for this traffic pole (e.g. pole1)")
+parser.add_argument("--config", default="configs/intersection.sumocfg",
+                    help="SUMO configuration; the TLS and detectors are discovered in it")
+parser.add_argument("--tls", default=None,
+                    help="TLS this pole controls (default: the only one, or the --pole-id'th one)")
+parser.add_argument("--poll-sensors", action="store_true",
+                    help="Read detectors with one TraCI call each instead of subscriptions")
+parser.add_argument("--headless", action="store_true",
+                    help="Run plain 'sumo' instead of 'sumo-gui' and skip polygon coloring")
+parser.add_argument("--max-steps", type=int, default=0,
+                    help="Stop after this many steps (0 = run until the simulation ends)")
+parser.add_argument("--report-format", choices=FORMATS, default=FORMAT_JSON,
+                    help="Plaintext encoding of each report (binary needs a 'pole<N>' id)")
+parser.add_argument("--batch-steps", type=int, default=1,
+                    help="Send one datagram per this many steps (1 = every step)")
+parser.add_argument("--batch-ms", type=float, default=0,
+                    help="Also flush a batch once its oldest report is this many ms old (0 = off)")
+parser.add_argument("--mtu", type=int, default=1500,
+                    help=f"Keep each datagram (plus IP/UDP headers) within this many bytes (at most {MAX_MTU})")
+parser.add_argument("--delta", action="store_true",
+                    help="Only send a report when a count or the phase changed (plus keyframes)")
+parser.add_argument("--keyframe-steps", type=int, default=50,
+                    help="With --delta, resend the current state after this many unchanged steps "
+                         "(0 = no keyframes, send on change only)")
+parser.add_argument("--stage-timing", action="store_true",
+                    help="Record per-stage latency percentiles of the step loop; printed at exit "
+                         "and on SIGUSR1")
+parser.add_argument("--profile-out", default=None,
+                    help="Run under cProfile and write pstats data to this file")
+parser.add_argument("--fog-control", action="store_true",
+                    help="Apply phase commands from a fog running --coordinate")
+parser.add_argument("--command-timeout-ms", type=float, default=COMMAND_TIMEOUT_MS,
+                    help="With --fog-control, use local control when no command arrived for this long")
+parser.add_argument("--warm-start", type=float, default=0,
+                    help="Start from the SUMO state this many simulated seconds in (cached after the first run)")
+parser.add_argument("--record-trace", default=None,
+                    help="Write every step's detector counts to this trace file (replay_trace.py)")
+add_logging_args(parser)
 args = parser.parse_args()
 POLE_ID = args.pole_id
+USE_SUBSCRIPTIONS = not args.poll_sensors
+HEADLESS = args.headless
+MAX_STEPS = args.max_steps
+REPORT_FORMAT = args.report_format
+if args.keyframe_steps < 0:
+    parser.error("--keyframe-steps must be 0 (no keyframes) or more")
+if args.mtu > MAX_MTU:
+    parser.error(f"--mtu {args.mtu} exceeds {MAX_MTU}, the largest datagram the fog receives whole")
+if REPORT_FORMAT == FORMAT_BINARY:
+    try:
+        pole_index_from_id(POLE_ID)
+    except ValueError as e:
+        parser.error(str(e))
+
+log = logging.getLogger("vanet.edge")
+report_sampler = setup_from_args(args)
 
 # Global state for tracking how long each approach detector has been 'red'
 approach_red_durations = {
@@ -46,29 +131,29 @@ sys.path.append(tools_dir)
 
 # Import TraCI after appending tools
 import traci
+import traci.constants as tc
 
 # SUMO binary (use 'sumo-gui' or 'sumo' depending on whether you want a window)
-SUMO_BINARY = "sumo-gui"
+SUMO_BINARY = "sumo" if HEADLESS else "sumo-gui"
 
-# Path to the configuration file - use the same config for all or create specific ones
-# If you have specific configs for each pole, use: f"configs/intersection{POLE_ID[-1]}.sumocfg"
-# For now, using the same config as your working edge.py:
-SUMO_CONFIG = "configs/intersection.sumocfg"
+# Path to the configuration file; every pole may run the same one (see discover_pole)
+SUMO_CONFIG = args.config
 
 # ————————————————
-# 2) Encryption setup (AES-GCM with a 16-byte key)
+# 2) Encryption setup (AES-GCM, per-pole key derived from the master secret)
 # ————————————————
-KEY = b'0123456789abcdef'   # 16-byte (128-bit) symmetric key; keep this secret!
+SEALER = ReportSealer(POLE_ID)
 
 def encrypt_report(report_dict):
     """
-    Encrypt a JSON-serializable dictionary with AES-GCM.
-    Returns: nonce || tag || ciphertext bytes
+    Encode a report dictionary in REPORT_FORMAT and encrypt it with AES-GCM.
+    Returns the datagram (see report_crypto.py for the layout)
     """
-    plaintext = json.dumps(report_dict).encode('utf-8')
-    cipher = AES.new(KEY, AES.MODE_GCM)
-    ciphertext, tag = cipher.encrypt_and_digest(plaintext)
-    return cipher.nonce + tag + ciphertext
+    return encrypt_plaintext(encode_report(report_dict, REPORT_FORMAT))
+
+def encrypt_plaintext(plaintext):
+    """Encrypt already-encoded report bytes (a single report or a batch)."""
+    return SEALER.seal(plaintext)
 
 # ————————————————
 # 3) UDP socket (to send to fog)
@@ -78,32 +163,118 @@ UDP_PORT = 5005
 
 sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
+def send_datagram(datagram):
+    sock.sendto(datagram, (UDP_IP, UDP_PORT))
+
 # ————————————————
 # 4) Traffic Light Control
 # ————————————————
+# This pole's TLS and the area detectors that cover entire approaches, in
+# (north, south, east, west) order; filled in by discover_pole()
+TLS_ID = None
+DETECTOR_IDS = []
+
+def discover_pole():
+    """Find this pole's TLS, detectors and polygons in the loaded network."""
+    global TLS_ID
+    layout, skipped = discover_layout(traci, polygons=not HEADLESS)
+    if args.tls:
+        poles = [pole for pole in layout.values() if pole["tls"] == args.tls]
+        missing = f"TLS {args.tls!r}: {skipped.get(args.tls, 'not in the network')}"
+    elif len(layout) == 1:
+        poles = list(layout.values())
+    else:
+        poles = [layout[POLE_ID]] if POLE_ID in layout else []
+        missing = f"no TLS for {POLE_ID} among the {len(layout)} discovered; pass --tls"
+    if not poles:
+        raise RuntimeError(missing)
+    TLS_ID = poles[0]["tls"]
+    DETECTOR_IDS[:] = poles[0]["detectors"]
+    POLYGON_IDS[:] = poles[0].get("polygons", [])
+
+def setup_sensor_subscriptions():
+    """
+    Subscribe to the vehicle count of every approach detector once, so SUMO
+    pushes the values back with each simulationStep() reply instead of us
+    asking for them one round trip at a time.
+    """
+    for detector_id in DETECTOR_IDS:
+        traci.lanearea.subscribe(detector_id, [tc.LAST_STEP_VEHICLE_NUMBER])
+
+def poll_sensor_counts():
+    # One TraCI round trip per detector
+    north_count = traci.lanearea.getLastStepVehicleNumber(DETECTOR_IDS[0])
+    south_count = traci.lanearea.getLastStepVehicleNumber(DETECTOR_IDS[1])
+    east_count = traci.lanearea.getLastStepVehicleNumber(DETECTOR_IDS[2])
+    west_count = traci.lanearea.getLastStepVehicleNumber(DETECTOR_IDS[3])
+
+    return north_count, south_count, east_count, west_count
+
+def read_subscribed_counts():
+    # Results arrived with the last simulationStep(); no socket traffic here
+    results = traci.lanearea.getAllSubscriptionResults()
+    return tuple(results[detector_id][tc.LAST_STEP_VEHICLE_NUMBER] for detector_id in DETECTOR_IDS)
+
 def get_sensor_counts():
     # Get counts from area detectors that cover entire approaches
-    north_count = traci.lanearea.getLastStepVehicleNumber("area_north_approach_0_350")
-    south_count = traci.lanearea.getLastStepVehicleNumber("area_south_approach_0_350")
-    east_count = traci.lanearea.getLastStepVehicleNumber("area_east_approach_0_350")
-    west_count = traci.lanearea.getLastStepVehicleNumber("area_west_approach_0_350")
-    
-    return north_count, south_count, east_count, west_count
+    if USE_SUBSCRIPTIONS:
+        return read_subscribed_counts()
+    return poll_sensor_counts()
+
+def compare_sensor_paths(samples=200):
+    """
+    Time both sensor read paths against the current simulation state.
+    Returns (subscription_us, polling_us) mean microseconds per read.
+    Only meaningful once setup_sensor_subscriptions() has run.
+    """
+    start = time.perf_counter()
+    for _ in range(samples):
+        read_subscribed_counts()
+    subscription_us = (time.perf_counter() - start) / samples * 1e6
+
+    start = time.perf_counter()
+    for _ in range(samples):
+        poll_sensor_counts()
+    polling_us = (time.perf_counter() - start) / samples * 1e6
+
+    return subscription_us, polling_us
+
+# Polygons drawn over the approaches, same order; filled in by discover_pole()
+POLYGON_IDS = []
+
+BUCKET_COLORS = [
+    (0, 255, 0, 255),    # Green for 0 vehicles
+    (255, 255, 0, 255),  # Yellow for 1-5 vehicles
+    (255, 0, 0, 255),    # Red for > 5 vehicles
+]
+
+# Last color bucket pushed to each polygon, so unchanged colors cost no TraCI call
+polygon_buckets = {}
+
+def count_bucket(count):
+    if count == 0:
+        return 0
+    elif 1 <= count <= 5:
+        return 1
+    return 2  # count > 5 (Red state remains > 5 vehicles)
 
 def set_polygon_color_based_on_count(polygon_id, count):
-    """Sets the color of a polygon based on vehicle count."""
-    if count == 0:  # Green for 0 vehicles
-        color = (0, 255, 0, 255)  # Green
-    elif 1 <= count <= 5:  # Yellow for 1-5 vehicles
-        color = (255, 255, 0, 255)  # Yellow
-    else:  # count > 5 (Red state remains > 5 vehicles)
-        color = (255, 0, 0, 255)  # Red
+    """Sets the color of a polygon based on vehicle count, if its bucket changed."""
+    bucket = count_bucket(count)
+    if polygon_buckets.get(polygon_id) == bucket:
+        return
     try:
-        traci.polygon.setColor(polygon_id, color)
+        traci.polygon.setColor(polygon_id, BUCKET_COLORS[bucket])
+        polygon_buckets[polygon_id] = bucket
     except traci.TraCIException as e:
-        print(f"{POLE_ID}: Error setting color for {polygon_id}: {e}")
+        log.error(f"{POLE_ID}: Error setting color for {polygon_id}: {e}")
 
-def control_traffic_light(north_count, south_count, east_count, west_count, current_phase_index):
+def control_traffic_light(north_count, south_count, east_count, west_count, current_phase_index,
+                          set_phase=True):
+    """
+    Returns the phase to run next; sets it on the TLS unless set_phase is
+    False (the fog's command may override the local decision).
+    """
     global approach_red_durations
 
     detector_counts = {
@@ -164,52 +335,105 @@ def control_traffic_light(north_count, south_count, east_count, west_count, curr
                 next_phase_to_set = current_phase_index # Maintain current phase if balanced
 
     if next_phase_to_set != current_phase_index:
-        try:
-            traci.trafficlight.setPhase("center", next_phase_to_set)
-        except traci.TraCIException as e:
-            print(f"{POLE_ID}: Error setting TLS phase for center: {e}")
+        if set_phase:
+            set_tls_phase(next_phase_to_set)
         return next_phase_to_set
     
     return current_phase_index
 
+def set_tls_phase(phase):
+    try:
+        traci.trafficlight.setPhase(TLS_ID, phase)
+    except traci.TraCIException as e:
+        log.error(f"{POLE_ID}: Error setting TLS phase for {TLS_ID}: {e}")
+
 # ————————————————
 # 5) Main TraCI loop
 # ————————————————
 def run_edge():
     # 1) Start SUMO via TraCI
-    sumo_cmd = [SUMO_BINARY, "-c", SUMO_CONFIG]
-    traci.start(sumo_cmd)
-    print(f"{POLE_ID}: SUMO started, stepping through simulation...")
+    state = warm_state(SUMO_CONFIG, args.warm_start) if args.warm_start else None
+    sumo_cmd = sumo_command(SUMO_BINARY, SUMO_CONFIG, state)
+    start = time.perf_counter()
+    start_sumo(sumo_cmd)
+    log.info(f"{POLE_ID}: SUMO started in {time.perf_counter() - start:.2f} s"
+             + (f" (warm start at {args.warm_start:g} s)" if state else "") + ", stepping through simulation...")
+
+    start = time.perf_counter()
+    try:
+        discover_pole()
+    except RuntimeError as e:
+        log.error(f"{POLE_ID}: {e}")
+        traci.close()
+        sys.exit(1)
+    log.info(f"{POLE_ID}: Discovered TLS {TLS_ID} in {time.perf_counter() - start:.3f} s, "
+             f"detectors {DETECTOR_IDS}, polygons {POLYGON_IDS or 'none'}")
 
     # Initialize traffic light state
     current_phase_value = 0  # Start with N-S green (Phase 0)
     try:
-        traci.trafficlight.setPhase("center", current_phase_value)
-        print(f"{POLE_ID}: Initial TLS phase set to {current_phase_value} for center")
-    except traci.TraCIException as e:
-        print(f"{POLE_ID}: Error setting initial TLS phase for center: {e}")
-
-    # Diagnostic: Check loaded polygon IDs
-    try:
-        all_polygon_ids = traci.polygon.getIDList()
-        print(f"{POLE_ID}: Loaded polygon IDs: {all_polygon_ids}")
-        expected_polygons = ["poly_north_approach_strip", "poly_south_approach_strip", "poly_east_approach_strip", "poly_west_approach_strip"]
-        for p_id in expected_polygons:
-            if p_id not in all_polygon_ids:
-                print(f"{POLE_ID}: WARNING - Expected polygon '{p_id}' not found in loaded IDs!")
+        traci.trafficlight.setPhase(TLS_ID, current_phase_value)
+        log.info(f"{POLE_ID}: Initial TLS phase set to {current_phase_value} for {TLS_ID}")
     except traci.TraCIException as e:
-        print(f"{POLE_ID}: Error getting polygon ID list: {e}")
+        log.error(f"{POLE_ID}: Error setting initial TLS phase for {TLS_ID}: {e}")
+
+    if USE_SUBSCRIPTIONS:
+        setup_sensor_subscriptions()
+        log.info(f"{POLE_ID}: Subscribed to {len(DETECTOR_IDS)} detectors")
+
+    timer = StageTimer() if args.stage_timing else NULL_TIMER
+    if args.stage_timing and hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: timer.report(f"{POLE_ID}: ", log.info))
+    batcher = ReportBatcher(timer.wrap("encrypt", encrypt_plaintext), timer.wrap("sendto", send_datagram),
+                            max_steps=args.batch_steps, max_delay_ms=args.batch_ms, mtu=args.mtu,
+                            seal_overhead=SEALER.overhead)
+    delta = DeltaFilter(args.keyframe_steps) if args.delta else None
+    commands = CommandReceiver(sock, POLE_ID, args.command_timeout_ms) if args.fog_control else None
+
+    # Checked once; at the default INFO level report lines cost nothing per step
+    log_reports = log.isEnabledFor(logging.DEBUG)
+    trace = None
+    if args.record_trace:
+        trace = TraceWriter(args.record_trace, [POLE_ID], [TLS_ID], [DETECTOR_IDS],
+                            config=SUMO_CONFIG, step_length=traci.simulation.getDeltaT())
 
     step = 0
+    step_time = 0.0    # seconds spent in simulationStep() + sensor reads
+    run_start = time.perf_counter()
     while traci.simulation.getMinExpectedNumber() > 0:
+        if MAX_STEPS and step >= MAX_STEPS:
+            break
+        step_start = time.perf_counter()
+        timer.start()
         traci.simulationStep()
+        timer.lap("simulationStep")
         step += 1
 
         # Get sensor counts
         north_count, south_count, east_count, west_count = get_sensor_counts()
-        
+        timer.lap("sensors")
+        step_time += time.perf_counter() - step_start
+        if trace is not None:
+            trace.append([(north_count, south_count, east_count, west_count)])
+
         # Control traffic light based on new logic
-        current_phase_value = control_traffic_light(north_count, south_count, east_count, west_count, current_phase_value)
+        if commands is None:
+            current_phase_value = control_traffic_light(north_count, south_count, east_count, west_count,
+                                                        current_phase_value)
+        else:
+            # The local decision keeps its state current and is the fallback
+            local_phase = control_traffic_light(north_count, south_count, east_count, west_count,
+                                                current_phase_value, set_phase=False)
+            commands.poll()
+            now = time.time()
+            commanded_phase = commands.phase(now)
+            next_phase = local_phase if commanded_phase is None else commanded_phase
+            if next_phase != current_phase_value:
+                set_tls_phase(next_phase)
+            if commanded_phase is not None:
+                commands.mark_applied(now, step)
+            current_phase_value = next_phase
+        timer.lap("control")
 
         # Prepare data for encryption (including pole_id)
         report = {
@@ -222,19 +446,73 @@ def run_edge():
             "current_phase": current_phase_value
         }
 
-        # Encrypt and send
-        encrypted_msg = encrypt_report(report)
-        sock.sendto(encrypted_msg, (UDP_IP, UDP_PORT))
-        print(f"{POLE_ID} [step {step}]: sent encrypted report → {report}")
-
-        # Update detector colors
-        set_polygon_color_based_on_count("poly_north_approach_strip", north_count)
-        set_polygon_color_based_on_count("poly_south_approach_strip", south_count)
-        set_polygon_color_based_on_count("poly_east_approach_strip", east_count)
-        set_polygon_color_based_on_count("poly_west_approach_strip", west_count)
+        # Encrypt and send (the batcher flushes on a full batch or a phase change)
+        if delta is None or delta.should_send(step, report_state(report)):
+            encoded = encode_report(report, REPORT_FORMAT)
+            timer.lap("encode")
+            batcher.add(encoded, current_phase_value)
+            timer.lap("batch+send")
+            if log_reports and report_sampler.should_log(POLE_ID, step, report_state(report)):
+                log.debug("%s [step %d]: sent encrypted report → %s", POLE_ID, step, report,
+                          extra={"report": report})
+            timer.lap("log")
+        # With --delta most steps add nothing; --batch-ms must still hold
+        batcher.poll()
+        timer.lap("batch poll")
+
+        # Update detector colors (nobody is watching in headless mode)
+        if not HEADLESS:
+            for polygon_id, count in zip(POLYGON_IDS, (north_count, south_count, east_count, west_count)):
+                set_polygon_color_based_on_count(polygon_id, count)
+            timer.lap("polygons")
+
+    # The fog rebuilds skipped steps from the next report, so always send the last one
+    if delta is not None and step and delta.last_sent_step != step:
+        batcher.add(encode_report(report, REPORT_FORMAT), current_phase_value)
+        delta.mark_sent(step)
+    batcher.flush()
+    if trace is not None:
+        trace.close()
+        log.info(f"{POLE_ID}: Recorded {trace.steps_written} steps to {args.record_trace}")
+    wall_time = time.perf_counter() - run_start
+    mode = "subscriptions" if USE_SUBSCRIPTIONS else "polling"
+    display = "headless" if HEADLESS else "gui"
+    if step:
+        log.info(f"{POLE_ID}: {step} steps in {wall_time:.2f} s = {step / wall_time:.0f} steps/s ({display})")
+        log.info(f"{POLE_ID}: step+sensor read {step_time / step * 1e3:.3f} ms/step ({mode})")
+    if delta is not None:
+        log.info(f"{POLE_ID}: delta mode sent {delta.reports_sent} of {delta.reports_seen} reports")
+    if batcher.datagrams_sent:
+        log.info(f"{POLE_ID}: {batcher.reports_sent} reports in {batcher.datagrams_sent} datagrams "
+                 f"({batcher.reports_sent / batcher.datagrams_sent:.1f} reports/datagram, "
+                 f"{batcher.bytes_sent / batcher.datagrams_sent:.0f} B avg)")
+    if USE_SUBSCRIPTIONS:
+        subscription_us, polling_us = compare_sensor_paths()
+        log.info(f"{POLE_ID}: sensor read comparison: subscriptions {subscription_us:.1f} us, "
+                 f"polling {polling_us:.1f} us per step")
+    if commands is not None:
+        commands.report(f"{POLE_ID}: ", log.info)
+    if args.stage_timing:
+        log.info(f"{POLE_ID}: step loop stage timings:")
+        timer.report(f"{POLE_ID}: ", log.info)
 
     traci.close()
-    print(f"{POLE_ID}: Simulation ended.")
+    log.info(f"{POLE_ID}: Simulation ended.")
+
+def main():
+    """run_edge(), under cProfile when --profile-out is given."""
+    if not args.profile_out:
+        run_edge()
+        return
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(run_edge)
+    finally:
+        profiler.dump_stats(args.profile_out)
+        log.info(f"{POLE_ID}: cProfile data written to {args.profile_out}")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
 
 if __name__ == "__main__":
-    run_edge()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+fog_async.py
+
+asyncio replacement for fog.run_fog with drop accounting.
+
+- The UDP socket is created up front so SO_RCVBUF can be raised before
+  binding; the kernel buffer is what absorbs bursts.
+- FogProtocol only queues datagrams. A consumer task decrypts them. When the
+  queue reaches max_queue the transport stops reading (pause_reading) until
+  the consumer drains it below half, so bursts back up into the kernel buffer
+  instead of growing memory without bound. A report whose handling raises
+  is counted in handler_errors and skipped; the consumer keeps running.
+- Per pole, the timestep of each report is compared with the previous one:
+  a jump of more than gap_tolerance steps counts the missing steps as
+  inferred drops, a timestep that does not increase counts as reordered.
+  Edges in --delta mode skip steps on purpose; run those with gap_tolerance
+  set to their keyframe interval.
+- Counters are served as JSON over HTTP on a local stats port
+  (curl http://127.0.0.1:5006/). When a fog_store.PoleStore is passed in,
+  /poles?window=N returns its windowed aggregates per pole.
+- With a fog_control.CorridorCoordinator, a task runs its control tick and
+  sends the commands from the server's own socket.
+"""
+
+import json
+import time
+import socket
+import asyncio
+import logging
+from urllib.parse import urlsplit, parse_qs
+
+from fog import decrypt_reports
+from report_crypto import AuthError, ReplayError
+from report_delta import SeriesReconstructor
+
+log = logging.getLogger("vanet.fog")
+
+
+def udp_rcvbuf_errors():
+    """System-wide UDP receive-buffer overflows (Linux /proc/net/snmp), or None."""
+    try:
+        with open("/proc/net/snmp") as f:
+            lines = [line.split() for line in f if line.startswith("Udp:")]
+        header, values = lines[0], lines[1]
+        return int(values[header.index("RcvbufErrors")])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class FogStats:
+    def __init__(self, gap_tolerance=1):
+        self.gap_tolerance = max(1, gap_tolerance)
+        self.received = 0          # datagrams read from the socket
+        self.decrypted = 0         # datagrams that authenticated and decoded
+        self.reports = 0           # reports carried by those datagrams
+        self.failed_auth = 0       # did not authenticate (report_crypto.AuthError)
+        self.replayed = 0          # counter already seen or old session (report_crypto.ReplayError)
+        self.malformed = 0         # authenticated but undecodable, or too short
+        self.handler_errors = 0    # reports whose tracking or on_report raised
+        self.inferred_dropped = 0  # reports missing from per-pole timestep gaps
+        self.reordered = 0         # reports whose timestep did not increase
+        self.reading_paused = 0    # times the transport was paused for backpressure
+        self.last_timestep = {}    # pole_id -> last timestep seen
+
+    def track(self, report):
+        pole = report.get("pole_id", "UNKNOWN")
+        timestep = report["timestep"]
+        previous = self.last_timestep.get(pole)
+        if previous is not None:
+            gap = timestep - previous
+            if gap <= 0:
+                self.reordered += 1
+                return
+            if gap > self.gap_tolerance:
+                self.inferred_dropped += gap - 1
+        self.last_timestep[pole] = timestep
+
+    def snapshot(self, queue_depth=0):
+        return {
+            "received": self.received,
+            "decrypted": self.decrypted,
+            "reports": self.reports,
+            "failed_auth": self.failed_auth,
+            "replayed": self.replayed,
+            "malformed": self.malformed,
+            "handler_errors": self.handler_errors,
+            "inferred_dropped": self.inferred_dropped,
+            "reordered": self.reordered,
+            "reading_paused": self.reading_paused,
+            "queue_depth": queue_depth,
+            "poles": len(self.last_timestep),
+            "kernel_rcvbuf_errors": udp_rcvbuf_errors(),
+        }
+
+
+class FogProtocol(asyncio.DatagramProtocol):
+    def __init__(self, queue, stats):
+        self.queue = queue
+        self.stats = stats
+        self.transport = None
+        self.paused = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.stats.received += 1
+        self.queue.put_nowait((data, addr))
+        if not self.paused and self.queue.qsize() >= self.queue.maxsize:
+            self.transport.pause_reading()
+            self.paused = True
+            self.stats.reading_paused += 1
+
+    def resume_if_drained(self):
+        if self.paused and self.queue.qsize() <= self.queue.maxsize // 2:
+            self.transport.resume_reading()
+            self.paused = False
+
+    def error_received(self, exc):
+        log.warning(f"[fog] Socket error: {exc}")
+
+
+async def consume(queue, protocol, stats, on_report, reconstructor):
+    while True:
+        data, addr = await queue.get()
+        try:
+            reports = decrypt_reports(data)
+        except ReplayError:
+            stats.replayed += 1
+            reports = []
+        except AuthError:
+            stats.failed_auth += 1
+            reports = []
+        except Exception:
+            stats.malformed += 1
+            reports = []
+        else:
+            stats.decrypted += 1
+            stats.reports += len(reports)
+
+        for report in reports:
+            # A failing handler must not end the consumer (the queue would fill and reading stay paused)
+            try:
+                stats.track(report)
+                if reconstructor is None:
+                    on_report(report, addr)
+                else:
+                    for dense_report in reconstructor.expand(report):
+                        on_report(dense_report, addr)
+            except Exception as e:
+                stats.handler_errors += 1
+                log.warning(f"[fog] Error handling a report from {addr}: {e!r}")
+        protocol.resume_if_drained()
+
+
+def make_stats_handler(stats, queue, store=None):
+    async def handle(reader, writer):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            request = b""
+        parts = request.split(b" ", 2)
+        url = urlsplit(parts[1].decode("latin-1") if len(parts) > 1 else "/")
+
+        status = b"200 OK"
+        if url.path == "/poles" and store is not None:
+            try:
+                window = int(parse_qs(url.query).get("window", ["100"])[0])
+            except ValueError:
+                window = None
+            if window is None or window < 1:
+                status, payload = b"400 Bad Request", {"error": "window must be a positive integer"}
+            else:
+                payload = store.summary(min(window, store.capacity))
+        elif url.path == "/":
+            payload = stats.snapshot(queue.qsize())
+        else:
+            status, payload = b"404 Not Found", {"error": f"no such endpoint {url.path}"}
+        body = json.dumps(payload).encode()
+        writer.write(b"HTTP/1.0 " + status + b"\r\nContent-Type: application/json\r\n"
+                     b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+        await writer.drain()
+        writer.close()
+    return handle
+
+
+def open_udp_socket(host, port, rcvbuf=0):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if rcvbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    sock.bind((host, port))
+    sock.setblocking(False)
+    return sock
+
+
+async def run_coordinator(coordinator, transport):
+    while True:
+        await asyncio.sleep(max(0.0, coordinator.next_tick - time.monotonic()))
+        coordinator.tick(transport.sendto)
+
+
+async def serve(on_report, stats, host="0.0.0.0", port=5005, rcvbuf=0, stats_port=5006,
+                max_queue=10000, reconstruct=False, store=None, coordinator=None):
+    """Run the fog server until cancelled, counting into `stats` (a FogStats)."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(max_queue)
+    sock = open_udp_socket(host, port, rcvbuf)
+    effective_rcvbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: FogProtocol(queue, stats), sock=sock)
+    reconstructor = SeriesReconstructor() if reconstruct else None
+    consumer = asyncio.create_task(consume(queue, protocol, stats, on_report, reconstructor))
+    control = asyncio.create_task(run_coordinator(coordinator, transport)) if coordinator else None
+    stats_server = None
+    if stats_port:
+        stats_server = await asyncio.start_server(make_stats_handler(stats, queue, store), "127.0.0.1", stats_port)
+
+    log.info(f"[fog] Listening on UDP port {port} (asyncio, SO_RCVBUF {effective_rcvbuf} B)"
+             + (f", stats on http://127.0.0.1:{stats_port}/" if stats_port else ""))
+    try:
+        await asyncio.Future()
+    finally:
+        consumer.cancel()
+        if control is not None:
+            control.cancel()
+        if stats_server is not None:
+            stats_server.close()
+        transport.close()
+
+
+def run_fog_async(on_report, gap_tolerance=1, **kwargs):
+    stats = FogStats(gap_tolerance)
+    try:
+        asyncio.run(serve(on_report, stats, **kwargs))
+    except KeyboardInterrupt:
+        log.info("\n[fog] Stopped by user.")
+    log.info(f"[fog] {json.dumps(stats.snapshot())}")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+fog_buffers.py
+
+Preallocated receive buffers for the fog, so receiving a datagram does not
+allocate a bytes object for it.
+
+- BufferPool carves `slots` fixed-size slots out of one bytearray. The
+  receiver acquire()s a free slot, recv_into()s the next datagram into it
+  and hands the memoryview of the filled part on; whoever is done with the
+  datagram release()s the slot. Slots are reused in FIFO order.
+- Python's socket module has no recvmmsg(); one recvfrom_into() per
+  datagram into a reused buffer is the closest stdlib equivalent.
+- Decryption continues on the memoryview (report_crypto.ReportOpener.open_into
+  decrypts into a second preallocated buffer, see fog.decrypt_reports_into),
+  so the only per-datagram objects left are small views, the nonce, the pole
+  id string and the decoded report dicts.
+"""
+
+import collections
+
+SLOT_SIZE = 4096  # fog.BUFFER_SIZE
+
+
+class BufferPool:
+    def __init__(self, slots=4096, slot_size=SLOT_SIZE):
+        self.slot_size = slot_size
+        self.buffer = bytearray(slots * slot_size)
+        view = memoryview(self.buffer)
+        self.views = [view[i * slot_size:(i + 1) * slot_size] for i in range(slots)]
+        # deque append/popleft are atomic, so worker threads can release slots
+        self.free = collections.deque(range(slots))
+        self.exhausted = 0   # acquire() calls that found no free slot
+
+    def acquire(self):
+        """A free slot index, or None when every slot is still in use."""
+        try:
+            return self.free.popleft()
+        except IndexError:
+            self.exhausted += 1
+            return None
+
+    def release(self, slot):
+        self.free.append(slot)
+
+    def recv_into(self, sock, slot):
+        """Receive one datagram into slot; returns (memoryview of it, addr)."""
+        view = self.views[slot]
+        nbytes, addr = sock.recvfrom_into(view)
+        return view[:nbytes], addr
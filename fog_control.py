@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+fog_control.py
+
+Coordinated phase control from the fog, sent back to the poles.
+
+Fog side (fog.py --coordinate LAYOUT):
+- CorridorCoordinator keeps the latest report of every pole in the layout
+  and, every --tick-ms, decides phases for all of them at once with
+  controller.PhaseController on "effective" counts that include the
+  neighbours (layout entries may name their "west"/"east" neighbours):
+  - green wave: while a neighbour has E-W green, a share (--platoon-weight)
+    of its queue heading this way is added to this pole's approach from
+    that side, so the platoon finds green when it arrives;
+  - spillback: an approach whose vehicles would drive into a neighbour
+    approach already holding --spillback-threshold vehicles gets no
+    demand, so green goes where vehicles can actually move.
+- Each decision goes to the address the pole's reports come from, sealed
+  with report_crypto under the pole's command channel id ("<pole>/cmd"),
+  so commands never share a key or nonce sequence with the reports. Edges
+  run with --fog-control need that key provisioned too
+  (report_crypto.py --provision DIR <pole> <pole>/cmd).
+  Poles without a report for --stale-ms get no commands.
+
+Edge side (edge_template.py / multi_edge.py --fog-control):
+- CommandReceiver drains the pole's own UDP socket without blocking once per
+  step. The newest command, by (session, seq) from the authenticated
+  envelope, decides the phase for --command-timeout-ms after
+  it arrived; without one the local controller decides (it keeps running
+  every step, so the fallback starts from current red durations). A
+  restarted fog seals under a newer session, so its commands win at once
+  even though its seq starts again at 1.
+- Every command carries the fog's wall-clock receive time of the report it
+  was based on and its own send time, so the edge splits the latency from
+  report receipt to command application into fog decision, delivery
+  (network plus time in the socket until the edge's next poll) and edge
+  wait (poll to application). These need the fog and edge clocks to agree
+  (same host, or NTP).
+
+Command plaintext: COMMAND struct, little-endian, format byte COMMAND_FORMAT.
+
+Run directly to check that an edge follows a restarted coordinator:
+    python fog_control.py
+"""
+
+import time
+import socket
+import select
+import struct
+
+import numpy as np
+
+from controller import APPROACHES, PHASE_EW_GREEN, RED_THRESHOLD, PhaseController
+from report_crypto import ReportOpener, ReportSealer, load_pole_key, pole_key
+from stage_timer import StageTimer
+
+COMMAND_FORMAT = 0x10
+# format, seq, timestep of the report it is based on, phase,
+# fog receive time of that report, fog send time (both time.time())
+COMMAND = struct.Struct("<BIIBdd")
+
+TICK_MS = 100
+PLATOON_WEIGHT = 0.5
+SPILLBACK_THRESHOLD = 15  # vehicles on a neighbour approach that block an exit
+STALE_MS = 2000
+COMMAND_TIMEOUT_MS = 1000
+BUFFER_SIZE = 4096
+
+_EAST = APPROACHES.index("east")
+_WEST = APPROACHES.index("west")
+
+
+def command_channel(pole_id):
+    """Key id commands to pole_id are sealed under (see report_crypto.py)."""
+    return f"{pole_id}/cmd"
+
+
+def encode_command(seq, timestep, phase, report_time, sent_time):
+    return COMMAND.pack(COMMAND_FORMAT, seq, timestep, phase, report_time, sent_time)
+
+
+def decode_command(plaintext):
+    if len(plaintext) != COMMAND.size or plaintext[0] != COMMAND_FORMAT:
+        raise ValueError("not a phase command")
+    _, seq, timestep, phase, report_time, sent_time = COMMAND.unpack(plaintext)
+    return {"seq": seq, "timestep": timestep, "phase": phase,
+            "report_time": report_time, "sent_time": sent_time}
+
+
+def neighbour_indices(layout, pole_ids, side):
+    """index of each pole's `side` neighbour in pole_ids, -1 for none."""
+    index = {pole_id: i for i, pole_id in enumerate(pole_ids)}
+    return np.array([index.get(layout[pole_id].get(side), -1) for pole_id in pole_ids], dtype=np.int64)
+
+
+class CorridorCoordinator:
+    def __init__(self, layout, tick_ms=TICK_MS, platoon_weight=PLATOON_WEIGHT,
+                 spillback_threshold=SPILLBACK_THRESHOLD, red_threshold=RED_THRESHOLD, stale_ms=STALE_MS):
+        self.pole_ids = list(layout)
+        self.index = {pole_id: i for i, pole_id in enumerate(self.pole_ids)}
+        self.west = neighbour_indices(layout, self.pole_ids, "west")
+        self.east = neighbour_indices(layout, self.pole_ids, "east")
+        self.tick_s = tick_ms / 1000.0
+        self.platoon_weight = platoon_weight
+        self.spillback_threshold = spillback_threshold
+        self.stale_s = stale_ms / 1000.0
+
+        n_poles = len(self.pole_ids)
+        self.counts = np.zeros((n_poles, len(APPROACHES)), dtype=np.int64)
+        self.phases = np.zeros(n_poles, dtype=np.int64)
+        self.timesteps = np.zeros(n_poles, dtype=np.int64)
+        self.report_times = np.zeros(n_poles)   # time.time() the latest report was received
+        self.reported = np.zeros(n_poles, dtype=bool)  # a report arrived since the last tick
+        self.addrs = [None] * n_poles
+        self.controller = PhaseController(n_poles, red_threshold)
+        self.sealers = [ReportSealer(command_channel(pole_id), key=pole_key(command_channel(pole_id)))
+                        for pole_id in self.pole_ids]
+
+        self.next_tick = time.monotonic() + self.tick_s
+        self.ticks = 0
+        self.commands_sent = 0
+        self.unknown_reports = 0
+        self.timer = StageTimer()   # report receipt -> first command sent after it
+
+    def observe(self, report, addr):
+        """on_report hook: remember the pole's latest counts, phase and address."""
+        i = self.index.get(report.get("pole_id"))
+        if i is None:
+            self.unknown_reports += 1
+            return
+        if addr == self.addrs[i] and report["timestep"] < self.timesteps[i]:
+            # Late datagram; a restarted edge (new address) starts over at step 1
+            return
+        self.counts[i] = (report["north_count"], report["south_count"],
+                          report["east_count"], report["west_count"])
+        self.phases[i] = report["current_phase"]
+        self.timesteps[i] = report["timestep"]
+        self.report_times[i] = time.time()
+        self.reported[i] = True
+        self.addrs[i] = addr
+
+    def effective_counts(self, active):
+        counts = np.where(active[:, None], self.counts, 0)
+        effective = counts.astype(np.float64)
+        # Column WEST holds vehicles heading east, EAST those heading west. The
+        # west neighbour's WEST queue drives into our WEST approach, and our
+        # WEST queue drives into the east neighbour's WEST approach (mirrored
+        # for EAST).
+        for upstream, downstream, column in ((self.west, self.east, _WEST), (self.east, self.west, _EAST)):
+            has = upstream >= 0
+            poles, neighbour = np.flatnonzero(has), upstream[has]
+            platoon = np.where(self.phases[neighbour] == PHASE_EW_GREEN, counts[neighbour, column], 0)
+            effective[poles, column] += self.platoon_weight * platoon
+
+            has = downstream >= 0
+            poles, neighbour = np.flatnonzero(has), downstream[has]
+            blocked = counts[neighbour, column] >= self.spillback_threshold
+            effective[poles[blocked], column] = 0
+        return effective
+
+    def due(self):
+        return time.monotonic() >= self.next_tick
+
+    def tick(self, send):
+        """Decide phases for all poles and send a command to each active one; send(datagram, addr)."""
+        self.next_tick = max(self.next_tick + self.tick_s, time.monotonic())
+        self.ticks += 1
+        now = time.time()
+        active = (self.report_times > now - self.stale_s) & (self.report_times > 0)
+        phases = self.controller.next_phases(self.effective_counts(active), self.phases)
+        for i in np.flatnonzero(active).tolist():
+            sent_time = time.time()
+            plaintext = encode_command(self.ticks, int(self.timesteps[i]), int(phases[i]),
+                                       float(self.report_times[i]), sent_time)
+            send(self.sealers[i].seal(plaintext), self.addrs[i])
+            # Poles that did not report since the last tick get the command again
+            # (keeping their fallback timeout from expiring); only time fresh ones
+            if self.reported[i]:
+                self.timer.record("report->command", int((sent_time - self.report_times[i]) * 1e9))
+            self.commands_sent += 1
+        self.reported[:] = False
+
+    def report(self, write):
+        write(f"[fog] coordinator: {self.ticks} ticks, {self.commands_sent} commands to "
+              f"{len(self.pole_ids)} poles, {self.unknown_reports} reports from poles not in the layout")
+        self.timer.report("[fog]   ", write)
+
+
+class CommandReceiver:
+    """Phase commands arriving on an edge's own UDP socket, with a fallback timeout."""
+
+    def __init__(self, sock, pole_id, timeout_ms=COMMAND_TIMEOUT_MS):
+        self.sock = sock
+        self.channel = command_channel(pole_id)
+        self.timeout_s = timeout_ms / 1000.0
+        # Only the pole's own command key, provisioned like its report key
+        self.opener = ReportOpener(keys={self.channel: load_pole_key(self.channel)})
+        self.command = None
+        self.command_key = None   # (session, seq) of self.command
+        self.received_at = 0.0
+        self.applied = True
+
+        self.received = 0
+        self.rejected = 0
+        self.applied_count = 0
+        self.commanded_steps = 0
+        self.fallback_steps = 0
+        self.step_lag = 0         # sum over applied commands of (step applied - report timestep)
+        self.timer = StageTimer()
+
+    def poll(self):
+        """Read every datagram waiting on the socket; keeps the newest valid command."""
+        while select.select([self.sock], [], [], 0)[0]:
+            try:
+                data = self.sock.recv(BUFFER_SIZE)
+            except OSError:
+                # e.g. ICMP port unreachable reported on Windows
+                return
+            try:
+                channel, plaintext = self.opener.open_from(data)
+                if channel != self.channel:
+                    raise ValueError(f"command for {channel}")
+                command = decode_command(plaintext)
+            except ValueError:
+                self.rejected += 1
+                continue
+            self.received += 1
+            # seq restarts with the fog; the opener only accepts its newest session
+            key = (self.opener.session(channel), command["seq"])
+            if self.command is None or key > self.command_key:
+                self.command = command
+                self.command_key = key
+                self.received_at = time.time()
+                self.applied = False
+
+    def phase(self, now):
+        """The commanded phase, or None when no command arrived within the timeout."""
+        if self.command is not None and now - self.received_at <= self.timeout_s:
+            self.commanded_steps += 1
+            return self.command["phase"]
+        self.fallback_steps += 1
+        return None
+
+    def mark_applied(self, now, step):
+        """Record latencies the first time the current command decides a step."""
+        if self.applied:
+            return
+        self.applied = True
+        self.applied_count += 1
+        command = self.command
+        self.step_lag += step - command["timestep"]
+        record = self.timer.record
+        record("fog decision", int((command["sent_time"] - command["report_time"]) * 1e9))
+        record("delivery", int((self.received_at - command["sent_time"]) * 1e9))
+        record("edge wait", int((now - self.received_at) * 1e9))
+        record("end to end", int((now - command["report_time"]) * 1e9))
+
+    def report(self, prefix, write):
+        steps = self.commanded_steps + self.fallback_steps
+        write(f"{prefix}fog control: {self.received} commands received, {self.applied_count} applied, "
+              f"{self.rejected} rejected; {self.commanded_steps} of {steps} steps commanded, "
+              f"{self.fallback_steps} on local fallback")
+        if not self.applied_count:
+            return
+        write(f"{prefix}command latency from fog report receipt to application "
+              f"(mean lag {self.step_lag / self.applied_count:.1f} steps):")
+        write(f"{prefix}{'stage':<14} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for stage, count, p50, p95, p99, max_us, _ in self.timer.summary():
+            write(f"{prefix}{stage:<14} {count:>7} {p50 / 1e3:>9.3f} {p95 / 1e3:>9.3f} "
+                  f"{p99 / 1e3:>9.3f} {max_us / 1e3:>9.3f}")
+
+
+def check_coordinator_restart():
+    """An edge applies a restarted coordinator's commands at once; raises AssertionError otherwise."""
+    edge_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    edge_sock.bind(("127.0.0.1", 0))
+    fog_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    layout = {"pole1": {"tls": "c1", "detectors": ["n", "s", "e", "w"]}}
+    receiver = CommandReceiver(edge_sock, "pole1")
+    report = {"pole_id": "pole1", "timestep": 1, "north_count": 9, "south_count": 9,
+              "east_count": 0, "west_count": 0, "current_phase": PHASE_EW_GREEN}
+
+    def run_ticks(coordinator, ticks):
+        coordinator.observe(report, edge_sock.getsockname())
+        for _ in range(ticks):
+            coordinator.tick(fog_sock.sendto)
+        time.sleep(0.05)
+        receiver.poll()
+        return receiver.phase(time.time())
+
+    try:
+        first = CorridorCoordinator(layout)
+        assert run_ticks(first, 20) == 0 and receiver.command["seq"] == 20
+        # The restarted fog counts ticks from 1 again and decides E-W green
+        report.update(north_count=0, south_count=0, east_count=9, west_count=9, current_phase=0)
+        restarted = CorridorCoordinator(layout)
+        assert run_ticks(restarted, 1) == PHASE_EW_GREEN, "restarted coordinator's command was dropped"
+        assert receiver.command["seq"] == 1 and receiver.rejected == 0
+        # Commands the old fog still has in flight are rejected as a stale session
+        first.tick(fog_sock.sendto)
+        time.sleep(0.05)
+        receiver.poll()
+        assert receiver.phase(time.time()) == PHASE_EW_GREEN and receiver.rejected == 1
+    finally:
+        edge_sock.close()
+        fog_sock.close()
+
+
+if __name__ == "__main__":
+    check_coordinator_restart()
+    print("[control] edge follows a restarted coordinator: OK")
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+fog_log.py
+
+Append-only binary log of every report the fog receives, for post-run
+analysis and replay.
+
+- One run writes segments <dir>/<run>-0000.vlog, <run>-0001.vlog, ... each at
+  most max_bytes long. Every segment is a 16-byte header (magic, version,
+  record size) followed by fixed-width records (RECORD_DTYPE), so a segment
+  can be opened with numpy.memmap and sliced without parsing or copying.
+- Pole ids are stored as a u16 index; <dir>/<run>.poles.json maps indices
+  back to pole ids in order of first appearance. It is rewritten only by a
+  flush whose records introduced new poles (and on close), before those
+  records reach the segment, so a reader never meets an unknown index.
+- Appends are staged in a Python list and written in chunks of
+  chunk_records records with a single write() each.
+
+Command line:
+    python fog_log.py summary --dir logs --run RUN
+    python fog_log.py replay  --dir logs --run RUN [--speed 10] [--port 5005]
+
+replay re-encrypts the logged reports and sends them to a fog over UDP,
+paced by their original receive times divided by --speed (0 = as fast as
+possible). Each pole is sealed in a new session, so a fog that still hears
+the live edges will reject their datagrams as stale afterwards; replay into
+a separate fog.
+"""
+
+import os
+import json
+import time
+import glob
+import socket
+import struct
+import argparse
+
+import numpy as np
+
+MAGIC = b"VLOG"
+VERSION = 1
+HEADER = struct.Struct("<4sHH8x")   # magic, version, record size, reserved
+
+RECORD_DTYPE = np.dtype([
+    ("recv_time", "<f8"),   # fog wall-clock time (time.time()) the report arrived
+    ("pole", "<u2"),        # index into <run>.poles.json
+    ("timestep", "<u4"),
+    ("north_count", "<u2"),
+    ("south_count", "<u2"),
+    ("east_count", "<u2"),
+    ("west_count", "<u2"),
+    ("current_phase", "u1"),
+])
+
+
+def segment_path(directory, run, segment):
+    return os.path.join(directory, f"{run}-{segment:04d}.vlog")
+
+
+def poles_path(directory, run):
+    return os.path.join(directory, f"{run}.poles.json")
+
+
+class ReportLog:
+    def __init__(self, directory, run=None, max_bytes=256 * 1024 * 1024, chunk_records=8192):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.run = run or time.strftime("run-%Y%m%d-%H%M%S")
+        self.max_records = (max_bytes - HEADER.size) // RECORD_DTYPE.itemsize
+        if self.max_records < 1:
+            raise ValueError(f"max_bytes {max_bytes} cannot hold a single record")
+        self.chunk_records = chunk_records
+        self.pole_index = {}   # pole_id -> u16 index
+        self._poles_written = -1   # len(pole_index) when <run>.poles.json was last written
+        self.records_written = 0
+        self._staged = []
+        self._segment = -1
+        self._file = None
+        self._segment_records = 0
+        self._open_next_segment()
+
+    def _open_next_segment(self):
+        if self._file is not None:
+            self._file.close()
+        self._segment += 1
+        self._file = open(segment_path(self.directory, self.run, self._segment), "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize))
+        # Readers can map a segment while it is still being written
+        self._file.flush()
+        self._segment_records = 0
+
+    def _pole(self, pole_id):
+        index = self.pole_index.get(pole_id)
+        if index is None:
+            index = len(self.pole_index)
+            if index > 0xFFFF:
+                raise ValueError("more than 65536 poles in one run")
+            self.pole_index[pole_id] = index
+        return index
+
+    def _write_poles(self):
+        if len(self.pole_index) == self._poles_written:
+            return
+        path = poles_path(self.directory, self.run)
+        # Replaced in one step, so a reader never sees a partial file
+        with open(path + ".tmp", "w") as f:
+            json.dump(list(self.pole_index), f)
+        os.replace(path + ".tmp", path)
+        self._poles_written = len(self.pole_index)
+
+    def append(self, report, recv_time=None):
+        self._staged.append((
+            time.time() if recv_time is None else recv_time,
+            self._pole(report.get("pole_id", "UNKNOWN")),
+            report["timestep"],
+            report["north_count"], report["south_count"],
+            report["east_count"], report["west_count"],
+            report["current_phase"],
+        ))
+        if len(self._staged) >= self.chunk_records:
+            self.flush()
+
+    def flush(self):
+        if not self._staged:
+            return
+        records = np.array(self._staged, dtype=RECORD_DTYPE)
+        self._staged = []
+        self._write_poles()
+        start = 0
+        while start < len(records):
+            room = self.max_records - self._segment_records
+            if room == 0:
+                self._open_next_segment()
+                continue
+            part = records[start:start + room]
+            self._file.write(part.tobytes())
+            self._segment_records += len(part)
+            start += len(part)
+        self._file.flush()
+        self.records_written += len(records)
+
+    def close(self):
+        self.flush()
+        self._write_poles()
+        self._file.close()
+
+
+def open_segment(path):
+    """Memory-map one segment as a read-only RECORD_DTYPE array (zero copy)."""
+    with open(path, "rb") as f:
+        magic, version, record_size = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path}: not a version {VERSION} report log")
+    n_records = (os.path.getsize(path) - HEADER.size) // RECORD_DTYPE.itemsize
+    if n_records == 0:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER.size, shape=(n_records,))
+
+
+def segment_paths(directory, run):
+    return sorted(glob.glob(os.path.join(glob.escape(directory), f"{glob.escape(run)}-[0-9][0-9][0-9][0-9].vlog")))
+
+
+def load_pole_ids(directory, run):
+    with open(poles_path(directory, run)) as f:
+        return json.load(f)
+
+
+def iter_segments(directory, run):
+    for path in segment_paths(directory, run):
+        yield open_segment(path)
+
+
+def summarize(directory, run):
+    pole_ids = load_pole_ids(directory, run)
+    total = 0
+    first = last = None
+    per_pole = np.zeros(len(pole_ids), dtype=np.int64)
+    queue_sums = np.zeros(len(pole_ids))
+    for records in iter_segments(directory, run):
+        if len(records) == 0:
+            continue
+        total += len(records)
+        first = records["recv_time"][0] if first is None else first
+        last = records["recv_time"][-1]
+        per_pole += np.bincount(records["pole"], minlength=len(pole_ids))
+        queue = (records["north_count"].astype(np.int64) + records["south_count"]
+                 + records["east_count"] + records["west_count"])
+        queue_sums += np.bincount(records["pole"], weights=queue, minlength=len(pole_ids))
+
+    print(f"[log] {run}: {total} reports from {len(pole_ids)} poles in "
+          f"{len(segment_paths(directory, run))} segment(s)")
+    if total:
+        print(f"[log] received over {last - first:.1f} s of wall-clock time")
+        for index, pole_id in enumerate(pole_ids):
+            if per_pole[index]:
+                print(f"[log]   {pole_id}: {per_pole[index]} reports, "
+                      f"mean total queue {queue_sums[index] / per_pole[index]:.2f} vehicles")
+
+
+def replay(directory, run, host, port, speed, report_format, chunk=4096):
+    # Imported here so summary works without the crypto dependencies
+    from fog import encrypt_plaintext
+    from report_codec import encode_report
+
+    pole_ids = load_pole_ids(directory, run)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sent = 0
+    wall_start = time.perf_counter()
+    log_start = None
+    for records in iter_segments(directory, run):
+        for offset in range(0, len(records), chunk):
+            block = records[offset:offset + chunk]
+            # One conversion per block instead of per-field NumPy scalar reads
+            for recv_time, pole, timestep, north, south, east, west, phase in block.tolist():
+                if speed:
+                    if log_start is None:
+                        log_start = recv_time
+                    delay = wall_start + (recv_time - log_start) / speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                report = {
+                    "pole_id": pole_ids[pole],
+                    "timestep": timestep,
+                    "north_count": north,
+                    "south_count": south,
+                    "east_count": east,
+                    "west_count": west,
+                    "current_phase": phase
+                }
+                sock.sendto(encrypt_plaintext(encode_report(report, report_format), report["pole_id"]),
+                            (host, port))
+                sent += 1
+    elapsed = time.perf_counter() - wall_start
+    print(f"[log] replayed {sent} reports in {elapsed:.2f} s ({sent / max(elapsed, 1e-9):.0f} reports/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["summary", "replay"])
+    parser.add_argument("--dir", required=True, help="Log directory given to fog.py --log-dir")
+    parser.add_argument("--run", required=True, help="Run name (file prefix of the segments)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5005)
+    parser.add_argument("--speed", type=float, default=0,
+                        help="Replay speed relative to the original arrival times (0 = as fast as possible)")
+    parser.add_argument("--report-format", choices=["json", "binary"], default="json",
+                        help="Encoding of replayed reports (binary needs 'pole<N>' ids)")
+    args = parser.parse_args()
+    if args.command == "summary":
+        summarize(args.dir, args.run)
+    else:
+        replay(args.dir, args.run, args.host, args.port, args.speed, args.report_format)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+fog_store.py
+
+In-memory per-pole time series of recent reports on the fog.
+
+Every pole gets one row in a set of preallocated NumPy ring buffers
+(timestep, the four approach counts, current phase), each `capacity` steps
+long. Once a row is full the oldest step is overwritten, so memory depends
+on the number of poles and the capacity, never on how long the fog has been
+running. Rows are added (by doubling) as new poles appear.
+
+Appends are O(1): the ring position is assigned immediately, but the values
+are staged in a short Python list and scattered into the arrays with one
+vectorized assignment per column when the stage fills up or a query runs.
+Writing single elements into NumPy arrays costs far more than that.
+
+Windowed aggregates over the last N steps are computed with vectorized
+gathers, either for one pole or for every pole at once:
+- mean_queue / max_queue: per-approach mean and max vehicle count
+- phase_change_rate: fraction of consecutive steps whose phase differs
+"""
+
+import numpy as np
+
+APPROACHES = ("north", "south", "east", "west")
+
+
+class PoleStore:
+    def __init__(self, capacity=3000, initial_poles=64, stage_size=4096):
+        self.capacity = capacity
+        self.index = {}   # pole_id -> row
+        self.pole_ids = []
+        self.head = []    # next write position per row
+        self.size = []    # valid steps per row
+        self.timestep = np.zeros((initial_poles, capacity), dtype=np.int32)
+        # One contiguous (poles, capacity) block per approach, so a window
+        # gather reads each approach as a flat take()
+        self.counts = np.zeros((len(APPROACHES), initial_poles, capacity), dtype=np.int16)
+        self.phase = np.zeros((initial_poles, capacity), dtype=np.int8)
+        # Bounded by capacity so one flush never writes the same slot twice
+        self.stage_size = min(stage_size, capacity)
+        self._staged = []
+
+    def nbytes(self):
+        return self.timestep.nbytes + self.counts.nbytes + self.phase.nbytes
+
+    def _add_pole(self, pole_id):
+        row = len(self.pole_ids)
+        if row == self.timestep.shape[0]:
+            self.flush()
+            self.timestep = np.concatenate([self.timestep, np.zeros_like(self.timestep)])
+            self.counts = np.concatenate([self.counts, np.zeros_like(self.counts)], axis=1)
+            self.phase = np.concatenate([self.phase, np.zeros_like(self.phase)])
+        self.index[pole_id] = row
+        self.pole_ids.append(pole_id)
+        self.head.append(0)
+        self.size.append(0)
+        return row
+
+    def append_values(self, pole_id, timestep, north_count, south_count, east_count, west_count, current_phase):
+        row = self.index.get(pole_id)
+        if row is None:
+            row = self._add_pole(pole_id)
+        pos = self.head[row]
+        self._staged.append((row, pos, timestep, north_count, south_count, east_count, west_count, current_phase))
+        pos += 1
+        self.head[row] = 0 if pos == self.capacity else pos
+        if self.size[row] < self.capacity:
+            self.size[row] += 1
+        if len(self._staged) >= self.stage_size:
+            self.flush()
+
+    def append(self, report):
+        """Store one decoded report dict (as produced by fog.decrypt_reports)."""
+        self.append_values(report.get("pole_id", "UNKNOWN"), report["timestep"],
+                           report["north_count"], report["south_count"],
+                           report["east_count"], report["west_count"],
+                           report["current_phase"])
+
+    def flush(self):
+        """Scatter staged appends into the ring buffers."""
+        if not self._staged:
+            return
+        staged = np.array(self._staged, dtype=np.int64)
+        self._staged = []
+        rows, positions = staged[:, 0], staged[:, 1]
+        self.timestep[rows, positions] = staged[:, 2]
+        self.counts[:, rows, positions] = staged[:, 3:7].T
+        self.phase[rows, positions] = staged[:, 7]
+
+    def window(self, pole_id, n):
+        """(timestep, counts[n, 4], phase) of the last n steps of one pole, oldest first."""
+        self.flush()
+        row = self.index[pole_id]
+        n = min(n, self.size[row])
+        positions = (self.head[row] + np.arange(-n, 0)) % self.capacity
+        return self.timestep[row, positions], self.counts[:, row, positions].T, self.phase[row, positions]
+
+    def window_stats_all(self, n):
+        """
+        Aggregates over the last n steps of every pole, vectorized.
+        Returns a dict of arrays indexed like self.pole_ids:
+        mean_queue[P, 4], max_queue[P, 4], phase_change_rate[P], steps[P].
+        """
+        self.flush()
+        n_poles = len(self.pole_ids)
+        n = max(1, min(n, self.capacity))
+        rows = np.arange(n_poles)
+        head = np.array(self.head, dtype=np.int64)
+        size = np.array(self.size, dtype=np.int64)
+        offsets = np.arange(-n, 0)
+        flat = rows[:, None] * self.capacity + (head[:, None] + offsets) % self.capacity   # (P, n)
+        valid = offsets >= -np.minimum(size, n)[:, None]
+        partial = not valid.all()
+
+        steps = valid.sum(axis=1)
+        mean_queue = np.empty((n_poles, len(APPROACHES)))
+        max_queue = np.empty((n_poles, len(APPROACHES)), dtype=np.int16)
+        for a in range(len(APPROACHES)):
+            window = self.counts[a].reshape(-1).take(flat)
+            if partial:
+                window = np.where(valid, window, 0)
+            mean_queue[:, a] = window.sum(axis=1, dtype=np.int64) / np.maximum(steps, 1)
+            max_queue[:, a] = window.max(axis=1)
+
+        phase = self.phase.reshape(-1).take(flat)
+        changed = phase[:, 1:] != phase[:, :-1]
+        # Valid steps form a suffix of the window, so a pair is valid when its earlier step is
+        pair_valid = valid[:, :-1]
+        phase_change_rate = (changed & pair_valid).sum(axis=1) / np.maximum(pair_valid.sum(axis=1), 1)
+        return {
+            "mean_queue": mean_queue,
+            "max_queue": max_queue,
+            "phase_change_rate": phase_change_rate,
+            "steps": steps,
+        }
+
+    def window_stats(self, pole_id, n):
+        """Aggregates over the last n steps of one pole, as a plain dict."""
+        _, counts, phase = self.window(pole_id, n)
+        if len(counts) == 0:
+            return {"steps": 0}
+        return {
+            "steps": len(counts),
+            "mean_queue": dict(zip(APPROACHES, counts.mean(axis=0).round(3).tolist())),
+            "max_queue": dict(zip(APPROACHES, counts.max(axis=0).tolist())),
+            "phase_change_rate": float((phase[1:] != phase[:-1]).mean()) if len(phase) > 1 else 0.0,
+        }
+
+    def summary(self, n):
+        """window_stats() of every pole, keyed by pole id (JSON-serializable), from one window_stats_all()."""
+        if not self.pole_ids:
+            return {}
+        stats = self.window_stats_all(n)
+        mean_queue = stats["mean_queue"].round(3).tolist()
+        max_queue = stats["max_queue"].tolist()
+        phase_change_rate = stats["phase_change_rate"].tolist()
+        summary = {}
+        for i, (pole_id, steps) in enumerate(zip(self.pole_ids, stats["steps"].tolist())):
+            if steps == 0:
+                summary[pole_id] = {"steps": 0}
+                continue
+            summary[pole_id] = {
+                "steps": steps,
+                "mean_queue": dict(zip(APPROACHES, mean_queue[i])),
+                "max_queue": dict(zip(APPROACHES, max_queue[i])),
+                "phase_change_rate": phase_change_rate[i],
+            }
+        return summary
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+fog_workers.py
+
+Fog receiver that keeps the UDP socket drained on one thread and fans AES-GCM
+decryption out to a pool of thread or process workers.
+
+- The receive thread waits for the socket to become readable, then drains
+  whatever the kernel already holds (non-blocking reads) up to drain_batch
+  datagrams -- the closest stdlib equivalent of recvmmsg(). Each drained
+  batch costs one queue hand-off per worker rather than one per datagram.
+- Datagrams are sharded to workers by source address. Every edge pole sends
+  from its own socket, so all datagrams of a pole land on the same worker and
+  are handled in arrival order.
+- With thread workers, datagrams are received into a fog_buffers.BufferPool
+  slot and passed on as memoryviews; the worker decrypts them into its own
+  plaintext buffer (fog.decrypt_reports_into) and frees the slot. When all
+  slots are in use, datagrams are received as bytes instead. Process
+  workers always get bytes (they are pickled to the child anyway).
+- Workers decrypt and call on_report(report, addr).
+  Process workers call it inside the child process, so it must be picklable
+  (a module-level function).
+"""
+
+import time
+import queue
+import select
+import signal
+import threading
+import multiprocessing
+
+from fog import BUFFER_SIZE, decrypt_reports_into
+from fog_buffers import BufferPool
+from report_delta import SeriesReconstructor
+from async_logging import stop_logging
+
+WORKER_KINDS = ["thread", "process"]
+
+
+def new_stats():
+    return {
+        "datagrams": 0,      # datagrams handed to a worker
+        "reports": 0,        # reports decrypted (after delta expansion, if enabled)
+        "errors": 0,         # failed authentication / decoding / handler errors
+        "out_of_order": 0,   # reports whose timestep did not increase for their pole
+        "last_done": 0.0,    # time.monotonic() when the last datagram was handled
+    }
+
+
+def worker_loop(inbox, on_report, reconstruct, stats_out, pool=None):
+    """Body of one decrypt worker, shared by the thread and process pools."""
+    stats = new_stats()
+    last_timestep = {}
+    reconstructor = SeriesReconstructor() if reconstruct else None
+    plaintext_buffer = memoryview(bytearray(BUFFER_SIZE))
+
+    while True:
+        batch = inbox.get()
+        if batch is None:
+            break
+        for data, addr, slot in batch:
+            stats["datagrams"] += 1
+            try:
+                try:
+                    reports = decrypt_reports_into(data, plaintext_buffer)
+                finally:
+                    if slot is not None:
+                        pool.release(slot)
+                if reconstructor is not None:
+                    reports = [dense for report in reports for dense in reconstructor.expand(report)]
+                for report in reports:
+                    pole = report.get("pole_id", "UNKNOWN")
+                    if report["timestep"] <= last_timestep.get(pole, -1):
+                        stats["out_of_order"] += 1
+                    last_timestep[pole] = report["timestep"]
+                    stats["reports"] += 1
+                    if on_report is not None:
+                        on_report(report, addr)
+            except Exception:
+                stats["errors"] += 1
+        stats["last_done"] = time.monotonic()
+    stats_out.put(stats)
+
+
+def process_worker_main(inbox, on_report, reconstruct, stats_out):
+    # Ctrl-C reaches the whole process group; the parent shuts workers down via stop()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_loop(inbox, on_report, reconstruct, stats_out)
+    # Children exit without running atexit handlers; write out queued log lines now
+    stop_logging()
+
+
+class PooledFogReceiver:
+    def __init__(self, sock, workers=4, kind="thread", on_report=None, reconstruct=False,
+                 drain_batch=256, max_queued_batches=4096, pool_slots=4096):
+        if kind not in WORKER_KINDS:
+            raise ValueError(f"unknown worker kind {kind!r}")
+        self.sock = sock
+        self.kind = kind
+        self.drain_batch = drain_batch
+        self.received = 0
+        self.queue_drops = 0   # datagrams discarded because a worker fell behind
+        self._running = False
+
+        if kind == "thread":
+            make_queue, make_worker, target = queue.Queue, threading.Thread, worker_loop
+            self.pool = BufferPool(pool_slots, BUFFER_SIZE)
+            extra_args = (self.pool,)
+        else:
+            ctx = multiprocessing.get_context()
+            make_queue, make_worker, target = ctx.Queue, ctx.Process, process_worker_main
+            self.pool = None
+            extra_args = ()
+        self._stats_out = make_queue()
+        self._inboxes = [make_queue(max_queued_batches) for _ in range(workers)]
+        self._workers = [make_worker(target=target,
+                                     args=(inbox, on_report, reconstruct, self._stats_out) + extra_args,
+                                     daemon=True)
+                         for inbox in self._inboxes]
+        self._receiver = threading.Thread(target=self._receive_loop, daemon=True)
+
+    def start(self):
+        self._running = True
+        for worker in self._workers:
+            worker.start()
+        self._receiver.start()
+
+    def stop(self):
+        """Stop receiving, let workers finish their queues, and return combined stats."""
+        self._running = False
+        self._receiver.join()
+        for inbox in self._inboxes:
+            inbox.put(None)
+        totals = new_stats()
+        for _ in self._workers:
+            stats = self._stats_out.get()
+            for key, value in stats.items():
+                totals[key] = max(totals[key], value) if key == "last_done" else totals[key] + value
+        for worker in self._workers:
+            worker.join()
+        totals["received"] = self.received
+        totals["queue_drops"] = self.queue_drops
+        totals["pool_exhausted"] = self.pool.exhausted if self.pool is not None else 0
+        return totals
+
+    def _receive_loop(self):
+        sock = self.sock
+        sock.setblocking(False)
+        pool = self.pool
+        n_workers = len(self._inboxes)
+        while self._running:
+            # Wake up regularly to notice stop()
+            readable, _, _ = select.select([sock], [], [], 0.2)
+            if not readable:
+                continue
+            shards = [[] for _ in range(n_workers)]
+            drained = 0
+            while drained < self.drain_batch:
+                slot = pool.acquire() if pool is not None else None
+                try:
+                    if slot is None:
+                        data, addr = sock.recvfrom(BUFFER_SIZE)
+                    else:
+                        data, addr = pool.recv_into(sock, slot)
+                except (BlockingIOError, InterruptedError):
+                    if slot is not None:
+                        pool.release(slot)
+                    break
+                shards[hash(addr) % n_workers].append((data, addr, slot))
+                drained += 1
+            self.received += drained
+
+            for inbox, shard in zip(self._inboxes, shards):
+                if not shard:
+                    continue
+                try:
+                    inbox.put_nowait(shard)
+                except queue.Full:
+                    self.queue_drops += len(shard)
+                    if pool is not None:
+                        for _, _, slot in shard:
+                            if slot is not None:
+                                pool.release(slot)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+multi_edge.py
+
+Runs many poles against ONE SUMO instance instead of one SUMO per edge
+process (edge1.py, edge2.py, ... each start their own simulation of the same
+network, so N poles cost N simulations and never see each other's traffic).
+
+- The pole layout (a JSON file, see configs/corridor.poles.json) maps each
+  pole id to the TLS it controls and its north/south/east/west lane-area
+  detectors (and, optionally, the polygons colored in the GUI and its
+  "west"/"east" neighbours, used by fog.py --coordinate).
+- Every detector is subscribed once; each step reads all counts from the
+  subscription results into one (poles, 4) array.
+- Phases of all poles are decided in one vectorized call
+  (controller.PhaseController, same rules as control_traffic_light); only
+  poles whose phase changed get a setPhase() call.
+- Each pole still sends its own reports, sealed under its own key, from its own UDP socket,
+  with the same --report-format/--batch-*/--delta/--fog-control/--log-*
+  options as edge_template.py. With --fog-control, a pole's fog command
+  overrides the vectorized decision for that pole (fog_control.py).
+- --scenario PARAMS.json runs a generated scenario (scenario.py) instead of
+  --config/--layout; --warm-start S starts from a cached SUMO state S
+  simulated seconds in instead of an empty network.
+- --discover finds the TLS and their approach detectors with TraCI once SUMO
+  runs instead of reading --layout (tls_discovery.py), so any network runs
+  as is; --write-layout FILE saves what was found (for fog.py --coordinate).
+- --record-trace FILE saves every step's detector counts, which
+  benchmarks/bench_replay.py replays through the edge and fog code without
+  SUMO (replay_trace.py).
+
+Usage:
+    python multi_edge.py --headless [--poles pole1,pole3] [--max-steps 2000]
+    python multi_edge.py --headless --scenario configs/corridor5.scenario.json --warm-start 300
+    python multi_edge.py --headless --discover --config configs/intersection.sumocfg
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+
+import numpy as np
+
+from controller import PhaseController
+from report_codec import FORMATS, FORMAT_JSON, FORMAT_BINARY, encode_report, pole_index_from_id
+from report_batcher import MAX_MTU, ReportBatcher
+from report_crypto import ReportSealer
+from report_delta import DeltaFilter, report_state
+from fog_control import COMMAND_TIMEOUT_MS, CommandReceiver
+from async_logging import add_logging_args, setup_from_args
+from scenario import build_scenario, start_sumo, sumo_command, warm_state
+from tls_discovery import discover_layout
+from replay_trace import TraceWriter
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--config", default="configs/corridor.sumocfg",
+                    help="SUMO configuration with one TLS per pole")
+parser.add_argument("--layout", default="configs/corridor.poles.json",
+                    help="JSON file mapping pole ids to their TLS, detectors and polygons")
+parser.add_argument("--discover", action="store_true",
+                    help="Find TLS and approach detectors with TraCI at startup instead of reading --layout")
+parser.add_argument("--write-layout", default=None,
+                    help="With --discover, save the discovered layout to this JSON file")
+parser.add_argument("--scenario", default=None,
+                    help="JSON file of scenario.py parameters; generates (or reuses) the config and layout")
+parser.add_argument("--warm-start", type=float, default=0,
+                    help="Start from the SUMO state this many simulated seconds in (cached after the first run)")
+parser.add_argument("--poles", default=None,
+                    help="Comma-separated subset of the layout's poles to drive (default: all)")
+parser.add_argument("--headless", action="store_true",
+                    help="Run plain 'sumo' instead of 'sumo-gui' and skip polygon coloring")
+parser.add_argument("--max-steps", type=int, default=0,
+                    help="Stop after this many steps (0 = run until the simulation ends)")
+parser.add_argument("--report-format", choices=FORMATS, default=FORMAT_JSON,
+                    help="Plaintext encoding of each report (binary needs 'pole<N>' ids)")
+parser.add_argument("--batch-steps", type=int, default=1,
+                    help="Send one datagram per this many steps per pole (1 = every step)")
+parser.add_argument("--batch-ms", type=float, default=0,
+                    help="Also flush a batch once its oldest report is this many ms old (0 = off)")
+parser.add_argument("--mtu", type=int, default=1500,
+                    help=f"Keep each datagram (plus IP/UDP headers) within this many bytes (at most {MAX_MTU})")
+parser.add_argument("--delta", action="store_true",
+                    help="Only send a report when a count or the phase changed (plus keyframes)")
+parser.add_argument("--keyframe-steps", type=int, default=50,
+                    help="With --delta, resend the current state after this many unchanged steps "
+                         "(0 = no keyframes, send on change only)")
+parser.add_argument("--fog-control", action="store_true",
+                    help="Apply phase commands from a fog running --coordinate")
+parser.add_argument("--command-timeout-ms", type=float, default=COMMAND_TIMEOUT_MS,
+                    help="With --fog-control, use local control when no command arrived for this long")
+parser.add_argument("--record-trace", default=None,
+                    help="Write every step's detector counts to this trace file (replay_trace.py)")
+add_logging_args(parser)
+args = parser.parse_args()
+if args.keyframe_steps < 0:
+    parser.error("--keyframe-steps must be 0 (no keyframes) or more")
+if args.mtu > MAX_MTU:
+    parser.error(f"--mtu {args.mtu} exceeds {MAX_MTU}, the largest datagram the fog receives whole")
+
+if args.scenario:
+    with open(args.scenario) as f:
+        scenario = build_scenario(json.load(f))
+    args.config, args.layout = scenario["config"], scenario["layout"]
+
+def select_poles(layout, source):
+    """The layout's poles named by --poles (default: all of them), checked against the report format."""
+    pole_ids = args.poles.split(",") if args.poles else list(layout)
+    for pole_id in pole_ids:
+        if pole_id not in layout:
+            parser.error(f"pole {pole_id!r} is not in {source}")
+        if args.report_format == FORMAT_BINARY:
+            try:
+                pole_index_from_id(pole_id)
+            except ValueError as e:
+                parser.error(str(e))
+    return pole_ids
+
+if args.discover:
+    # Found with TraCI once SUMO runs (run_poles)
+    LAYOUT = POLE_IDS = None
+else:
+    with open(args.layout) as f:
+        LAYOUT = json.load(f)
+    POLE_IDS = select_poles(LAYOUT, args.layout)
+
+log = logging.getLogger("vanet.edge")
+report_sampler = setup_from_args(args)
+
+# ————————————————
+# 1) SUMO / TraCI setup
+# ————————————————
+if 'SUMO_HOME' not in os.environ:
+    print("Error: please set SUMO_HOME to your SUMO installation directory.")
+    sys.exit(1)
+
+sys.path.append(os.path.join(os.environ['SUMO_HOME'], 'tools'))
+
+import traci
+import traci.constants as tc
+
+SUMO_BINARY = "sumo" if args.headless else "sumo-gui"
+
+# ————————————————
+# 2) Encryption and UDP (per-pole keys and fog address as in edge_template.py)
+# ————————————————
+UDP_IP = "127.0.0.1"
+UDP_PORT = 5005
+
+def make_sender(sock):
+    """Sends from the pole's own socket, so the fog sees each pole at its own address."""
+    def send_datagram(datagram):
+        sock.sendto(datagram, (UDP_IP, UDP_PORT))
+    return send_datagram
+
+# ————————————————
+# 3) Sensors and polygons
+# ————————————————
+BUCKET_COLORS = [
+    (0, 255, 0, 255),    # Green for 0 vehicles
+    (255, 255, 0, 255),  # Yellow for 1-5 vehicles
+    (255, 0, 0, 255),    # Red for > 5 vehicles
+]
+
+def count_buckets(counts):
+    """edge_template.count_bucket for a whole array of counts."""
+    return np.minimum(counts, 1) + (counts > 5)
+
+def setup_sensor_subscriptions(detector_ids):
+    for detector_id in detector_ids:
+        traci.lanearea.subscribe(detector_id, [tc.LAST_STEP_VEHICLE_NUMBER])
+
+def read_subscribed_counts(detector_ids, out):
+    """Fill out (poles, 4) with the counts delivered by the last simulationStep()."""
+    results = traci.lanearea.getAllSubscriptionResults()
+    out.reshape(-1)[:] = [results[detector_id][tc.LAST_STEP_VEHICLE_NUMBER] for detector_id in detector_ids]
+
+def pole_report(pole_id, step, counts, phase):
+    north_count, south_count, east_count, west_count = counts
+    return {
+        "pole_id": pole_id,
+        "timestep": step,
+        "north_count": north_count,
+        "south_count": south_count,
+        "east_count": east_count,
+        "west_count": west_count,
+        "current_phase": phase
+    }
+
+# ————————————————
+# 4) Main TraCI loop
+# ————————————————
+def discover_poles():
+    global LAYOUT, POLE_IDS
+    start = time.perf_counter()
+    LAYOUT, skipped = discover_layout(traci, polygons=not args.headless)
+    for tls_id, reason in skipped.items():
+        log.warning(f"[multi] Skipped TLS {tls_id}: {reason}")
+    log.info(f"[multi] Discovered {len(LAYOUT)} poles in {time.perf_counter() - start:.3f} s")
+    if args.write_layout:
+        with open(args.write_layout, "w") as f:
+            json.dump(LAYOUT, f, indent=4)
+        log.info(f"[multi] Layout written to {args.write_layout}")
+    POLE_IDS = select_poles(LAYOUT, "the discovered layout")
+
+def run_poles():
+    state = warm_state(args.config, args.warm_start) if args.warm_start else None
+    start = time.perf_counter()
+    start_sumo(sumo_command(SUMO_BINARY, args.config, state))
+    log.info(f"[multi] SUMO started in {time.perf_counter() - start:.2f} s"
+             + (f" (warm start at {args.warm_start:g} s)" if state else ""))
+    if args.discover:
+        discover_poles()
+
+    tls_ids = [LAYOUT[pole_id]["tls"] for pole_id in POLE_IDS]
+    detector_ids = [detector_id for pole_id in POLE_IDS for detector_id in LAYOUT[pole_id]["detectors"]]
+    polygon_ids = [LAYOUT[pole_id].get("polygons") for pole_id in POLE_IDS]
+    n_poles = len(POLE_IDS)
+    log.info(f"[multi] Driving {n_poles} poles: {', '.join(POLE_IDS)}")
+
+    phases = np.zeros(n_poles, dtype=np.int64)  # Start with N-S green (Phase 0)
+    for pole_id, tls_id in zip(POLE_IDS, tls_ids):
+        try:
+            traci.trafficlight.setPhase(tls_id, 0)
+        except traci.TraCIException as e:
+            log.error(f"{pole_id}: Error setting initial TLS phase for {tls_id}: {e}")
+    setup_sensor_subscriptions(detector_ids)
+    log.info(f"[multi] Subscribed to {len(detector_ids)} detectors")
+
+    controller = PhaseController(n_poles)
+    sealers = [ReportSealer(pole_id) for pole_id in POLE_IDS]
+    socks = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in POLE_IDS]
+    batchers = [ReportBatcher(sealer.seal, make_sender(sock), max_steps=args.batch_steps,
+                              max_delay_ms=args.batch_ms, mtu=args.mtu, seal_overhead=sealer.overhead)
+                for sealer, sock in zip(sealers, socks)]
+    receivers = [CommandReceiver(sock, pole_id, args.command_timeout_ms)
+                 for pole_id, sock in zip(POLE_IDS, socks)] if args.fog_control else []
+    deltas = [DeltaFilter(args.keyframe_steps) if args.delta else None for _ in POLE_IDS]
+    counts = np.zeros((n_poles, 4), dtype=np.int64)
+    polygon_buckets = np.full((n_poles, 4), -1)
+    has_polygons = np.array([bool(ids) for ids in polygon_ids])[:, None]
+
+    log_reports = log.isEnabledFor(logging.DEBUG)
+    trace = None
+    if args.record_trace:
+        trace = TraceWriter(args.record_trace, POLE_IDS, tls_ids,
+                            [LAYOUT[pole_id]["detectors"] for pole_id in POLE_IDS],
+                            config=args.config, step_length=traci.simulation.getDeltaT())
+
+    step = 0
+    sim_time = 0.0   # seconds spent in simulationStep() + sensor reads
+    run_start = time.perf_counter()
+    while traci.simulation.getMinExpectedNumber() > 0:
+        if args.max_steps and step >= args.max_steps:
+            break
+        step_start = time.perf_counter()
+        traci.simulationStep()
+        step += 1
+        read_subscribed_counts(detector_ids, counts)
+        sim_time += time.perf_counter() - step_start
+        if trace is not None:
+            trace.append(counts)
+
+        next_phases = controller.next_phases(counts, phases)
+        if receivers:
+            for receiver in receivers:
+                receiver.poll()
+            now = time.time()
+            for i, receiver in enumerate(receivers):
+                commanded_phase = receiver.phase(now)
+                if commanded_phase is not None:
+                    next_phases[i] = commanded_phase
+                    receiver.mark_applied(now, step)
+        for i in np.flatnonzero(next_phases != phases).tolist():
+            try:
+                traci.trafficlight.setPhase(tls_ids[i], int(next_phases[i]))
+            except traci.TraCIException as e:
+                log.error(f"{POLE_IDS[i]}: Error setting TLS phase for {tls_ids[i]}: {e}")
+        phases = next_phases
+
+        for i, (pole_counts, phase) in enumerate(zip(counts.tolist(), phases.tolist())):
+            report = pole_report(POLE_IDS[i], step, pole_counts, phase)
+            delta = deltas[i]
+            if delta is None or delta.should_send(step, report_state(report)):
+                batchers[i].add(encode_report(report, args.report_format), phase)
+                if log_reports and report_sampler.should_log(POLE_IDS[i], step, report_state(report)):
+                    log.debug("%s [step %d]: sent encrypted report → %s", POLE_IDS[i], step, report,
+                              extra={"report": report})
+        if args.batch_ms:
+            # With --delta most steps add nothing; --batch-ms must still hold
+            for batcher in batchers:
+                batcher.poll()
+
+        if not args.headless:
+            buckets = count_buckets(counts)
+            for i, a in zip(*np.nonzero((buckets != polygon_buckets) & has_polygons)):
+                try:
+                    traci.polygon.setColor(polygon_ids[i][a], BUCKET_COLORS[buckets[i, a]])
+                    # Only recorded once applied, so a failed recolour is retried next step
+                    polygon_buckets[i, a] = buckets[i, a]
+                except traci.TraCIException as e:
+                    log.error(f"{POLE_IDS[i]}: Error setting color for {polygon_ids[i][a]}: {e}")
+
+    # The fog rebuilds skipped steps from the next report, so always send the last one
+    if args.delta and step:
+        for i, (pole_counts, phase) in enumerate(zip(counts.tolist(), phases.tolist())):
+            if deltas[i].last_sent_step != step:
+                report = pole_report(POLE_IDS[i], step, pole_counts, phase)
+                batchers[i].add(encode_report(report, args.report_format), phase)
+                deltas[i].mark_sent(step)
+    for batcher in batchers:
+        batcher.flush()
+    if trace is not None:
+        trace.close()
+        log.info(f"[multi] Recorded {trace.steps_written} steps of {n_poles} poles to {args.record_trace}")
+
+    wall_time = time.perf_counter() - run_start
+    if step:
+        display = "headless" if args.headless else "gui"
+        log.info(f"[multi] {step} steps in {wall_time:.2f} s = {step / wall_time:.0f} steps/s ({display}), "
+                 f"{step * n_poles / wall_time:.0f} pole-steps/s")
+        log.info(f"[multi] step+sensor read {sim_time / step * 1e3:.3f} ms/step for {n_poles} poles")
+    reports = sum(batcher.reports_sent for batcher in batchers)
+    datagrams = sum(batcher.datagrams_sent for batcher in batchers)
+    log.info(f"[multi] sent {reports} reports in {datagrams} datagrams")
+    for pole_id, receiver in zip(POLE_IDS, receivers):
+        receiver.report(f"{pole_id}: ", log.info)
+
+    traci.close()
+    log.info("[multi] Simulation ended.")
+
+if __name__ == "__main__":
+    run_poles()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+replay_trace.py
+
+Per-step detector counts of a real run, and a stand-in TraCI that plays them
+back, so the edge-to-fog pipeline can be exercised without SUMO
+(benchmarks/bench_replay.py).
+
+- multi_edge.py / edge_template.py --record-trace FILE write a TraceWriter:
+  after every step, the (poles, 4) north/south/east/west counts the edge read.
+- A trace file is a 12-byte header (magic, version, approaches, metadata
+  length), the metadata as JSON (pole ids, their TLS and detectors, config,
+  step length), padded to 8 bytes, then one (poles, 4) block of u2 counts
+  per step. Unlike fog_log.py the ids are known up front, so they live in
+  the file itself. Steps are appended in chunks of CHUNK_STEPS; a run that
+  is killed leaves a trace of the steps written so far.
+- open_trace() memory-maps the counts as a (steps, poles, 4) array.
+- ReplayTraCI is enough of the traci module for the edge loops:
+  simulationStep(), simulation.getMinExpectedNumber(), lanearea
+  subscriptions and getLastStepVehicleNumber(), trafficlight.setPhase() and
+  polygon.setColor() (both recorded, not applied). Its poles replay the
+  trace's poles in turn; when there are more poles than the trace has, each
+  further copy starts COPY_OFFSET_STEPS later in the trace, and the trace
+  wraps around. Phase changes do not feed back into the counts.
+  install() puts it in sys.modules as "traci" (and "traci.constants").
+
+Usage (summary of a trace):
+    python replay_trace.py traces/corridor.vtrc
+"""
+
+import os
+import sys
+import json
+import struct
+import argparse
+
+import numpy as np
+
+MAGIC = b"VTRC"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")   # magic, version, approaches, metadata length
+APPROACHES = ("north", "south", "east", "west")
+COUNT_DTYPE = np.dtype("<u2")
+CHUNK_STEPS = 1024
+COPY_OFFSET_STEPS = 997            # prime, so copies of a pole rarely line up with each other
+
+
+def metadata_size(meta_bytes):
+    """Metadata length rounded up to 8 bytes, so the counts start aligned."""
+    return -(-len(meta_bytes) // 8) * 8
+
+
+class TraceWriter:
+    def __init__(self, path, pole_ids, tls_ids=None, detector_ids=None, **meta):
+        """detector_ids: per pole, its (north, south, east, west) detectors; extra meta is stored as is."""
+        self.path = path
+        self.n_poles = len(pole_ids)
+        meta = dict(poles=list(pole_ids), tls=list(tls_ids or []), detectors=list(detector_ids or []), **meta)
+        meta_bytes = json.dumps(meta).encode("utf-8")
+        self.f = open(path, "wb")
+        self.f.write(HEADER.pack(MAGIC, VERSION, len(APPROACHES), len(meta_bytes)))
+        self.f.write(meta_bytes.ljust(metadata_size(meta_bytes), b" "))
+        self.chunk = np.zeros((CHUNK_STEPS, self.n_poles, len(APPROACHES)), dtype=COUNT_DTYPE)
+        self.staged = 0
+        self.steps_written = 0
+
+    def append(self, counts):
+        """counts: (poles, 4) array or nested sequence of this step's counts."""
+        self.chunk[self.staged] = counts
+        self.staged += 1
+        if self.staged == CHUNK_STEPS:
+            self.flush()
+
+    def flush(self):
+        if self.staged:
+            self.f.write(self.chunk[:self.staged].tobytes())
+            self.steps_written += self.staged
+            self.staged = 0
+            self.f.flush()
+
+    def close(self):
+        self.flush()
+        self.f.close()
+
+
+def open_trace(path):
+    """Returns (counts, meta): a read-only (steps, poles, 4) array and the metadata dict."""
+    with open(path, "rb") as f:
+        magic, version, approaches, meta_len = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or approaches != len(APPROACHES):
+            raise ValueError(f"{path}: not a version {VERSION} detector count trace")
+        meta_bytes = f.read(meta_len)
+    meta = json.loads(meta_bytes)
+    offset = HEADER.size + metadata_size(meta_bytes)
+    block = len(meta["poles"]) * len(APPROACHES) * COUNT_DTYPE.itemsize
+    steps = (os.path.getsize(path) - offset) // block
+    if steps == 0:
+        raise ValueError(f"{path}: trace has no steps")
+    counts = np.memmap(path, dtype=COUNT_DTYPE, mode="r", offset=offset,
+                       shape=(steps, len(meta["poles"]), len(APPROACHES)))
+    return counts, meta
+
+
+# ————————————————
+# Stand-in TraCI
+# ————————————————
+class TraCIException(Exception):
+    pass
+
+
+class FatalTraCIError(Exception):
+    pass
+
+
+class _Namespace:
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+class ReplayTraCI:
+    # The traci.constants value the edges subscribe to
+    LAST_STEP_VEHICLE_NUMBER = 0x10
+
+    def __init__(self, counts, n_poles=None, steps=None):
+        """
+        counts: (trace steps, trace poles, 4) from open_trace(). n_poles
+        (default: the trace's) poles "replay<k>" are simulated for steps
+        steps (default: the trace's length).
+        """
+        trace_steps, trace_poles, _ = counts.shape
+        self.n_poles = n_poles or trace_poles
+        self.steps = steps or trace_steps
+        self.counts = np.asarray(counts)
+        self.tls_ids = [f"replay{k}" for k in range(1, self.n_poles + 1)]
+        self.detector_ids = [[f"{tls_id}_{approach}" for approach in APPROACHES] for tls_id in self.tls_ids]
+        self.columns = np.arange(self.n_poles) % trace_poles
+        self.offsets = np.arange(self.n_poles) // trace_poles * COPY_OFFSET_STEPS
+        self._detector_index = {detector_id: i for i, detector_id in
+                                enumerate(d for pole in self.detector_ids for d in pole)}
+        self.step = 0
+        self.current = np.zeros((self.n_poles, len(APPROACHES)), dtype=np.int64)
+        self.flat_counts = []
+        self.subscribed = []
+        self.results = {}
+        self.phases = {}
+        self.phase_calls = 0
+        self.color_calls = 0
+
+        self.TraCIException = TraCIException
+        self.FatalTraCIError = FatalTraCIError
+        self.constants = _Namespace(LAST_STEP_VEHICLE_NUMBER=self.LAST_STEP_VEHICLE_NUMBER)
+        self.simulation = _Namespace(getMinExpectedNumber=self._remaining, getDeltaT=lambda: 0.1)
+        self.lanearea = _Namespace(subscribe=self._subscribe,
+                                   getAllSubscriptionResults=lambda: self.results,
+                                   getLastStepVehicleNumber=self._vehicle_number,
+                                   getIDList=lambda: list(self._detector_index))
+        self.trafficlight = _Namespace(setPhase=self._set_phase, getIDList=lambda: list(self.tls_ids))
+        self.polygon = _Namespace(setColor=self._set_color)
+
+    def simulationStep(self, step=0.0):
+        rows = (self.step + self.offsets) % len(self.counts)
+        self.current = self.counts[rows, self.columns].astype(np.int64)
+        self.step += 1
+        self.flat_counts = self.current.reshape(-1).tolist()
+        if self.subscribed:
+            # Built every step, as traci decodes a fresh result dict from each reply
+            self.results = {detector_id: {self.LAST_STEP_VEHICLE_NUMBER: self.flat_counts[index]}
+                            for detector_id, index in self.subscribed}
+
+    def close(self):
+        pass
+
+    def _remaining(self):
+        return max(self.steps - self.step, 0)
+
+    def _subscribe(self, detector_id, variables):
+        index = self._detector_index.get(detector_id)
+        if index is None:
+            raise TraCIException(f"Lane area detector '{detector_id}' is not known")
+        self.subscribed.append((detector_id, index))
+
+    def _vehicle_number(self, detector_id):
+        index = self._detector_index.get(detector_id)
+        if index is None:
+            raise TraCIException(f"Lane area detector '{detector_id}' is not known")
+        return self.flat_counts[index]
+
+    def _set_phase(self, tls_id, phase):
+        self.phases[tls_id] = phase
+        self.phase_calls += 1
+
+    def _set_color(self, polygon_id, color):
+        self.color_calls += 1
+
+
+def install(replay):
+    """Make `import traci` / `import traci.constants` return the stand-in."""
+    sys.modules["traci"] = replay
+    sys.modules["traci.constants"] = replay.constants
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", help="Trace written with --record-trace")
+    args = parser.parse_args()
+    counts, meta = open_trace(args.trace)
+    step_length = meta.get("step_length")
+    print(f"[trace] {args.trace}: {counts.shape[0]} steps x {counts.shape[1]} poles"
+          + (f" ({counts.shape[0] * step_length:g} simulated s)" if step_length else "")
+          + (f" from {meta['config']}" if meta.get("config") else ""))
+    means = counts.mean(axis=0)
+    for pole_id, tls_id, pole_means in zip(meta["poles"], meta["tls"] or meta["poles"], means):
+        print(f"{pole_id:>8} ({tls_id}): mean counts " +
+              " ".join(f"{approach[0].upper()} {mean:.2f}" for approach, mean in zip(APPROACHES, pole_means)))
+
+
+if __name__ == "__main__":
+    main()
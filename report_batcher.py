@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+report_batcher.py
+
+Coalesces several per-step edge reports into one encrypted UDP datagram.
+
+A batch is flushed when any of these holds:
+- it holds max_steps reports,
+- max_delay_ms of wall-clock time passed since its first report,
+- the report just added carries a phase change (sent immediately),
+- the next report would push the datagram past the MTU.
+
+add() checks these as reports arrive. Steps that add nothing (an edge in
+--delta mode skips unchanged ones) call poll() instead, so max_delay_ms
+still bounds how long a report waits.
+
+With max_steps=1 every report goes out on its own, unwrapped, exactly as
+before batching existed.
+"""
+
+import time
+
+from report_codec import BATCH_HEADER, BATCH_RECORD_LEN, encode_batch
+from report_crypto import MAX_DATAGRAM
+
+IP_UDP_OVERHEAD = 28   # IPv4 header (20) + UDP header (8)
+MAX_MTU = MAX_DATAGRAM + IP_UDP_OVERHEAD  # larger datagrams would be truncated by the fog's receive buffer
+SEAL_OVERHEAD = 39     # report_crypto header for a 5-character pole id (23) + tag (16)
+
+
+class ReportBatcher:
+    def __init__(self, seal, send, max_steps=1, max_delay_ms=0, mtu=1500,
+                 seal_overhead=SEAL_OVERHEAD):
+        """
+        seal: callable(plaintext bytes) -> datagram bytes (encryption)
+        send: callable(datagram bytes), e.g. a bound sock.sendto
+        seal_overhead: bytes seal adds (ReportSealer.overhead)
+        """
+        self.seal = seal
+        self.send = send
+        self.max_steps = max(1, max_steps)
+        self.max_delay = max_delay_ms / 1000.0
+        if mtu > MAX_MTU:
+            raise ValueError(f"MTU {mtu} exceeds {MAX_MTU}: the fog receives datagrams of up to "
+                             f"{MAX_DATAGRAM} bytes")
+        self.max_plaintext = mtu - IP_UDP_OVERHEAD - seal_overhead
+        if self.max_plaintext <= BATCH_HEADER.size + BATCH_RECORD_LEN.size:
+            raise ValueError(f"MTU {mtu} leaves no room for a report")
+
+        self.pending = []
+        self.pending_bytes = BATCH_HEADER.size
+        self.first_time = 0.0
+        self.last_phase = None
+
+        self.reports_sent = 0
+        self.datagrams_sent = 0
+        self.bytes_sent = 0
+
+    def add(self, encoded_report, phase):
+        """Queue one encoded report; sends a datagram if a flush condition is met."""
+        phase_changed = self.last_phase is not None and phase != self.last_phase
+        self.last_phase = phase
+
+        record_bytes = BATCH_RECORD_LEN.size + len(encoded_report)
+        if self.pending and self.pending_bytes + record_bytes > self.max_plaintext:
+            self.flush()
+
+        if not self.pending and self.max_delay:
+            self.first_time = time.monotonic()
+        self.pending.append(encoded_report)
+        self.pending_bytes += record_bytes
+
+        if (phase_changed
+                or len(self.pending) >= self.max_steps
+                or (self.max_delay and time.monotonic() - self.first_time >= self.max_delay)):
+            self.flush()
+
+    def poll(self):
+        """Flush the pending batch if max_delay_ms has passed; call once per step."""
+        if self.pending and self.max_delay and time.monotonic() - self.first_time >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        """Seal and send whatever is pending (no-op when empty)."""
+        if not self.pending:
+            return
+        if len(self.pending) == 1:
+            plaintext = self.pending[0]
+        else:
+            plaintext = encode_batch(self.pending)
+        datagram = self.seal(plaintext)
+        self.send(datagram)
+
+        self.reports_sent += len(self.pending)
+        self.datagrams_sent += 1
+        self.bytes_sent += len(datagram)
+        self.pending = []
+        self.pending_bytes = BATCH_HEADER.size
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+report_codec.py
+
+Plaintext encodings for edge -> fog reports (the bytes sealed with AES-GCM).
+
+- JSON (legacy): the report dict as UTF-8 JSON. Always starts with '{'.
+- Binary v1: a format byte (0x01) followed by a fixed little-endian layout:
+  pole index (u16), timestep (u32), north/south/east/west counts (u16 each)
+  and current phase (u8) -- 16 bytes in total.
+
+decode_report() looks at the first plaintext byte to pick the format, so a
+fog can receive JSON and binary reports from different poles at the same time.
+
+Several encoded reports can be carried in one plaintext as a batch: a format
+byte (0x02) and a u16 record count, then each record as a u16 length followed
+by the encoded report. decode_reports() accepts single reports and batches.
+"""
+
+import re
+import json
+import struct
+from functools import lru_cache
+
+FORMAT_JSON = "json"
+FORMAT_BINARY = "binary"
+FORMATS = [FORMAT_JSON, FORMAT_BINARY]
+
+FORMAT_BYTE_BINARY_V1 = 0x01
+FORMAT_BYTE_BATCH = 0x02
+JSON_FIRST_BYTE = ord('{')
+
+# format byte, pole index, timestep, north, south, east, west, current phase
+BINARY_V1 = struct.Struct("<BHIHHHHB")
+
+# format byte, record count; each record is then prefixed with its length
+BATCH_HEADER = struct.Struct("<BH")
+BATCH_RECORD_LEN = struct.Struct("<H")
+
+POLE_ID_PREFIX = "pole"
+_POLE_ID_RE = re.compile(POLE_ID_PREFIX + r"(\d+)")
+
+
+@lru_cache(maxsize=None)
+def pole_index_from_id(pole_id):
+    """
+    Binary reports carry a numeric pole index instead of the pole_id string.
+    'pole7' -> 7. Raises ValueError for ids that do not follow that pattern.
+    """
+    match = _POLE_ID_RE.fullmatch(pole_id)
+    if match is None or int(match.group(1)) > 0xFFFF:
+        raise ValueError(f"pole id {pole_id!r} has no binary index (expected '{POLE_ID_PREFIX}<0-65535>')")
+    return int(match.group(1))
+
+
+@lru_cache(maxsize=None)
+def pole_id_from_index(pole_index):
+    return f"{POLE_ID_PREFIX}{pole_index}"
+
+
+def encode_binary(pole_index, timestep, north_count, south_count, east_count, west_count, current_phase):
+    """Fast path for the edge loop: pack one report without building a dict."""
+    return BINARY_V1.pack(FORMAT_BYTE_BINARY_V1, pole_index, timestep,
+                          north_count, south_count, east_count, west_count, current_phase)
+
+
+def encode_report(report, fmt=FORMAT_JSON):
+    """Encode a report dict (as built by run_edge) in the requested format."""
+    if fmt == FORMAT_JSON:
+        return json.dumps(report).encode('utf-8')
+    if fmt == FORMAT_BINARY:
+        return encode_binary(pole_index_from_id(report["pole_id"]), report["timestep"],
+                             report["north_count"], report["south_count"],
+                             report["east_count"], report["west_count"],
+                             report["current_phase"])
+    raise ValueError(f"unknown report format {fmt!r}")
+
+
+def decode_report(plaintext):
+    """
+    Decode a plaintext produced by encode_report() in either format.
+    Returns the same dict shape for both. plaintext may be bytes or a
+    memoryview (e.g. of a decryption buffer; batch records are decoded
+    from slices of it without copying).
+    """
+    first = plaintext[0]
+    if first == FORMAT_BYTE_BINARY_V1:
+        (_, pole_index, timestep, north_count, south_count,
+         east_count, west_count, current_phase) = BINARY_V1.unpack(plaintext)
+        return {
+            "pole_id": pole_id_from_index(pole_index),
+            "timestep": timestep,
+            "north_count": north_count,
+            "south_count": south_count,
+            "east_count": east_count,
+            "west_count": west_count,
+            "current_phase": current_phase
+        }
+    if first == JSON_FIRST_BYTE:
+        return json.loads(str(plaintext, 'utf-8'))
+    if first == FORMAT_BYTE_BATCH:
+        raise ValueError("plaintext is a batch; use decode_reports()")
+    raise ValueError(f"unknown report format byte 0x{first:02x}")
+
+
+def encode_batch(encoded_reports):
+    """Concatenate already-encoded reports (any mix of formats) into one batch plaintext."""
+    parts = [BATCH_HEADER.pack(FORMAT_BYTE_BATCH, len(encoded_reports))]
+    for encoded in encoded_reports:
+        parts.append(BATCH_RECORD_LEN.pack(len(encoded)))
+        parts.append(encoded)
+    return b"".join(parts)
+
+
+def decode_reports(plaintext):
+    """Decode a single report or a batch. Always returns a list of report dicts."""
+    if plaintext[0] != FORMAT_BYTE_BATCH:
+        return [decode_report(plaintext)]
+
+    _, count = BATCH_HEADER.unpack_from(plaintext)
+    offset = BATCH_HEADER.size
+    reports = []
+    for _ in range(count):
+        (length,) = BATCH_RECORD_LEN.unpack_from(plaintext, offset)
+        offset += BATCH_RECORD_LEN.size
+        if offset + length > len(plaintext):
+            raise ValueError("truncated batch record")
+        reports.append(decode_report(plaintext[offset:offset + length]))
+        offset += length
+    if offset != len(plaintext):
+        raise ValueError("trailing bytes after batch records")
+    return reports
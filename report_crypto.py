@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+report_crypto.py
+
+AES-GCM sealing of report datagrams, shared by the edges and the fog.
+
+- Every pole has its own 128-bit key, derived from MASTER_SECRET with
+  HKDF-SHA256 (context = pole id). Only the fog holds MASTER_SECRET: each
+  edge is provisioned with the keys of its own poles (files in
+  VANET_KEY_DIR, written on the fog by `report_crypto.py --provision`), so
+  a compromised pole cannot derive any other pole's key or the fog's
+  command keys. Development setups, with neither variable set, derive
+  every key from the built-in development secret instead.
+- A ReportSealer derives a session key from its pole key and a session id
+  (the start time in
+  microseconds, shifted left by SESSION_RANDOM_BITS random bits), so
+  counters can restart at 1 after an edge restart without ever reusing a
+  (key, nonce) pair. Session ids strictly increase within a process, so
+  sealers for one pole created in the same microsecond (tools building
+  them in a loop) never share a session key; the random bits keep
+  separate processes apart.
+- Nonces are 12 bytes: four zero bytes and the sealer's 64-bit message
+  counter. Only the counter goes on the wire.
+- If the optional `cryptography` package is installed, the AES key
+  schedule is built once per session and its AESGCM object reused for
+  every message. The repo only requires pycryptodome, which needs an
+  AES.new() per message, so there sealing and opening cost what they did
+  before (benchmarks/bench_crypto.py times both backends).
+- seal_many() seals a list of plaintexts in one call (bulk tools, tests).
+
+Datagram layout (big-endian):
+
+    version (1) | id length (1) | pole id (utf-8) | session (8) | counter (8)
+    | ciphertext | tag (16)
+
+The header is authenticated as associated data. ReportOpener picks the key
+from the pole id in the header (deriving it from the master costs two
+HKDFs, and is kept only once a datagram of that pole authenticates, so
+forged pole ids cannot grow the opener's key table; with pole_ids, other ids
+are rejected before any key is derived) and rejects replays: per pole, only the
+newest session is accepted, and within it a counter is accepted once and
+only if it is within REPLAY_WINDOW of the highest counter seen (so
+reordering by the network is tolerated). An edge whose clock went
+backwards across a restart is rejected as a stale session until the fog
+restarts.
+
+Run directly to check round trips, tampering and replay rejection:
+    python report_crypto.py
+Provision edges (on the fog, with VANET_MASTER_SECRET set):
+    python report_crypto.py --provision keys/pole1 pole1 pole1/cmd
+"""
+
+import os
+import time
+import struct
+import argparse
+import tempfile
+import threading
+from functools import lru_cache
+from urllib.parse import quote
+
+from Crypto.Cipher import AES
+from Crypto.Hash import SHA256
+from Crypto.Protocol.KDF import HKDF
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:
+    AESGCM = None
+
+    class InvalidTag(Exception):
+        pass
+
+# 16-byte (128-bit) master secret all pole keys are derived from; keep this secret!
+# Set VANET_MASTER_SECRET (hex) on the fog to override the development default;
+# edges get VANET_KEY_DIR (see load_pole_key) and never the master.
+DEV_MASTER_SECRET = b'0123456789abcdef'
+MASTER_SECRET = bytes.fromhex(os.environ["VANET_MASTER_SECRET"]) if "VANET_MASTER_SECRET" in os.environ \
+    else DEV_MASTER_SECRET
+
+VERSION = 1
+KEY_LEN = 16
+TAG_LEN = 16
+REPLAY_WINDOW = 64      # counters below the highest seen that may still arrive late
+MAX_DATAGRAM = 4096     # largest datagram (header || ciphertext || tag) a fog receives whole
+NONCE_PAD = bytes(4)    # nonce = NONCE_PAD || counter (8 bytes)
+NONCE = struct.Struct(">4xQ")              # the same nonce, packed in one call
+POLE_KEY_SALT = b"vanet-pole-key-v1"
+SESSION_INFO = b"vanet-session-key-v1"
+
+SESSION_RANDOM_BITS = 8
+
+HEADER_START = struct.Struct(">BB")        # version, pole id length
+COUNTER = struct.Struct(">Q")
+
+BACKENDS = ("auto", "cryptography", "pycryptodome")
+
+
+class AuthError(ValueError):
+    """A datagram that does not authenticate: bad tag, wrong key, or a pole id not accepted."""
+
+
+class ReplayError(ValueError):
+    """An authentic-looking datagram whose counter or session was already used."""
+
+
+class PycryptodomeAESGCM:
+    """The part of cryptography's AESGCM interface used here, on pycryptodome."""
+
+    def __init__(self, key):
+        self.key = key
+
+    def encrypt(self, nonce, data, associated_data):
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(associated_data)
+        ciphertext, tag = cipher.encrypt_and_digest(data)
+        return ciphertext + tag
+
+    def decrypt(self, nonce, data, associated_data):
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(associated_data)
+        try:
+            return cipher.decrypt_and_verify(data[:-TAG_LEN], data[-TAG_LEN:])
+        except ValueError:
+            raise InvalidTag() from None
+
+    def decrypt_into(self, nonce, data, associated_data, buf):
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(associated_data)
+        cipher.decrypt(data[:-TAG_LEN], output=buf)
+        try:
+            cipher.verify(data[-TAG_LEN:])
+        except ValueError:
+            raise InvalidTag() from None
+
+
+def decrypt_into(aead, nonce, data, associated_data, buf):
+    """aead.decrypt() into buf (len(data) - TAG_LEN bytes) without a new plaintext object."""
+    if hasattr(aead, "decrypt_into"):
+        aead.decrypt_into(nonce, data, associated_data, buf)
+    else:
+        # cryptography releases before 44 have no decrypt_into
+        buf[:] = aead.decrypt(nonce, data, associated_data)
+
+
+def make_aead(key, backend="auto"):
+    """An AES-GCM object with encrypt/decrypt(nonce, data, associated_data) for key."""
+    if backend == "cryptography" or (backend == "auto" and AESGCM is not None):
+        if AESGCM is None:
+            raise ImportError("the cryptography package is not installed")
+        return AESGCM(key)
+    return PycryptodomeAESGCM(key)
+
+
+@lru_cache(maxsize=None)
+def header_rest(id_len):
+    """Pole id, session and counter of a header, after its first two bytes."""
+    return struct.Struct(f">{id_len}sQQ")
+
+
+def pole_key(pole_id, master=MASTER_SECRET):
+    """The pole's key, derived from the master secret (not cached; see ReportOpener.keys)."""
+    return HKDF(master, KEY_LEN, POLE_KEY_SALT, SHA256, context=pole_id.encode("utf-8"))
+
+
+def session_key(key, session):
+    """Key of one session of the pole whose key is key."""
+    return HKDF(key, KEY_LEN, COUNTER.pack(session), SHA256, context=SESSION_INFO)
+
+
+def key_path(key_dir, pole_id):
+    # Command channel ids contain "/"
+    return os.path.join(key_dir, quote(pole_id, safe="") + ".key")
+
+
+def provision_keys(key_dir, pole_ids, master=MASTER_SECRET):
+    """Write each pole's key (hex) to key_dir for its edge; returns the paths."""
+    os.makedirs(key_dir, exist_ok=True)
+    paths = []
+    for pole_id in pole_ids:
+        path = key_path(key_dir, pole_id)
+        with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            f.write(pole_key(pole_id, master).hex() + "\n")
+        paths.append(path)
+    return paths
+
+
+def load_pole_key(pole_id):
+    """
+    An edge's key for pole_id, from the file provision_keys() wrote to
+    VANET_KEY_DIR. Without VANET_KEY_DIR the key is derived from the
+    development secret, which is refused once VANET_MASTER_SECRET is set
+    (the fog would not accept it).
+    """
+    key_dir = os.environ.get("VANET_KEY_DIR")
+    if key_dir:
+        with open(key_path(key_dir, pole_id)) as f:
+            key = bytes.fromhex(f.read().strip())
+        if len(key) != KEY_LEN:
+            raise ValueError(f"{key_path(key_dir, pole_id)}: not a {KEY_LEN}-byte key")
+        return key
+    if "VANET_MASTER_SECRET" in os.environ:
+        raise RuntimeError(f"no key for {pole_id}: set VANET_KEY_DIR to the keys provisioned for this edge "
+                           f"(python report_crypto.py --provision DIR {pole_id})")
+    return pole_key(pole_id, DEV_MASTER_SECRET)
+
+
+_session_lock = threading.Lock()
+_last_session = 0
+
+
+def new_session_id():
+    """
+    Increases across restarts of an edge, so the fog can reject old sessions,
+    and is never handed out twice by one process.
+    """
+    global _last_session
+    session = (time.time_ns() // 1000) << SESSION_RANDOM_BITS | \
+        int.from_bytes(os.urandom(1), "big") >> (8 - SESSION_RANDOM_BITS)
+    with _session_lock:
+        session = _last_session = max(session, _last_session + 1)
+    return session
+
+
+class ReportSealer:
+    """Seals plaintexts of one pole; create one per pole and reuse it."""
+
+    def __init__(self, pole_id, key=None, session=None, backend="auto"):
+        """key: the pole's key (default: load_pole_key(pole_id)); the fog passes pole_key(pole_id)."""
+        encoded_id = pole_id.encode("utf-8")
+        if not 0 < len(encoded_id) < 256:
+            raise ValueError(f"pole id must be 1-255 bytes: {pole_id!r}")
+        self.pole_id = pole_id
+        self.session = new_session_id() if session is None else session
+        self.counter = 0
+        key = load_pole_key(pole_id) if key is None else key
+        self._aead = make_aead(session_key(key, self.session), backend)
+        self._prefix = HEADER_START.pack(VERSION, len(encoded_id)) + encoded_id + COUNTER.pack(self.session)
+        # Bytes added to a plaintext (for MTU budgeting, see report_batcher.py)
+        self.overhead = len(self._prefix) + COUNTER.size + TAG_LEN
+
+    def seal(self, plaintext):
+        self.counter += 1
+        counter = COUNTER.pack(self.counter)
+        header = self._prefix + counter
+        return header + self._aead.encrypt(NONCE_PAD + counter, plaintext, header)
+
+    def seal_many(self, plaintexts):
+        """Seal each plaintext into its own datagram, in order."""
+        prefix, encrypt, pack = self._prefix, self._aead.encrypt, COUNTER.pack
+        first = self.counter + 1
+        self.counter += len(plaintexts)
+        datagrams = []
+        for counter, plaintext in enumerate(plaintexts, first):
+            counter = pack(counter)
+            header = prefix + counter
+            datagrams.append(header + encrypt(NONCE_PAD + counter, plaintext, header))
+        return datagrams
+
+
+class _PoleState:
+    __slots__ = ("session", "aead", "highest", "seen")
+
+    def __init__(self, session, aead):
+        self.session = session
+        self.aead = aead
+        self.highest = 0   # highest counter accepted in this session
+        self.seen = 0      # bit i set: counter highest - i was accepted
+
+
+class ReportOpener:
+    """Verifies and decrypts datagrams from any pole, rejecting replays."""
+
+    def __init__(self, master=MASTER_SECRET, replay_window=REPLAY_WINDOW, backend="auto", pole_ids=None, keys=None):
+        """
+        Pole keys come from keys ({pole id: key}, e.g. an edge's provisioned
+        command key) or are derived from master. With pole_ids or keys, ids
+        outside them are rejected before any key is derived.
+        """
+        self.master = master
+        self.replay_window = replay_window
+        self.backend = backend
+        self.keys = dict(keys or {})  # pole id -> key, given or derived for a datagram that authenticated
+        self.allowed = None if pole_ids is None and keys is None else set(pole_ids or ()) | set(self.keys)
+        self.poles = {}   # pole id -> _PoleState of its newest session
+        self._pole_ids = {}  # pole id as sent (bytes) -> str
+        self.replays_rejected = 0
+
+    def open(self, data):
+        """
+        Returns the plaintext. Raises AuthError if it is forged, ReplayError if
+        it is replayed and ValueError if it is malformed.
+        """
+        return self.open_from(data)[1]
+
+    def open_from(self, data):
+        """Like open(), but returns (pole id from the authenticated header, plaintext)."""
+        return self._open(data, None)
+
+    def open_into(self, data, out):
+        """
+        Like open_from(), but decrypts into the writable buffer out (at least
+        len(data) bytes) and returns (pole id, memoryview of the plaintext in
+        out). With a memoryview of a receive buffer as data, nothing is copied.
+        out must not be shared between threads.
+        """
+        return self._open(data, out)
+
+    def session(self, pole_id):
+        """Session of pole_id's newest accepted datagram (None before its first)."""
+        state = self.poles.get(pole_id)
+        return None if state is None else state.session
+
+    def _open(self, data, out):
+        # Slices of a memoryview are views, slices of bytes small copies
+        if len(data) < HEADER_START.size:
+            raise ValueError("datagram too short")
+        version, id_len = HEADER_START.unpack_from(data)
+        if version != VERSION:
+            raise ValueError(f"unknown datagram version {version}")
+        rest = header_rest(id_len)
+        header_len = HEADER_START.size + rest.size
+        if len(data) < header_len + TAG_LEN:
+            raise ValueError("datagram too short")
+        raw_id, session, counter = rest.unpack_from(data, HEADER_START.size)
+        pole_id = self._pole_ids.get(raw_id)
+        new_id = pole_id is None
+        if new_id:
+            pole_id = raw_id.decode("utf-8")
+            if self.allowed is not None and pole_id not in self.allowed:
+                raise AuthError(f"unknown pole id {pole_id!r}")
+
+        state = self.poles.get(pole_id)
+        if state is not None and session < state.session:
+            self.replays_rejected += 1
+            raise ReplayError(f"{pole_id}: stale session {session}")
+        if state is None or session > state.session:
+            # Only replaces the pole's state (and keeps a derived key) once the datagram authenticates
+            key = self.keys.get(pole_id)
+            if key is None:
+                key = pole_key(pole_id, self.master)
+            fresh = _PoleState(session, make_aead(session_key(key, session), self.backend))
+        else:
+            fresh = None
+            offset = state.highest - counter
+            if offset >= self.replay_window or (offset >= 0 and state.seen >> offset & 1):
+                self.replays_rejected += 1
+                raise ReplayError(f"{pole_id}: replayed counter {counter}")
+
+        aead = (fresh or state).aead
+        nonce = NONCE.pack(counter)
+        header, sealed = data[:header_len], data[header_len:]
+        try:
+            if out is None:
+                plaintext = aead.decrypt(nonce, sealed, header)
+            else:
+                plaintext = (out if type(out) is memoryview else memoryview(out))[:len(sealed) - TAG_LEN]
+                decrypt_into(aead, nonce, sealed, header, plaintext)
+        except InvalidTag:
+            raise AuthError("MAC check failed") from None
+
+        if new_id:
+            # Only ids that authenticated, so forged ones cannot grow the cache
+            self._pole_ids[raw_id] = pole_id
+        if fresh is not None:
+            self.keys.setdefault(pole_id, key)
+            state = self.poles[pole_id] = fresh
+        if counter > state.highest:
+            shift = counter - state.highest
+            state.seen = ((state.seen << shift) | 1) & ((1 << self.replay_window) - 1) \
+                if shift < self.replay_window else 1
+            state.highest = counter
+        else:
+            state.seen |= 1 << (state.highest - counter)
+        return pole_id, plaintext
+
+
+def check_replay_rejection(backend="auto"):
+    """Round trips, tampering, wrong keys and replays; raises AssertionError on failure."""
+
+    def rejected(opener, datagram, error=ValueError):
+        try:
+            opener.open(datagram)
+        except error:
+            return True
+        return False
+
+    sealer = ReportSealer("pole1", backend=backend)
+    # Sealers created back to back never share a session (and so a key and nonces)
+    sessions = [ReportSealer("pole1", backend=backend).session for _ in range(1000)]
+    assert len(set(sessions)) == len(sessions) and sessions == sorted(sessions), "session reused"
+    assert sessions[0] > sealer.session
+    opener = ReportOpener(backend=backend)
+    datagrams = sealer.seal_many([f"report {i}".encode() for i in range(1, 101)])
+    assert datagrams[0] != sealer.seal(b"report 1"), "nonce reused"
+    assert len(datagrams[0]) == len(b"report 1") + sealer.overhead
+
+    # In order, then late arrivals within the window, then every kind of replay
+    for i in range(80):
+        assert opener.open(datagrams[i]) == f"report {i + 1}".encode()
+    assert opener.open(datagrams[95]) == b"report 96"
+    assert opener.open(datagrams[85]) == b"report 86"           # reordered, within the window
+    assert rejected(opener, datagrams[85], ReplayError)          # ...but only once
+    assert rejected(opener, datagrams[95], ReplayError)          # the highest counter again
+    assert rejected(opener, datagrams[10], ReplayError)          # older than the window
+    assert opener.replays_rejected == 3
+
+    # Tampered ciphertext, tampered header, and a different master secret
+    forged = bytearray(datagrams[99])
+    forged[-TAG_LEN - 1] ^= 1
+    assert rejected(opener, bytes(forged), AuthError)
+    header_len = len(datagrams[99]) - len(b"report 100") - TAG_LEN
+    bumped = datagrams[99][:header_len - COUNTER.size] + COUNTER.pack(1000) + datagrams[99][header_len:]
+    assert rejected(opener, bumped)
+    assert rejected(ReportOpener(master=b"another secret!!", backend=backend), datagrams[0], AuthError)
+    assert rejected(opener, datagrams[0][:10])
+
+    # Forgeries must not have moved the pole's state forward
+    assert opener.open(datagrams[99]) == b"report 100"
+    assert opener.replays_rejected == 3
+
+    # A restarted edge (newer session) is accepted and ends the old session;
+    # datagrams of the old session are rejected afterwards
+    restarted = ReportSealer("pole1", session=sealer.session + 1, backend=backend)
+    assert opener.open(restarted.seal(b"after restart")) == b"after restart"
+    assert rejected(opener, datagrams[96], ReplayError)
+
+    # open_into() decrypts into a caller's buffer, straight from a receive buffer
+    receive_buffer, out = bytearray(256), bytearray(256)
+    datagram = restarted.seal(b"into a buffer")
+    receive_buffer[:len(datagram)] = datagram
+    pole_id, plaintext = opener.open_into(memoryview(receive_buffer)[:len(datagram)], out)
+    assert (pole_id, bytes(plaintext)) == ("pole1", b"into a buffer")
+    assert rejected(opener, datagram, ReplayError)
+
+    # Poles do not share keys: a datagram relabelled with another pole id fails
+    other = ReportSealer("pole2", session=sealer.session, backend=backend).seal(b"x")
+    relabelled = HEADER_START.pack(VERSION, 5) + b"pole3" + other[7:]
+    assert rejected(ReportOpener(backend=backend), relabelled)
+
+    # Forged pole ids leave no key behind; outside pole_ids they are rejected before any HKDF
+    opener = ReportOpener(backend=backend)
+    for i in range(100):
+        assert rejected(opener, HEADER_START.pack(VERSION, 5) + f"x{i:04d}".encode() + other[7:])
+    assert not opener.keys and not opener.poles
+    allowed = ReportOpener(backend=backend, pole_ids=["pole2"])
+    assert rejected(allowed, relabelled, AuthError) and allowed.open(other) == b"x" and set(allowed.keys) == {"pole2"}
+
+    # An edge holding only its provisioned key seals what the fog opens
+    with tempfile.TemporaryDirectory() as key_dir:
+        provision_keys(key_dir, ["pole4", "pole4/cmd"])
+        saved = os.environ.get("VANET_KEY_DIR")
+        os.environ["VANET_KEY_DIR"] = key_dir
+        try:
+            edge_sealer = ReportSealer("pole4", backend=backend)
+            command_key = load_pole_key("pole4/cmd")
+        finally:
+            if saved is None:
+                del os.environ["VANET_KEY_DIR"]
+            else:
+                os.environ["VANET_KEY_DIR"] = saved
+    assert ReportOpener(backend=backend).open(edge_sealer.seal(b"provisioned")) == b"provisioned"
+    edge_opener = ReportOpener(backend=backend, keys={"pole4/cmd": command_key})
+    command = ReportSealer("pole4/cmd", key=pole_key("pole4/cmd"), backend=backend).seal(b"command")
+    assert edge_opener.open(command) == b"command" and rejected(edge_opener, other)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provision", metavar="DIR", default=None,
+                        help="Write the keys of POLE_IDs to DIR for their edge instead of running the checks")
+    parser.add_argument("pole_ids", nargs="*", metavar="POLE_ID",
+                        help="With --provision, pole ids (and \"<pole>/cmd\" for --fog-control edges)")
+    args = parser.parse_args()
+    if args.provision:
+        if not args.pole_ids:
+            parser.error("--provision needs at least one POLE_ID")
+        if MASTER_SECRET == DEV_MASTER_SECRET:
+            print("[crypto] warning: VANET_MASTER_SECRET is not set; these are development keys")
+        for path in provision_keys(args.provision, args.pole_ids):
+            print(f"[crypto] wrote {path}")
+    else:
+        backends = ["cryptography", "pycryptodome"] if AESGCM is not None else ["pycryptodome"]
+        for name in backends:
+            check_replay_rejection(name)
+            print(f"[crypto] {name}: round trips, tampering and replay rejection OK")
+        if AESGCM is not None:
+            # Both backends produce the same datagrams
+            a = ReportSealer("pole1", session=42, backend="cryptography").seal(b"interop")
+            b = ReportSealer("pole1", session=42, backend="pycryptodome").seal(b"interop")
+            assert a == b and ReportOpener(backend="pycryptodome").open(a) == b"interop"
+            print("[crypto] cryptography and pycryptodome datagrams are interchangeable")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+report_delta.py
+
+Change-only ("delta") reporting between edge and fog.
+
+- Edge side, DeltaFilter: a report is only sent when a count or the current
+  phase differs from the last sent report, or when keyframe_steps steps have
+  passed since then (a heartbeat that bounds how stale the fog can get;
+  keyframe_steps=0 sends on change only).
+- Fog side, SeriesReconstructor: rebuilds the dense per-step series of each
+  pole by repeating the last known state for every skipped timestep.
+
+The edge must also send its final report when the run ends, so the
+reconstructed series covers the tail of the run.
+
+Running this file replays the bundled scenario headless through both sides
+(edge logic, binary encoding, AES-GCM and fog decryption) and checks that the
+reconstructed series equals the dense one:
+    python report_delta.py [--keyframe-steps 50] [--max-steps 0]
+"""
+
+import sys
+import argparse
+
+STATE_KEYS = ("north_count", "south_count", "east_count", "west_count", "current_phase")
+
+
+def report_state(report):
+    return tuple(report[key] for key in STATE_KEYS)
+
+
+class DeltaFilter:
+    def __init__(self, keyframe_steps=50):
+        self.keyframe_steps = keyframe_steps
+        self.last_state = None
+        self.last_sent_step = None
+        self.reports_seen = 0
+        self.reports_sent = 0
+
+    def should_send(self, step, state):
+        """Record that `state` was observed at `step`; True if it must be sent."""
+        self.reports_seen += 1
+        if state == self.last_state and (not self.keyframe_steps
+                                         or step - self.last_sent_step < self.keyframe_steps):
+            return False
+        self.last_state = state
+        self.last_sent_step = step
+        self.reports_sent += 1
+        return True
+
+    def mark_sent(self, step):
+        """Account for a report sent outside should_send() (the final report)."""
+        self.last_sent_step = step
+        self.reports_sent += 1
+
+
+class SeriesReconstructor:
+    def __init__(self):
+        self.last_reports = {}   # pole_id -> last report received
+        self.stale_reports = 0   # duplicates / reordered datagrams that were dropped
+
+    def expand(self, report):
+        """
+        Returns the dense reports up to and including `report`: one copy of the
+        previous state for every skipped timestep, then `report` itself.
+        """
+        pole = report.get("pole_id", "UNKNOWN")
+        previous = self.last_reports.get(pole)
+        if previous is not None and report["timestep"] <= previous["timestep"]:
+            self.stale_reports += 1
+            return []
+        self.last_reports[pole] = report
+
+        if previous is None:
+            return [report]
+        dense = []
+        for timestep in range(previous["timestep"] + 1, report["timestep"]):
+            filled = dict(previous)
+            filled["timestep"] = timestep
+            dense.append(filled)
+        dense.append(report)
+        return dense
+
+
+def verify_bundled_scenario(keyframe_steps, max_steps):
+    """
+    Run configs/intersection.sumocfg headless with the edge's own sensor and
+    control code, push the delta-filtered reports through encryption and
+    fog decryption, and compare the reconstruction with the dense series.
+    """
+    # edge_template reads its settings from the command line at import time
+    sys.argv = [sys.argv[0], "--pole-id", "pole1", "--headless", "--report-format", "binary"]
+    import edge_template as edge
+    from fog import decrypt_reports
+    from report_codec import FORMAT_BINARY, encode_report
+
+    edge.traci.start([edge.SUMO_BINARY, "-c", edge.SUMO_CONFIG, "--no-step-log"])
+    # Fills in edge.TLS_ID and edge.DETECTOR_IDS from the loaded network
+    edge.discover_pole()
+    edge.set_tls_phase(0)
+    edge.setup_sensor_subscriptions()
+
+    delta = DeltaFilter(keyframe_steps)
+    reconstructor = SeriesReconstructor()
+    dense, rebuilt = [], []
+
+    def deliver(report):
+        datagram = edge.encrypt_plaintext(encode_report(report, FORMAT_BINARY))
+        for received in decrypt_reports(datagram):
+            rebuilt.extend(reconstructor.expand(received))
+
+    step = 0
+    current_phase = 0
+    while edge.traci.simulation.getMinExpectedNumber() > 0:
+        if max_steps and step >= max_steps:
+            break
+        edge.traci.simulationStep()
+        step += 1
+        counts = edge.get_sensor_counts()
+        current_phase = edge.control_traffic_light(*counts, current_phase)
+        report = {
+            "pole_id": edge.POLE_ID,
+            "timestep": step,
+            "north_count": counts[0],
+            "south_count": counts[1],
+            "east_count": counts[2],
+            "west_count": counts[3],
+            "current_phase": current_phase
+        }
+        dense.append(report)
+        if delta.should_send(step, report_state(report)):
+            deliver(report)
+    edge.traci.close()
+
+    if delta.last_sent_step != step:
+        deliver(dense[-1])
+        delta.mark_sent(step)
+
+    print(f"delta: sent {delta.reports_sent} of {len(dense)} reports "
+          f"({delta.reports_sent / len(dense):.1%}, "
+          + (f"keyframe every {keyframe_steps} steps)" if keyframe_steps else "no keyframes)"))
+    if rebuilt != dense:
+        mismatch = next((i for i, (a, b) in enumerate(zip(rebuilt, dense)) if a != b),
+                        min(len(rebuilt), len(dense)))
+        print(f"FAIL: reconstructed series diverges at index {mismatch} "
+              f"({len(rebuilt)} rebuilt vs {len(dense)} dense reports)")
+        return False
+    print(f"OK: reconstructed series matches the dense one ({len(dense)} steps)")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keyframe-steps", type=int, default=50, help="0 = no keyframes")
+    parser.add_argument("--max-steps", type=int, default=0)
+    args = parser.parse_args()
+    if args.keyframe_steps < 0:
+        parser.error("--keyframe-steps must be 0 (no keyframes) or more")
+    sys.exit(0 if verify_bundled_scenario(args.keyframe_steps, args.max_steps) else 1)
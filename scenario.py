@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+scenario.py
+
+Generated SUMO scenarios, cached by content hash, and fast SUMO startup.
+
+- build_scenario(params) writes a grid of `rows` x `intersections`
+  signalized intersections (a corridor for rows=1; nodes/edges run through
+  netconvert, through flows along every row, car and bus flows along every
+  column, lane-area detectors with their polygons on every approach, a
+  .sumocfg and a multi_edge.py pole layout) from a dict of parameters (DEFAULTS),
+  instead of one hand-written .sumocfg per variant. The files go to
+  --cache-dir/<hash of the parameters>/, so a second build with the same
+  parameters only reads the manifest and skips netconvert.
+- warm_state(config, seconds) simulates the first `seconds` of a scenario
+  once, saves the state with traci.simulation.saveState() and returns the
+  path; runs started with `--load-state` on it (sumo_command()) begin with a
+  filled network instead of the empty ramp-up. States are cached under a hash
+  of the .sumocfg, every file it names and `seconds`.
+- start_sumo(cmd) is traci.start(cmd) without its fixed one-second sleep:
+  traci.start tries to connect while SUMO is still loading, fails, and waits
+  a full second before the next attempt. start_sumo polls every 10 ms.
+
+SUMO has no precompiled network format to skip XML parsing with, so startup
+is cut by not sleeping and not simulating the ramp-up instead.
+
+Usage:
+    python scenario.py --intersections 5 [--through-veh-h 400] [--warm-start 300]
+    python scenario.py --params configs/corridor5.scenario.json
+    python scenario.py --rows 10 --intersections 10
+prints the generated .sumocfg and layout, for multi_edge.py --config/--layout
+(or pass the parameter file directly: multi_edge.py --scenario FILE).
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+import xml.etree.ElementTree as ET
+
+CACHE_DIR = "scenario_cache"
+GENERATOR_VERSION = 1   # bump when the generated files change for the same parameters
+
+DEFAULTS = {
+    "intersections": 3,        # per west-east row
+    "rows": 1,                 # poles are numbered row by row, pole1..pole(rows * intersections)
+    "spacing": 500.0,          # m between neighbouring intersections
+    "approach_length": 500.0,  # m from an outer node to its intersection
+    "lanes": 2,
+    "speed": 13.9,             # m/s
+    "detector_length": 350.0,  # m of each approach's lane-area detector, ending at the stop line
+    "through_veh_h": 300,      # each direction along every row
+    "cross_veh_h": 300,        # cars north -> south along every column
+    "bus_veh_h": 100,          # buses south -> north along every column
+    "end": 2000,               # s
+    "step_length": 0.1,        # s
+    "seed": 42,
+}
+
+APPROACHES = ("north", "south", "east", "west")
+DETECTOR_FILE = "detector_output.xml"
+MANIFEST = "manifest.json"
+POLYGON_HALF_WIDTH = 2.0
+START_POLL_S = 0.01
+
+
+# ————————————————
+# Content hashing
+# ————————————————
+def content_key(*parts):
+    """Hex digest over str/bytes parts (each length-prefixed, so boundaries count)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()[:16]
+
+
+def scenario_params(overrides=None):
+    params = dict(DEFAULTS)
+    for key, value in (overrides or {}).items():
+        if key not in DEFAULTS:
+            raise ValueError(f"unknown scenario parameter {key!r}")
+        params[key] = type(DEFAULTS[key])(value)
+    if params["intersections"] < 1 or params["rows"] < 1:
+        raise ValueError("a scenario needs at least one intersection")
+    return params
+
+
+def read_sumocfg(config):
+    """Absolute net, route and additional file paths named in a .sumocfg."""
+    base = os.path.dirname(os.path.abspath(config))
+    inputs = ET.parse(config).getroot().find("input")
+
+    def paths(tag):
+        element = inputs.find(tag)
+        if element is None:
+            return []
+        return [os.path.join(base, path) for path in element.get("value").split(",")]
+    return paths("net-file"), paths("route-files"), paths("additional-files")
+
+
+# ————————————————
+# Generated files
+# ————————————————
+def center_id(params, row, col):
+    """Intersections are numbered row by row: c1..cN on the first row, and so on."""
+    return f"c{(row - 1) * params['intersections'] + col}"
+
+
+def intersection_ids(params):
+    return [center_id(params, row, col)
+            for row in range(1, params["rows"] + 1) for col in range(1, params["intersections"] + 1)]
+
+
+def row_chain(params, row):
+    """Nodes along a row, from its west end to its east end."""
+    suffix = "" if params["rows"] == 1 else str(row)
+    return ([f"west{suffix}"] + [center_id(params, row, col) for col in range(1, params["intersections"] + 1)]
+            + [f"east{suffix}"])
+
+
+def column_chain(params, col):
+    """Nodes along a column, from its north end to its south end."""
+    return [f"n{col}"] + [center_id(params, row, col) for row in range(1, params["rows"] + 1)] + [f"s{col}"]
+
+
+def chains(params):
+    return ([row_chain(params, row) for row in range(1, params["rows"] + 1)]
+            + [column_chain(params, col) for col in range(1, params["intersections"] + 1)])
+
+
+def nodes_xml(params):
+    rows, cols = params["rows"], params["intersections"]
+    spacing, approach = params["spacing"], params["approach_length"]
+    shape = f"{cols}" if rows == 1 else f"{rows}x{cols}"
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', "<nodes>",
+             f"    <!-- {shape} signalized intersections {spacing:g}m apart, one per pole -->"]
+    for row in range(1, rows + 1):
+        for col in range(1, cols + 1):
+            lines.append(f'    <node id="{center_id(params, row, col)}" x="{(col - 1) * spacing:.1f}" '
+                         f'y="{-(row - 1) * spacing:.1f}" type="traffic_light"/>')
+    lines.append(f"    <!-- Approach nodes ({approach:g}m away) -->")
+    for row in range(1, rows + 1):
+        chain, y = row_chain(params, row), -(row - 1) * spacing
+        lines.append(f'    <node id="{chain[0]}" x="{-approach:.1f}" y="{y:.1f}" type="priority"/>')
+        lines.append(f'    <node id="{chain[-1]}" x="{(cols - 1) * spacing + approach:.1f}" y="{y:.1f}" type="priority"/>')
+    for col in range(1, cols + 1):
+        chain, x = column_chain(params, col), (col - 1) * spacing
+        lines.append(f'    <node id="{chain[0]}" x="{x:.1f}" y="{approach:.1f}" type="priority"/>')
+        lines.append(f'    <node id="{chain[-1]}" x="{x:.1f}" y="{-(rows - 1) * spacing - approach:.1f}" type="priority"/>')
+    lines.append("</nodes>")
+    return "\n".join(lines) + "\n"
+
+
+def edge_id(a, b):
+    return f"edge_{a}_to_{b}"
+
+
+def edges_xml(params):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', "<edges>"]
+    for chain in chains(params):
+        for a, b in zip(chain, chain[1:]):
+            for source, target in ((a, b), (b, a)):
+                lines.append(f'    <edge id="{edge_id(source, target)}" from="{source}" to="{target}" priority="1" '
+                             f'numLanes="{params["lanes"]}" speed="{params["speed"]}" width="4.0"/>')
+    lines.append("</edges>")
+    return "\n".join(lines) + "\n"
+
+
+def route_lines(chain, forward, backward, end):
+    """A route and a flow in each direction along chain; forward/backward are (vType, vehsPerHour)."""
+    lines = []
+    for nodes, (vtype, veh_h) in ((chain, forward), (chain[::-1], backward)):
+        name = f"{nodes[0]}_{nodes[-1]}"
+        lines += [
+            f'    <route id="route_{name}" edges="{" ".join(edge_id(a, b) for a, b in zip(nodes, nodes[1:]))}"/>',
+            f'    <flow id="flow_{name}" type="{vtype}" route="route_{name}" begin="0" end="{end}" '
+            f'vehsPerHour="{veh_h}"/>',
+        ]
+    return lines
+
+
+def routes_xml(params):
+    end = params["end"]
+    through = ("car", params["through_veh_h"])
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', "<routes>",
+             "    <!-- Vehicle Types -->",
+             '    <vType id="car" accel="2.6" decel="4.5" sigma="0.5" length="5.0" minGap="2.5" '
+             'maxSpeed="13.9" color="0,0,255"/>',
+             '    <vType id="bus" accel="2.0" decel="4.0" sigma="0.5" length="12.0" minGap="3.0" '
+             'maxSpeed="11.1" color="255,0,0"/>',
+             "",
+             "    <!-- Through traffic along every row -->"]
+    for row in range(1, params["rows"] + 1):
+        lines += route_lines(row_chain(params, row), through, through, end)
+    lines += ["", "    <!-- Cross traffic along every column: cars southbound, buses northbound -->"]
+    for col in range(1, params["intersections"] + 1):
+        lines += route_lines(column_chain(params, col), ("car", params["cross_veh_h"]),
+                             ("bus", params["bus_veh_h"]), end)
+    lines.append("</routes>")
+    return "\n".join(lines) + "\n"
+
+
+def approach_edges(params):
+    """{center: {approach: incoming edge id}}; 'east' is the approach from the east."""
+    approaches = {}
+    for row in range(1, params["rows"] + 1):
+        across = row_chain(params, row)
+        for col in range(1, params["intersections"] + 1):
+            down = column_chain(params, col)
+            center = across[col]
+            approaches[center] = {"north": edge_id(down[row - 1], center),
+                                  "south": edge_id(down[row + 1], center),
+                                  "east": edge_id(across[col + 1], center),
+                                  "west": edge_id(across[col - 1], center)}
+    return approaches
+
+
+def lane_geometry(net_file):
+    """{lane id: (length, [(x, y), ...])} for every normal (non-internal) lane of a .net.xml."""
+    lanes = {}
+    for _, element in ET.iterparse(net_file):
+        if element.tag == "edge":
+            if element.get("function") != "internal":
+                for lane in element.iter("lane"):
+                    shape = [tuple(map(float, point.split(","))) for point in lane.get("shape").split()]
+                    lanes[lane.get("id")] = (float(lane.get("length")), shape)
+            element.clear()
+    return lanes
+
+
+def strip_polygon(shape, length):
+    """Rectangle around the last `length` m of a straight lane shape, as a SUMO shape string."""
+    (x0, y0), (x1, y1) = shape[0], shape[-1]
+    span = ((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5
+    ux, uy = (x1 - x0) / span, (y1 - y0) / span
+    sx, sy = x1 - ux * min(length, span), y1 - uy * min(length, span)
+    nx, ny = -uy * POLYGON_HALF_WIDTH, ux * POLYGON_HALF_WIDTH
+    corners = [(sx + nx, sy + ny), (sx - nx, sy - ny), (x1 - nx, y1 - ny), (x1 + nx, y1 + ny)]
+    return " ".join(f"{x:.2f},{y:.2f}" for x, y in corners)
+
+
+def detectors_xml(params, lanes):
+    detector_length = params["detector_length"]
+    lines = ["<additional>"]
+    for center, approaches in approach_edges(params).items():
+        for approach in APPROACHES:
+            lane_id = f"{approaches[approach]}_0"
+            lane_length, shape = lanes[lane_id]
+            length = min(detector_length, lane_length)
+            lines += [
+                f"    <!-- {center} {approach} approach (incoming) -->",
+                f'    <laneAreaDetector id="area_{approach}_{center}" lane="{lane_id}" '
+                f'pos="{lane_length - length:.1f}" length="{length:g}" freq="100000" file="{DETECTOR_FILE}"/>',
+                f'    <poly id="poly_{approach}_{center}" color="0,255,0,255" fill="true"',
+                f'          shape="{strip_polygon(shape, length)}"/>',
+                "",
+            ]
+    lines[-1] = "</additional>"
+    return "\n".join(lines) + "\n"
+
+
+def sumocfg_xml(params):
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<configuration>
+    <input>
+        <net-file value="scenario.net.xml"/>
+        <route-files value="scenario.rou.xml"/>
+        <additional-files value="scenario.add.xml"/>
+    </input>
+
+    <time>
+        <begin value="0"/>
+        <end value="{params["end"]}"/>
+        <step-length value="{params["step_length"]}"/>
+    </time>
+
+    <random_number>
+        <seed value="{params["seed"]}"/>
+    </random_number>
+</configuration>
+"""
+
+
+def pole_layout(params):
+    """multi_edge.py layout: pole<i> controls c<i>, with its west/east neighbours in the row."""
+    cols = params["intersections"]
+    layout = {}
+    for i, center in enumerate(intersection_ids(params), 1):
+        pole = {"tls": center}
+        if (i - 1) % cols:
+            pole["west"] = f"pole{i - 1}"
+        if i % cols:
+            pole["east"] = f"pole{i + 1}"
+        pole["detectors"] = [f"area_{approach}_{center}" for approach in APPROACHES]
+        pole["polygons"] = [f"poly_{approach}_{center}" for approach in APPROACHES]
+        layout[f"pole{i}"] = pole
+    return layout
+
+
+def write_scenario(params, out_dir):
+    def write(name, text):
+        with open(os.path.join(out_dir, name), "w") as f:
+            f.write(text)
+
+    write("scenario.nod.xml", nodes_xml(params))
+    write("scenario.edg.xml", edges_xml(params))
+    net_file = os.path.join(out_dir, "scenario.net.xml")
+    subprocess.run(["netconvert", "--node-files", os.path.join(out_dir, "scenario.nod.xml"),
+                    "--edge-files", os.path.join(out_dir, "scenario.edg.xml"),
+                    "--output-file", net_file, "--no-warnings"],
+                   check=True, stdout=subprocess.DEVNULL)
+    write("scenario.rou.xml", routes_xml(params))
+    write("scenario.add.xml", detectors_xml(params, lane_geometry(net_file)))
+    write("scenario.sumocfg", sumocfg_xml(params))
+    write("scenario.poles.json", json.dumps(pole_layout(params), indent=4) + "\n")
+
+
+def build_scenario(overrides=None, cache_dir=CACHE_DIR):
+    """
+    Scenario files for DEFAULTS updated with overrides, generated on the first
+    call and read from cache_dir afterwards. Returns the manifest:
+    {"key", "params", "dir", "config", "layout", "cached"}.
+    """
+    params = scenario_params(overrides)
+    key = content_key(json.dumps({"generator": GENERATOR_VERSION, "params": params}, sort_keys=True))
+    out_dir = os.path.abspath(os.path.join(cache_dir, key))
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            return dict(json.load(f), cached=True)
+
+    # Build next to the final directory and rename it into place, so parallel
+    # builders (e.g. sweep workers) never see half-written files
+    os.makedirs(cache_dir, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix=f"{key}.", dir=cache_dir)
+    try:
+        write_scenario(params, build_dir)
+        manifest = {"key": key, "params": params, "dir": out_dir,
+                    "config": os.path.join(out_dir, "scenario.sumocfg"),
+                    "layout": os.path.join(out_dir, "scenario.poles.json")}
+        with open(os.path.join(build_dir, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=4)
+        try:
+            os.rename(build_dir, out_dir)
+        except OSError:
+            if not os.path.exists(manifest_path):
+                raise
+            # Another builder finished first; its files are identical
+            shutil.rmtree(build_dir)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    return dict(manifest, cached=False)
+
+
+# ————————————————
+# SUMO startup
+# ————————————————
+def import_traci():
+    if 'SUMO_HOME' not in os.environ:
+        raise RuntimeError("please set SUMO_HOME to your SUMO installation directory")
+    tools_dir = os.path.join(os.environ['SUMO_HOME'], 'tools')
+    if tools_dir not in sys.path:
+        sys.path.append(tools_dir)
+    import traci
+    return traci
+
+
+def start_sumo(cmd, label="default", timeout=60.0):
+    """
+    Launch cmd (e.g. ["sumo", "-c", config]) and connect TraCI to it, like
+    traci.start(cmd, label=label), polling for the port every START_POLL_S
+    instead of sleeping a second after the first failed attempt.
+    """
+    traci = import_traci()
+    port = traci.getFreeSocketPort()
+    process = subprocess.Popen(cmd + ["--remote-port", str(port)])
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            # numRetries=0: one attempt, no sleep; raises TraCIException if SUMO exited
+            return traci.init(port, numRetries=0, label=label, proc=process)
+        except traci.FatalTraCIError:
+            if time.monotonic() > deadline:
+                process.kill()
+                raise
+            time.sleep(START_POLL_S)
+
+
+def sumo_command(binary, config, state=None):
+    cmd = [binary, "-c", config]
+    if state is not None:
+        cmd += ["--load-state", state]
+    return cmd
+
+
+def warm_state(config, seconds, cache_dir=CACHE_DIR):
+    """
+    Path of a saved SUMO state of config after `seconds` simulated seconds,
+    simulating and saving it (traci.simulation.saveState) on first use.
+    """
+    parts = [str(float(seconds))]
+    for path in [config] + [path for paths in read_sumocfg(config) for path in paths]:
+        with open(path, "rb") as f:
+            parts.append(f.read())
+    states_dir = os.path.join(cache_dir, "states")
+    state = os.path.abspath(os.path.join(states_dir, f"{content_key(*parts)}.xml.gz"))
+    if os.path.exists(state):
+        return state
+
+    os.makedirs(states_dir, exist_ok=True)
+    traci = import_traci()
+    partial = f"{state}.{os.getpid()}.xml.gz"
+    start_sumo(sumo_command("sumo", config) + ["--no-step-log", "--no-warnings"], label="warm_state")
+    try:
+        traci.simulationStep(float(seconds))
+        traci.simulation.saveState(partial)
+    finally:
+        traci.close()
+    os.replace(partial, state)
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--params", default=None, help="JSON file of scenario parameters (see DEFAULTS)")
+    for key, default in DEFAULTS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(default), default=None,
+                            help=f"default {default}")
+    parser.add_argument("--warm-start", type=float, default=0,
+                        help="Also save (or find) the state after this many simulated seconds")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.params:
+        with open(args.params) as f:
+            overrides.update(json.load(f))
+    overrides.update({key: getattr(args, key) for key in DEFAULTS if getattr(args, key) is not None})
+
+    start = time.perf_counter()
+    scenario = build_scenario(overrides, args.cache_dir)
+    params = scenario["params"]
+    print(f"[scenario] {scenario['key']}: {params['rows']}x{params['intersections']} intersections, "
+          f"{'cached' if scenario['cached'] else 'generated'} in {time.perf_counter() - start:.3f} s")
+    print(f"[scenario] config: {scenario['config']}")
+    print(f"[scenario] layout: {scenario['layout']}")
+    if args.warm_start:
+        start = time.perf_counter()
+        state = warm_state(scenario["config"], args.warm_start, args.cache_dir)
+        print(f"[scenario] state after {args.warm_start:g} s: {state} ({time.perf_counter() - start:.3f} s)")
+
+
+if __name__ == "__main__":
+    main()
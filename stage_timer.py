@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+stage_timer.py
+
+Per-stage latency recording for hot loops such as edge_template.run_edge.
+
+A loop calls start() at the top of each iteration and lap("stage") after
+each stage; the time since the previous start()/lap() is recorded for that
+stage. Functions called from inside a stage (e.g. the encrypt and send
+callbacks of a ReportBatcher) can be timed on their own with wrap();
+report() lists each nested stage indented under the lap it ran in (the lap
+that ended after its first sample), so parents print before their children.
+
+Samples are kept as int64 nanoseconds in one array.array per stage (8 bytes
+per sample) and turned into count / p50 / p95 / p99 / max / total only when
+report() runs, so recording costs one perf_counter_ns() and one append.
+
+NULL_TIMER has the same interface and does nothing, so instrumented code
+pays one no-op method call per stage when timing is off; wrap() returns the
+function unchanged.
+"""
+
+import time
+from array import array
+
+import numpy as np
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {}   # stage -> array('q') of nanoseconds, in first-seen order
+        self.nested = set()  # stages recorded by wrap(), already inside some lap
+        self.parents = {}   # nested stage -> the lap it was first recorded in
+        self._orphans = []  # nested stages recorded since the last lap, parent not yet known
+        self._last = time.perf_counter_ns()
+
+    def start(self):
+        self._last = time.perf_counter_ns()
+
+    def lap(self, stage):
+        now = time.perf_counter_ns()
+        self.record(stage, now - self._last)
+        self._last = now
+        if self._orphans:
+            for nested in self._orphans:
+                self.parents.setdefault(nested, stage)
+            self._orphans.clear()
+
+    def record(self, stage, ns):
+        samples = self.samples.get(stage)
+        if samples is None:
+            samples = self.samples[stage] = array("q")
+        samples.append(ns)
+
+    def wrap(self, stage, fn):
+        """fn, with each call's duration recorded under stage."""
+        self.nested.add(stage)
+        parents, orphans = self.parents, self._orphans
+
+        def timed(*args):
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args)
+            finally:
+                self.record(stage, time.perf_counter_ns() - start)
+                if stage not in parents and stage not in orphans:
+                    orphans.append(stage)
+        return timed
+
+    def summary(self):
+        """[(stage, count, p50_us, p95_us, p99_us, max_us, total_ms)] in first-seen order."""
+        rows = []
+        for stage, samples in self.samples.items():
+            if not samples:
+                continue
+            values = np.frombuffer(samples, dtype=np.int64)
+            p50, p95, p99 = np.percentile(values, [50, 95, 99]) / 1e3
+            rows.append((stage, len(values), p50, p95, p99, values.max() / 1e3, values.sum() / 1e6))
+        return rows
+
+    def ordered_summary(self):
+        """summary() with each lap followed by its nested stages; nested stages outside any lap come last."""
+        rows = self.summary()
+        children = {}
+        for row in rows:
+            if row[0] in self.nested:
+                children.setdefault(self.parents.get(row[0]), []).append(row)
+        ordered = []
+        for row in rows:
+            if row[0] not in self.nested:
+                ordered.append(row)
+                ordered.extend(children.pop(row[0], ()))
+        for orphans in children.values():
+            ordered.extend(orphans)
+        return ordered
+
+    def report(self, prefix="", write=print):
+        rows = self.ordered_summary()
+        if not rows:
+            write(f"{prefix}no stage timings recorded")
+            return
+        # Nested stages are part of some lap already; shares are of the lap total
+        total_ms = sum(row[6] for row in rows if row[0] not in self.nested)
+        write(f"{prefix}{'stage':<16} {'count':>8} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} "
+              f"{'max us':>10} {'total ms':>10} {'share':>6}")
+        for stage, count, p50, p95, p99, max_us, stage_ms in rows:
+            name = f"  {stage}" if stage in self.nested else stage
+            write(f"{prefix}{name:<16} {count:>8} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} "
+                  f"{max_us:>10.1f} {stage_ms:>10.1f} {stage_ms / total_ms:>6.1%}")
+
+
+class NullStageTimer:
+    def start(self):
+        pass
+
+    def lap(self, stage):
+        pass
+
+    def record(self, stage, ns):
+        pass
+
+    def wrap(self, stage, fn):
+        return fn
+
+    def report(self, prefix="", write=print):
+        pass
+
+
+NULL_TIMER = NullStageTimer()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+sumo_output.py
+
+Streams SUMO output files into compact columnar files and reports on them,
+so long runs can be compared without DOM-parsing large XML.
+
+- convert() reads lane-area detector output (detectors/detector_output.xml,
+  the laneAreaDetector "file"), tripinfo output (--tripinfo-output) or queue
+  output (--queue-output) with ET.iterparse, clearing every element once it
+  is read. Records are staged in chunks of chunk_records and appended to a
+  .vdet file, so memory depends on the chunk size, not on the file size.
+- A .vdet file has the layout of a fog_log.py segment: a 16-byte header
+  (magic, version, record size, kind) and fixed-width records of the kind's
+  dtype (KINDS), so open_records() memory-maps it as a NumPy structured
+  array without parsing. Ids (detectors, lanes, vehicle types) are stored as
+  u4 indices; <file>.ids.json maps them back in order of first appearance.
+- load() accepts an XML file or a .vdet; an XML file is converted once to
+  <file>.vdet next to it and reused while it is newer than the XML.
+- The report computes, per detector (or pole approach, with --layout):
+  occupancy and flow (vehicles leaving the detector per hour, i.e. crossing
+  the stop line) over the covered time, mean and max queue (jam length in
+  vehicles), mean halting duration and mean speed. tripinfo files give trip
+  duration, waiting time and time loss per vehicle type; queue files mean
+  and max queue length per lane. With several runs of the same kind it ends
+  with a side-by-side comparison of their totals.
+
+Command line:
+    python sumo_output.py convert detectors/detector_output.xml [--out run.vdet]
+    python sumo_output.py report detectors/detector_output.xml [--layout configs/intersection.poles.json]
+    python sumo_output.py report runA.vdet runB.vdet
+"""
+
+import os
+import sys
+import json
+import struct
+import argparse
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+MAGIC = b"VDET"
+VERSION = 1
+HEADER = struct.Struct("<4sHH8s")   # magic, version, record size, kind (ASCII, NUL padded)
+CHUNK_RECORDS = 8192
+
+E2_DTYPE = np.dtype([
+    ("begin", "<f8"),
+    ("end", "<f8"),
+    ("id", "<u4"),                  # detector, index into <file>.ids.json
+    ("sampled_seconds", "<f4"),     # vehicle-seconds spent on the detector
+    ("entered", "<u4"),
+    ("left", "<u4"),
+    ("mean_speed", "<f4"),          # m/s, -1 when no vehicle was seen
+    ("mean_occupancy", "<f4"),      # %
+    ("max_occupancy", "<f4"),
+    ("mean_jam_vehicles", "<f4"),   # meanMaxJamLengthInVehicles
+    ("max_jam_vehicles", "<u4"),
+    ("mean_halting_s", "<f4"),
+    ("started_halts", "<u4"),
+    ("mean_vehicles", "<f4"),
+    ("max_vehicles", "<u4"),
+])
+
+TRIPINFO_DTYPE = np.dtype([
+    ("depart", "<f8"),
+    ("arrival", "<f8"),
+    ("id", "<u4"),                  # vehicle type
+    ("duration", "<f4"),
+    ("route_length", "<f4"),
+    ("waiting_time", "<f4"),
+    ("waiting_count", "<u4"),
+    ("time_loss", "<f4"),
+])
+
+QUEUE_DTYPE = np.dtype([
+    ("time", "<f8"),
+    ("id", "<u4"),                  # lane
+    ("queueing_time", "<f4"),
+    ("queueing_length", "<f4"),     # m
+])
+
+
+def e2_record(element, ids, _):
+    get = element.get
+    return (float(get("begin")), float(get("end")), ids(get("id")),
+            float(get("sampledSeconds")), int(get("nVehEntered")), int(get("nVehLeft")),
+            float(get("meanSpeed")), float(get("meanOccupancy")), float(get("maxOccupancy")),
+            float(get("meanMaxJamLengthInVehicles")), int(get("maxJamLengthInVehicles")),
+            float(get("meanHaltingDuration")), int(get("startedHalts")),
+            float(get("meanVehicleNumber")), int(get("maxVehicleNumber")))
+
+
+def tripinfo_record(element, ids, _):
+    get = element.get
+    return (float(get("depart")), float(get("arrival")), ids(get("vType")),
+            float(get("duration")), float(get("routeLength")), float(get("waitingTime")),
+            int(get("waitingCount")), float(get("timeLoss")))
+
+
+def queue_record(element, ids, parent):
+    get = element.get
+    return (float(parent.get("timestep")), ids(get("id")),
+            float(get("queueing_time")), float(get("queueing_length")))
+
+
+# kind: (root tag, record tag, dtype, record builder, tag of the element whose
+# end clears the tree; records of queue output sit inside <data timestep>)
+KINDS = {
+    "e2": ("detector", "interval", E2_DTYPE, e2_record, "interval"),
+    "tripinfo": ("tripinfos", "tripinfo", TRIPINFO_DTYPE, tripinfo_record, "tripinfo"),
+    "queue": ("queue-export", "lane", QUEUE_DTYPE, queue_record, "data"),
+}
+
+
+def ids_path(path):
+    return f"{path}.ids.json"
+
+
+class _IdTable:
+    def __init__(self):
+        self.index = {}
+
+    def __call__(self, name):
+        index = self.index.get(name)
+        if index is None:
+            index = self.index[name] = len(self.index)
+        return index
+
+
+def _write_records(f, staged, dtype):
+    if staged:
+        f.write(np.array(staged, dtype=dtype).tobytes())
+
+
+def convert(xml_path, out_path=None, chunk_records=CHUNK_RECORDS):
+    """
+    Stream xml_path into a .vdet file; returns (out_path, kind, records
+    written, truncated). A file that ends early (SUMO killed mid-run) keeps
+    the records read before the break and sets truncated.
+    """
+    out_path = out_path or f"{xml_path}.vdet"
+    ids = _IdTable()
+    kind = dtype = build = None
+    record_tag = clear_tag = None
+    staged = []
+    written = 0
+    truncated = False
+    root = parent = None
+    partial = f"{out_path}.partial"
+    try:
+        with open(partial, "wb") as f:
+            try:
+                for event, element in ET.iterparse(xml_path, events=("start", "end")):
+                    if event == "start":
+                        if root is None:
+                            root = element
+                            kind = next((name for name, spec in KINDS.items() if spec[0] == element.tag), None)
+                            if kind is None:
+                                raise ValueError(f"{xml_path}: unsupported SUMO output <{element.tag}>")
+                            _, record_tag, dtype, build, clear_tag = KINDS[kind]
+                            f.write(HEADER.pack(MAGIC, VERSION, dtype.itemsize, kind.encode("ascii")))
+                        elif element.tag == clear_tag:
+                            parent = element
+                        continue
+                    if element.tag == record_tag:
+                        if kind == "e2" and not staged and not written and element.get("meanOccupancy") is None:
+                            raise ValueError(f"{xml_path}: only lane-area (E2) detector output is supported")
+                        staged.append(build(element, ids, parent))
+                        if len(staged) >= chunk_records:
+                            _write_records(f, staged, dtype)
+                            written += len(staged)
+                            staged = []
+                    if element.tag == clear_tag:
+                        # Drop everything read so far; the root keeps no children
+                        root.clear()
+            except ET.ParseError as e:
+                if kind is None:
+                    raise ValueError(f"{xml_path}: no SUMO output records ({e})") from None
+                truncated = True
+            _write_records(f, staged, dtype)
+            written += len(staged)
+    except BaseException:
+        os.remove(partial)
+        raise
+    with open(ids_path(out_path), "w") as f:
+        json.dump(list(ids.index), f)
+    os.replace(partial, out_path)
+    return out_path, kind, written, truncated
+
+
+def open_records(path):
+    """Memory-map a .vdet file; returns (kind, read-only records, ids)."""
+    with open(path, "rb") as f:
+        magic, version, record_size, kind = HEADER.unpack(f.read(HEADER.size))
+    kind = kind.rstrip(b"\0").decode("ascii")
+    if magic != MAGIC or version != VERSION or kind not in KINDS or record_size != KINDS[kind][2].itemsize:
+        raise ValueError(f"{path}: not a version {VERSION} SUMO output file")
+    dtype = KINDS[kind][2]
+    with open(ids_path(path)) as f:
+        ids = json.load(f)
+    n_records = (os.path.getsize(path) - HEADER.size) // dtype.itemsize
+    if n_records == 0:
+        return kind, np.empty(0, dtype=dtype), ids
+    return kind, np.memmap(path, dtype=dtype, mode="r", offset=HEADER.size, shape=(n_records,)), ids
+
+
+def load(path):
+    """(kind, records, ids) of a .vdet file, or of an XML file converted once next to it."""
+    if path.endswith(".vdet"):
+        return open_records(path)
+    converted = f"{path}.vdet"
+    if not (os.path.exists(converted) and os.path.getmtime(converted) >= os.path.getmtime(path)):
+        convert(path, converted)
+    return open_records(converted)
+
+
+# ————————————————
+# Analytics
+# ————————————————
+def weighted(values, weights, index, n):
+    """Per-index weighted mean of values (NaN where the weights sum to 0)."""
+    totals = np.bincount(index, weights=values * weights, minlength=n)
+    norms = np.bincount(index, weights=weights, minlength=n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return totals / norms
+
+
+def e2_stats(records, n):
+    index = records["id"].astype(np.intp)
+    seconds = records["end"] - records["begin"]
+    covered = np.bincount(index, weights=seconds, minlength=n)
+    sampled = records["sampled_seconds"].astype(np.float64)
+    halts = records["started_halts"].astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        flow = np.bincount(index, weights=records["left"], minlength=n) / covered * 3600
+    max_jam = np.zeros(n, dtype=np.int64)
+    np.maximum.at(max_jam, index, records["max_jam_vehicles"])
+    return {
+        "hours": covered / 3600,
+        "occupancy_pct": weighted(records["mean_occupancy"], seconds, index, n),
+        "flow_veh_h": flow,
+        "mean_queue_veh": weighted(records["mean_jam_vehicles"], seconds, index, n),
+        "max_queue_veh": max_jam,
+        "mean_halt_s": weighted(records["mean_halting_s"], halts, index, n),
+        "mean_speed_m_s": weighted(records["mean_speed"], sampled, index, n),
+    }
+
+
+def mean_over(column):
+    """Mean of the non-NaN values; NaN (printed as n/a) when there are none, without a warning."""
+    values = column[~np.isnan(column)]
+    return values.mean() if len(values) else np.nan
+
+
+def e2_totals(stats):
+    """One row for a whole run: means over detectors, total flow, max queue."""
+    return {
+        "occupancy_pct": mean_over(stats["occupancy_pct"]),
+        "flow_veh_h": np.nansum(stats["flow_veh_h"]),
+        "mean_queue_veh": mean_over(stats["mean_queue_veh"]),
+        "max_queue_veh": stats["max_queue_veh"].max(initial=0),
+        "mean_halt_s": mean_over(stats["mean_halt_s"]),
+        "mean_speed_m_s": mean_over(stats["mean_speed_m_s"]),
+    }
+
+
+def tripinfo_stats(records, n):
+    index = records["id"].astype(np.intp)
+    count = np.bincount(index, minlength=n)
+    ones = np.ones(len(records))
+    return {
+        "trips": count,
+        "mean_duration_s": weighted(records["duration"], ones, index, n),
+        "mean_waiting_s": weighted(records["waiting_time"], ones, index, n),
+        "mean_time_loss_s": weighted(records["time_loss"], ones, index, n),
+    }
+
+
+def tripinfo_totals(records):
+    return {
+        "trips": len(records),
+        "mean_duration_s": float(records["duration"].mean()) if len(records) else np.nan,
+        "mean_waiting_s": float(records["waiting_time"].mean()) if len(records) else np.nan,
+        "mean_time_loss_s": float(records["time_loss"].mean()) if len(records) else np.nan,
+    }
+
+
+def queue_stats(records, n):
+    index = records["id"].astype(np.intp)
+    samples = np.bincount(index, minlength=n)
+    max_length = np.zeros(n)
+    np.maximum.at(max_length, index, records["queueing_length"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_length = np.bincount(index, weights=records["queueing_length"], minlength=n) / samples
+    return {"samples": samples, "mean_queue_m": mean_length, "max_queue_m": max_length}
+
+
+def queue_totals(stats):
+    return {"mean_queue_m": mean_over(stats["mean_queue_m"]), "max_queue_m": stats["max_queue_m"].max(initial=0)}
+
+
+def approach_labels(layout_path):
+    """{detector id: "pole approach"} from a multi_edge.py layout."""
+    with open(layout_path) as f:
+        layout = json.load(f)
+    return {detector_id: f"{pole_id} {approach}"
+            for pole_id, pole in layout.items()
+            for approach, detector_id in zip(("north", "south", "east", "west"), pole["detectors"])}
+
+
+def format_value(value):
+    if isinstance(value, (int, np.integer)):
+        return str(value)
+    return "n/a" if np.isnan(value) else f"{value:.2f}"
+
+
+def print_table(first_header, rows, columns, write=print):
+    """rows: [(label, {column: value})]."""
+    cells = [[label] + [format_value(values[column]) for column in columns] for label, values in rows]
+    header = [first_header] + columns
+    widths = [max(len(row[i]) for row in cells + [header]) for i in range(len(header))]
+    write("  ".join(h.ljust(widths[0]) if i == 0 else h.rjust(widths[i]) for i, h in enumerate(header)))
+    for row in cells:
+        write("  ".join(c.ljust(widths[0]) if i == 0 else c.rjust(widths[i]) for i, c in enumerate(row)))
+
+
+def report(paths, layout=None, write=print):
+    labels = approach_labels(layout) if layout else {}
+    totals = {}   # kind -> [(path, totals)]
+    for path in paths:
+        kind, records, ids = load(path)
+        write(f"[output] {path}: {len(records)} {kind} records, {len(ids)} ids")
+        if not len(records):
+            continue
+        if kind == "e2":
+            stats = e2_stats(records, len(ids))
+            order = sorted(range(len(ids)), key=lambda i: labels.get(ids[i], ids[i]))
+            rows = [(labels.get(ids[i], ids[i]), {name: column[i] for name, column in stats.items()}) for i in order]
+            print_table("detector", rows, list(stats), write)
+            totals.setdefault(kind, []).append((path, e2_totals(stats)))
+        elif kind == "tripinfo":
+            stats = tripinfo_stats(records, len(ids))
+            rows = [(ids[i], {name: column[i] for name, column in stats.items()}) for i in range(len(ids))]
+            rows.append(("all", tripinfo_totals(records)))
+            print_table("vType", rows, list(stats), write)
+            totals.setdefault(kind, []).append((path, tripinfo_totals(records)))
+        else:
+            stats = queue_stats(records, len(ids))
+            rows = [(ids[i], {name: column[i] for name, column in stats.items()}) for i in range(len(ids))]
+            print_table("lane", rows, list(stats), write)
+            totals.setdefault(kind, []).append((path, queue_totals(stats)))
+        write("")
+
+    for kind, runs in totals.items():
+        if len(runs) > 1:
+            write(f"[output] {kind} runs compared:")
+            print_table("run", runs, list(runs[0][1]), write)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["convert", "report"])
+    parser.add_argument("paths", nargs="+", help="SUMO output XML files, or .vdet files (report)")
+    parser.add_argument("--out", default=None, help="convert: output file (default: <xml>.vdet)")
+    parser.add_argument("--chunk-records", type=int, default=CHUNK_RECORDS,
+                        help="convert: records staged in memory before each write")
+    parser.add_argument("--layout", default=None,
+                        help="report: pole layout, to label detectors as 'pole approach'")
+    args = parser.parse_args()
+    try:
+        run(parser, args)
+    except ValueError as e:
+        sys.exit(f"[output] {e}")
+
+
+def run(parser, args):
+    if args.command == "convert":
+        if args.out and len(args.paths) > 1:
+            parser.error("--out needs a single input file")
+        for path in args.paths:
+            out_path, kind, written, truncated = convert(path, args.out, args.chunk_records)
+            note = " (file truncated, records up to the break)" if truncated else ""
+            print(f"[output] {path}: {written} {kind} records -> {out_path} ({os.path.getsize(out_path)} bytes){note}")
+    else:
+        report(args.paths, args.layout)
+
+
+if __name__ == "__main__":
+    main()
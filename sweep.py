@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+sweep.py
+
+Parallel parameter sweep of the traffic-light controller.
+
+Every combination of --red-thresholds (controller.PhaseController's red
+threshold, `count > 5` in control_traffic_light) and --demand-scales
+(multiplier applied to every flow's vehsPerHour in the scenario's route
+files) is one headless run. Runs are spread over a process pool; each worker
+uses libsumo (SUMO in-process, no TraCI socket) when it is installed and
+TraCI otherwise.
+
+Each run gets its own directory under --work-dir with the scaled routes, a
+copy of the additional files whose outputs point into that directory (so
+parallel runs never write the same detector file) and a tripinfo output.
+The summary has, per run: arrived vehicles, mean waiting time and mean trip
+duration of arrived vehicles, throughput (arrivals per simulated hour) and
+wall-clock time. It is printed and written as CSV to --out.
+
+Usage:
+    python sweep.py --red-thresholds 3,5,8 --demand-scales 0.5,1,2 [--workers 8]
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+import multiprocessing
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from controller import PhaseController
+from scenario import read_sumocfg
+
+if 'SUMO_HOME' not in os.environ:
+    print("Error: please set SUMO_HOME to your SUMO installation directory.")
+    sys.exit(1)
+
+sys.path.append(os.path.join(os.environ['SUMO_HOME'], 'tools'))
+
+import traci.constants as tc
+
+BACKENDS = ("auto", "libsumo", "traci")
+
+# Simulation module of this worker process (libsumo or traci), set by init_worker
+sim = None
+
+
+def import_backend(backend):
+    if backend in ("auto", "libsumo"):
+        try:
+            import libsumo
+            return libsumo
+        except ImportError:
+            if backend == "libsumo":
+                raise
+    import traci
+    return traci
+
+
+def init_worker(backend):
+    global sim
+    sim = import_backend(backend)
+
+
+# ————————————————
+# Scenario files
+# ————————————————
+def write_scaled_routes(route_file, scale, out_path):
+    """Copy route_file with every flow's demand multiplied by scale."""
+    tree = ET.parse(route_file)
+    for flow in tree.getroot().iter("flow"):
+        if "vehsPerHour" in flow.attrib:
+            flow.set("vehsPerHour", f"{float(flow.get('vehsPerHour')) * scale:g}")
+        elif "period" in flow.attrib:
+            flow.set("period", f"{float(flow.get('period')) / scale:g}")
+        elif "probability" in flow.attrib:
+            flow.set("probability", f"{min(1.0, float(flow.get('probability')) * scale):g}")
+        elif "number" in flow.attrib:
+            flow.set("number", str(round(int(flow.get("number")) * scale)))
+    tree.write(out_path)
+
+
+def write_redirected_additional(additional_file, run_dir, out_path):
+    """Copy additional_file with every output 'file' moved into run_dir."""
+    tree = ET.parse(additional_file)
+    for element in tree.getroot().iter():
+        if "file" in element.attrib:
+            element.set("file", os.path.join(run_dir, os.path.basename(element.get("file"))))
+    tree.write(out_path)
+
+
+def tripinfo_summary(path):
+    waiting, duration = [], []
+    for _, element in ET.iterparse(path):
+        if element.tag == "tripinfo":
+            waiting.append(float(element.get("waitingTime")))
+            duration.append(float(element.get("duration")))
+            element.clear()
+    return len(waiting), float(np.mean(waiting)) if waiting else 0.0, float(np.mean(duration)) if duration else 0.0
+
+
+# ————————————————
+# One run
+# ————————————————
+def run_scenario(scenario):
+    run_dir = scenario["run_dir"]
+    os.makedirs(run_dir, exist_ok=True)
+    _, route_files, additional_files = read_sumocfg(scenario["config"])
+    routes, additionals = [], []
+    for i, route_file in enumerate(route_files):
+        routes.append(os.path.join(run_dir, f"routes{i}.rou.xml"))
+        write_scaled_routes(route_file, scenario["demand_scale"], routes[-1])
+    for i, additional_file in enumerate(additional_files):
+        additionals.append(os.path.join(run_dir, f"additional{i}.add.xml"))
+        write_redirected_additional(additional_file, run_dir, additionals[-1])
+    tripinfo = os.path.join(run_dir, "tripinfo.xml")
+
+    with open(scenario["layout"]) as f:
+        layout = json.load(f)
+    tls_ids = [pole["tls"] for pole in layout.values()]
+    detector_ids = [detector_id for pole in layout.values() for detector_id in pole["detectors"]]
+
+    start = time.perf_counter()
+    cmd = ["sumo", "-c", scenario["config"], "-r", ",".join(routes), "-a", ",".join(additionals),
+           "--tripinfo-output", tripinfo, "--no-step-log", "--no-warnings"]
+    sim.start(cmd)
+    for tls_id in tls_ids:
+        sim.trafficlight.setPhase(tls_id, 0)
+    for detector_id in detector_ids:
+        sim.lanearea.subscribe(detector_id, [tc.LAST_STEP_VEHICLE_NUMBER])
+
+    controller = PhaseController(len(tls_ids), red_threshold=scenario["red_threshold"])
+    phases = np.zeros(len(tls_ids), dtype=np.int64)
+    counts = np.zeros((len(tls_ids), 4), dtype=np.int64)
+    step = 0
+    max_steps = scenario["max_steps"]
+    while sim.simulation.getMinExpectedNumber() > 0:
+        if max_steps and step >= max_steps:
+            break
+        sim.simulationStep()
+        step += 1
+        results = sim.lanearea.getAllSubscriptionResults()
+        counts.reshape(-1)[:] = [results[detector_id][tc.LAST_STEP_VEHICLE_NUMBER] for detector_id in detector_ids]
+        next_phases = controller.next_phases(counts, phases)
+        for i in np.flatnonzero(next_phases != phases).tolist():
+            sim.trafficlight.setPhase(tls_ids[i], int(next_phases[i]))
+        phases = next_phases
+    sim_seconds = sim.simulation.getTime()
+    sim.close()
+    wall = time.perf_counter() - start
+
+    arrived, mean_waiting, mean_duration = tripinfo_summary(tripinfo)
+    return {
+        "red_threshold": scenario["red_threshold"],
+        "demand_scale": scenario["demand_scale"],
+        "steps": step,
+        "arrived": arrived,
+        "mean_waiting_s": round(mean_waiting, 2),
+        "mean_duration_s": round(mean_duration, 2),
+        "throughput_veh_h": round(arrived / sim_seconds * 3600, 1) if sim_seconds else 0.0,
+        "wall_s": round(wall, 2),
+        "steps_per_s": round(step / wall),
+        "backend": sim.__name__,
+    }
+
+
+def parse_list(text, kind):
+    return [kind(value) for value in text.split(",") if value]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="configs/intersection.sumocfg")
+    parser.add_argument("--layout", default="configs/intersection.poles.json",
+                        help="Pole layout (TLS and detectors) as used by multi_edge.py")
+    parser.add_argument("--red-thresholds", default="3,5,8",
+                        help="Comma-separated vehicle counts above which an approach is 'red'")
+    parser.add_argument("--demand-scales", default="0.5,1,1.5,2",
+                        help="Comma-separated multipliers for every flow's vehsPerHour")
+    parser.add_argument("--max-steps", type=int, default=0,
+                        help="Stop each run after this many steps (0 = run until the simulation ends)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Runs in parallel (default: one per CPU)")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto",
+                        help="libsumo runs SUMO in the worker process; traci talks to a SUMO subprocess")
+    parser.add_argument("--work-dir", default="sweep_runs", help="Per-run scenario and output files")
+    parser.add_argument("--out", default="sweep_results.csv", help="Summary table as CSV")
+    args = parser.parse_args()
+
+    scenarios = [{
+        "config": os.path.abspath(args.config),
+        "layout": os.path.abspath(args.layout),
+        "red_threshold": red_threshold,
+        "demand_scale": demand_scale,
+        "max_steps": args.max_steps,
+        "run_dir": os.path.abspath(os.path.join(args.work_dir, f"red{red_threshold}_demand{demand_scale:g}")),
+    } for red_threshold, demand_scale in itertools.product(parse_list(args.red_thresholds, int),
+                                                          parse_list(args.demand_scales, float))]
+
+    print(f"[sweep] {len(scenarios)} runs on {args.workers} workers ({args.backend} backend)")
+    start = time.perf_counter()
+    rows = []
+    with multiprocessing.Pool(args.workers, initializer=init_worker, initargs=(args.backend,)) as pool:
+        for row in pool.imap_unordered(run_scenario, scenarios):
+            rows.append(row)
+            print(f"[sweep] red>{row['red_threshold']} demand x{row['demand_scale']:g}: "
+                  f"{row['steps']} steps in {row['wall_s']} s ({row['backend']})")
+    elapsed = time.perf_counter() - start
+    rows.sort(key=lambda row: (row["red_threshold"], row["demand_scale"]))
+
+    columns = list(rows[0])
+    with open(args.out, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in columns]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[column]).rjust(width) for column, width in zip(columns, widths)))
+    serial = sum(row["wall_s"] for row in rows)
+    print(f"[sweep] {elapsed:.1f} s wall for {serial:.1f} s of runs ({serial / elapsed:.1f}x); table in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
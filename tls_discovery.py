@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+tls_discovery.py
+
+Builds a pole layout (the format of configs/corridor.poles.json, as used by
+multi_edge.py and fog.py --coordinate) from the network SUMO loaded, so the
+edge code runs any network without hard-wired TLS and detector ids:
+- every traffic light in traci.trafficlight.getIDList() is one pole,
+  numbered pole1..poleN in natural order of the TLS ids (c2 before c10);
+- every lane-area detector in traci.lanearea.getIDList() on a lane the TLS
+  controls covers one of its approaches. The approach follows from the
+  direction the lane runs into the junction (a lane heading south comes from
+  the north). With several detectors on one approach, the one reaching
+  furthest towards the stop line is used;
+- "west"/"east" neighbours are the poles whose TLS sit at the far end of the
+  west/east approaches;
+- with polygons=True, each detector gets the polygon whose centre is nearest
+  to the detector's middle (within POLYGON_MATCH_M), colored in the GUI.
+
+TLS without a detector on all four approaches are skipped (the controller
+needs four counts); discover_layout() returns them with the layout.
+
+Usage (prints the layout of a config, or writes it for fog.py --coordinate):
+    python tls_discovery.py configs/intersection.sumocfg [--out layout.json]
+"""
+
+import re
+import json
+import math
+import argparse
+
+APPROACHES = ("north", "south", "east", "west")
+POLYGON_MATCH_M = 20.0
+
+
+def natural_key(text):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", text)]
+
+
+def approach_of(shape):
+    """The approach a lane with this shape feeds, from the direction of its last segment."""
+    (x0, y0), (x1, y1) = shape[-2], shape[-1]
+    dx, dy = x1 - x0, y1 - y0
+    if abs(dy) >= abs(dx):
+        return "north" if dy < 0 else "south"
+    return "east" if dx < 0 else "west"
+
+
+def point_along(shape, offset):
+    """The point `offset` m along a lane shape."""
+    for (x0, y0), (x1, y1) in zip(shape, shape[1:]):
+        length = math.hypot(x1 - x0, y1 - y0)
+        if offset <= length and length:
+            return x0 + (x1 - x0) * offset / length, y0 + (y1 - y0) * offset / length
+        offset -= length
+    return shape[-1]
+
+
+def match_polygons(traci, detector_points):
+    """{detector id: nearest polygon id within POLYGON_MATCH_M} for {detector id: (x, y)}."""
+    centres = {}
+    for polygon_id in traci.polygon.getIDList():
+        shape = traci.polygon.getShape(polygon_id)
+        centres[polygon_id] = (sum(x for x, _ in shape) / len(shape), sum(y for _, y in shape) / len(shape))
+    matches = {}
+    for detector_id, (x, y) in detector_points.items():
+        best = min(centres.items(), key=lambda item: math.hypot(item[1][0] - x, item[1][1] - y), default=None)
+        if best is not None and math.hypot(best[1][0] - x, best[1][1] - y) <= POLYGON_MATCH_M:
+            matches[detector_id] = best[0]
+    return matches
+
+
+def discover_layout(traci, polygons=True):
+    """
+    Returns (layout, skipped): layout maps pole ids to {"tls", "detectors"
+    (north, south, east, west), "polygons" (if polygons and all four were
+    found), "west"/"east" neighbours}; skipped maps TLS ids left out to why.
+    """
+    lane_tls = {}
+    for tls_id in traci.trafficlight.getIDList():
+        for lane_id in traci.trafficlight.getControlledLanes(tls_id):
+            lane_tls[lane_id] = tls_id
+
+    # tls -> approach -> (end position on the lane, detector id, lane id)
+    found = {tls_id: {} for tls_id in set(lane_tls.values())}
+    shapes = {}
+    for detector_id in traci.lanearea.getIDList():
+        lane_id = traci.lanearea.getLaneID(detector_id)
+        tls_id = lane_tls.get(lane_id)
+        if tls_id is None:
+            continue
+        if lane_id not in shapes:
+            shapes[lane_id] = traci.lane.getShape(lane_id)
+        end = traci.lanearea.getPosition(detector_id) + traci.lanearea.getLength(detector_id)
+        approach = approach_of(shapes[lane_id])
+        current = found[tls_id].get(approach)
+        if current is None or end > current[0]:
+            found[tls_id][approach] = (end, detector_id, lane_id)
+
+    skipped = {}
+    tls_ids = []
+    for tls_id in sorted(found, key=natural_key):
+        missing = [approach for approach in APPROACHES if approach not in found[tls_id]]
+        if missing:
+            skipped[tls_id] = f"no detector on the {'/'.join(missing)} approach"
+        else:
+            tls_ids.append(tls_id)
+    pole_of_tls = {tls_id: f"pole{i}" for i, tls_id in enumerate(tls_ids, 1)}
+
+    polygon_of = {}
+    if polygons:
+        points = {}
+        for tls_id in tls_ids:
+            for end, detector_id, lane_id in found[tls_id].values():
+                middle = end - traci.lanearea.getLength(detector_id) / 2
+                points[detector_id] = point_along(shapes[lane_id], middle)
+        polygon_of = match_polygons(traci, points)
+
+    layout = {}
+    for tls_id in tls_ids:
+        approaches = found[tls_id]
+        pole = {"tls": tls_id}
+        for side in ("west", "east"):
+            # The junction an approach comes from; its TLS (same id) is the neighbour
+            upstream = traci.edge.getFromJunction(traci.lane.getEdgeID(approaches[side][2]))
+            if upstream in pole_of_tls:
+                pole[side] = pole_of_tls[upstream]
+        pole["detectors"] = [approaches[approach][1] for approach in APPROACHES]
+        pole_polygons = [polygon_of.get(detector_id) for detector_id in pole["detectors"]]
+        if all(pole_polygons):
+            pole["polygons"] = pole_polygons
+        layout[pole_of_tls[tls_id]] = pole
+    return layout, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("config", help="SUMO configuration to discover poles in")
+    parser.add_argument("--out", default=None, help="Write the layout JSON here instead of printing it")
+    args = parser.parse_args()
+
+    from scenario import import_traci, start_sumo, sumo_command
+    traci = import_traci()
+    start_sumo(sumo_command("sumo", args.config) + ["--no-step-log", "--no-warnings"])
+    try:
+        layout, skipped = discover_layout(traci)
+    finally:
+        traci.close()
+    for tls_id, reason in skipped.items():
+        print(f"[discovery] skipped TLS {tls_id}: {reason}")
+    text = json.dumps(layout, indent=4) + "\n"
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"[discovery] {len(layout)} poles written to {args.out}")
+    else:
+        print(text, end="")
+
+
+if __name__ == "__main__":
+    main()